@@ -0,0 +1,114 @@
+"""
+In-process cache of /analyze responses.
+
+Entries are keyed by company and remember the corpus versions (company, sector
+and greenwash scopes from the corpus_versions table) they were computed from.
+A lookup re-reads those versions, so an entry is served only while none of its
+inputs has changed, and never after its TTL.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from backend.db import GREENWASH_SCOPE, company_scope, fetch_corpus_versions, sector_scope
+
+ANALYSIS_CACHE_TTL_SEC = float(os.getenv("ANALYSIS_CACHE_TTL_SEC", "900"))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "1024"))
+
+
+@dataclass
+class _Entry:
+    payload: dict
+    versions: dict[str, int]
+    expires_at: float
+
+
+def analysis_scopes(company: str, sector: str | None = None) -> list[str]:
+    """Corpus scopes an analysis of ``company`` depends on."""
+    scopes = [company_scope(company), GREENWASH_SCOPE]
+    if sector:
+        scopes.append(sector_scope(sector))
+    return scopes
+
+
+class AnalysisCache:
+    def __init__(self, ttl_sec: float = ANALYSIS_CACHE_TTL_SEC, max_entries: int = ANALYSIS_CACHE_MAX_ENTRIES):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max(0, max_entries)
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_sec > 0 and self.max_entries > 0
+
+    @staticmethod
+    def _key(company: str) -> str:
+        return company.strip().lower()
+
+    def get(self, company: str) -> dict | None:
+        """Return a cached payload if it is fresh and its corpus versions still match."""
+        if not self.enabled:
+            return None
+        key = self._key(company)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                self._stale += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+
+        current = fetch_corpus_versions(list(entry.versions))
+        with self._lock:
+            if current != entry.versions:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+                self._stale += 1
+                self._misses += 1
+                return None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._hits += 1
+        return entry.payload
+
+    def put(self, company: str, payload: dict, versions: dict[str, int]) -> None:
+        if not self.enabled:
+            return
+        key = self._key(company)
+        with self._lock:
+            self._entries[key] = _Entry(payload, dict(versions), time.monotonic() + self.ttl_sec)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, company: str | None = None) -> None:
+        """Drop one company's entry, or everything when no company is given."""
+        with self._lock:
+            if company is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self._key(company), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "stale": self._stale,
+                "evictions": self._evictions,
+            }
+
+
+analysis_cache = AnalysisCache()
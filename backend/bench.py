@@ -0,0 +1,459 @@
+"""
+Benchmarks for the analyze, ingest and discovery hot paths.
+
+    python -m backend.bench --scale 1k                      # ~1k chunks, quick smoke run
+    python -m backend.bench --scale 100k --output 100k.json
+    python -m backend.bench --scale 1m --embedding-dim 256  # ~1M chunks; keep vectors small
+
+Runs against the Postgres configured for the app (e.g. the docker-compose pgvector
+image) but inside its own schema, BENCH_SCHEMA, which is dropped and recreated on
+every run, so application data is never touched. Embeddings are local
+(USE_LOCAL_EMBEDDINGS) and the LLM, the discovery web search and the discovered
+sources are served by a stub HTTP server on localhost, so results measure this
+code rather than provider latency (simulate that with --llm-latency-ms and
+--source-latency-ms).
+
+Stages:
+  corpus_load      backend.synthetic corpus ingested with ingest_esg_docs, per batch
+  index_build      ANN index build over the loaded corpus (VECTOR_INDEX_TYPE)
+  ingest_all_cold  ingest_all over a directory of new files
+  ingest_all_warm  the same run again; every file is skipped via the manifest
+  analyze          GET /analyze/{company}, plus analyze.<stage> from its timings
+  discovery        discover_and_ingest, plus discovery.<stage> from its timings
+
+Each stage reports throughput and p50/p95/p99 latency. --output writes the
+results as JSON with the git commit and settings, for comparison across commits.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import pathlib
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import replace
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+BENCH_SCHEMA = os.getenv("BENCH_SCHEMA", "bench")
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+
+class Stage:
+    """Latencies (seconds) and item counts for one benchmark stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: list[float] = []
+        self.items = 0
+        self.wall_sec = 0.0
+
+    def add(self, seconds: float, items: int = 1) -> None:
+        self.latencies.append(seconds)
+        self.items += items
+
+    def summary(self) -> dict:
+        if not self.latencies:
+            return {"samples": 0}
+        ms = np.asarray(self.latencies) * 1000
+        wall = self.wall_sec or float(np.sum(self.latencies))
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        return {
+            "samples": len(ms),
+            "items": self.items,
+            "wall_sec": round(wall, 3),
+            "throughput_per_sec": round(self.items / wall, 2) if wall > 0 else None,
+            "mean_ms": round(float(ms.mean()), 2),
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+            "max_ms": round(float(ms.max()), 2),
+        }
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible chat/responses endpoints plus plain-text source pages."""
+
+    server: "_StubServer"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, payload: dict) -> None:
+        self._send(200, json.dumps(payload).encode("utf-8"), "application/json")
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        time.sleep(self.server.llm_latency_sec)
+        if self.path.endswith("/chat/completions") and not request.get("stream"):
+            self._json(
+                {
+                    "id": "chatcmpl-bench",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "stub"),
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": "Benchmark stub report."},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                }
+            )
+        elif self.path.endswith("/responses"):
+            run = self.server.next_run()
+            candidates = [
+                {
+                    "title": f"Source {run}-{i}",
+                    "url": f"{self.server.url}/sources/{run}-{i}",
+                    "snippet": "Sustainability disclosure.",
+                    "publisher": "Bench",
+                    "published_at": "2025-01-01",
+                    "doc_type": "ESGReport",
+                    "source_type": "third_party",
+                    "relevance": 0.9,
+                }
+                for i in range(self.server.discovery_sources)
+            ]
+            self._json(
+                {
+                    "id": "resp-bench",
+                    "object": "response",
+                    "created_at": int(time.time()),
+                    "model": request.get("model", "stub"),
+                    "status": "completed",
+                    "output": [
+                        {
+                            "type": "message",
+                            "id": "msg-bench",
+                            "role": "assistant",
+                            "status": "completed",
+                            "content": [{"type": "output_text", "text": json.dumps(candidates), "annotations": []}],
+                        }
+                    ],
+                    "parallel_tool_calls": False,
+                    "tool_choice": "auto",
+                    "tools": [],
+                }
+            )
+        else:
+            self._send(404, b"{}", "application/json")
+
+    def do_GET(self) -> None:
+        if not self.path.startswith("/sources/"):
+            self._send(404, b"", "text/plain")
+            return
+        time.sleep(self.server.source_latency_sec)
+        from backend.synthetic import report_text
+
+        source = self.path.rsplit("/", 1)[-1]
+        body = report_text(f"Source{source}", "Energy", "NewsArticle", 1500, random.Random(source)).encode("utf-8")
+        self._send(200, body, "text/plain; charset=utf-8")
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, llm_latency_sec: float, source_latency_sec: float, discovery_sources: int):
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.llm_latency_sec = llm_latency_sec
+        self.source_latency_sec = source_latency_sec
+        self.discovery_sources = discovery_sources
+        self._runs = 0
+        self._lock = threading.Lock()
+
+    def next_run(self) -> int:
+        with self._lock:
+            self._runs += 1
+            return self._runs
+
+
+def _configure_environment(args: argparse.Namespace, stub: _StubServer, workdir: pathlib.Path) -> None:
+    # Backend modules read these at import time, so this runs before importing them.
+    os.environ["PGOPTIONS"] = f"{os.getenv('PGOPTIONS', '')} -c search_path={BENCH_SCHEMA},public".strip()
+    os.environ["OPENAI_BASE_URL"] = f"{stub.url}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    os.environ["USE_LOCAL_EMBEDDINGS"] = "true"
+    os.environ["EMBEDDING_DIM"] = str(args.embedding_dim)
+    os.environ["ANALYSIS_CACHE_TTL_SEC"] = "0"
+    os.environ["LIVE_DISCOVERY_ENABLED"] = "true"
+    os.environ["JOB_DB_PATH"] = str(workdir / "jobs.sqlite3")
+    os.environ["EMBED_CACHE_ENABLED"] = "false"
+
+
+def _reset_schema() -> None:
+    from backend.db import get_conn
+
+    conn = get_conn()
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("CREATE EXTENSION IF NOT EXISTS vector SCHEMA public")
+            cur.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+            cur.execute(f"CREATE SCHEMA {BENCH_SCHEMA}")
+    finally:
+        conn.close()
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=pathlib.Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _corpus_shape(args: argparse.Namespace):
+    from backend.ingest import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+    from backend.synthetic import CorpusShape
+
+    chunks_per_doc = max(1, args.chunks_per_doc)
+    return CorpusShape(
+        companies=args.companies,
+        docs_per_company=max(1.0, args.chunks / (args.companies * chunks_per_doc)),
+        doc_skew=args.doc_skew,
+        sector_skew=args.sector_skew,
+        doc_tokens=chunks_per_doc * max(1, CHUNK_MAX_TOKENS - CHUNK_OVERLAP_TOKENS),
+        length_sigma=args.length_sigma,
+        greenwash_cases=args.greenwash_cases,
+        seed=args.seed,
+    )
+
+
+def _bench_corpus(args, stages: dict[str, Stage]) -> tuple[int, list[str]]:
+    """Load the synthetic corpus; returns the stored chunk count and the company names."""
+    from backend.db import connection
+    from backend.ingest import ingest_esg_docs, ingest_greenwash_examples
+    from backend.synthetic import generate_companies, iter_documents, iter_greenwash_cases
+
+    shape = _corpus_shape(args)
+    companies = generate_companies(shape)
+    ingest_greenwash_examples([text for _, text in iter_greenwash_cases(shape, companies)])
+
+    stage = stages["corpus_load"] = Stage("corpus_load")
+    docs = iter_documents(shape, companies)
+    loaded = 0
+    started = time.perf_counter()
+    while batch := list(itertools.islice(docs, args.batch_size)):
+        batch_started = time.perf_counter()
+        ingest_esg_docs(batch)
+        stage.add(time.perf_counter() - batch_started, 0)
+        loaded += len(batch)
+        print(f"  corpus_load: {loaded} docs", end="\r", flush=True)
+    stage.wall_sec = time.perf_counter() - started
+    print()
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM esg_documents")
+        stage.items = cur.fetchone()[0]
+    return stage.items, [company.name for company in companies]
+
+
+def _bench_index_build(stages: dict[str, Stage]) -> None:
+    from backend.db import VECTOR_INDEX_TYPE
+    from backend.migrate import build_indexes
+
+    if VECTOR_INDEX_TYPE not in ("hnsw", "ivfflat"):
+        return
+    stage = stages["index_build"] = Stage("index_build")
+    started = time.perf_counter()
+    build_indexes()
+    stage.add(time.perf_counter() - started)
+
+
+def _bench_ingest_all(args, workdir: pathlib.Path, stages: dict[str, Stage]) -> None:
+    from backend.ingest import ingest_all
+
+    from backend.synthetic import write_corpus
+
+    # Different seed, one document per company: every file is new to the database.
+    shape = replace(
+        _corpus_shape(args), companies=args.ingest_files, docs_per_company=1, greenwash_cases=0, seed=args.seed + 1
+    )
+    write_corpus(shape, workdir)
+    esg_dir = workdir / "esg_docs"
+    cases_dir = workdir / "greenwash_cases"
+
+    for name in ("ingest_all_cold", "ingest_all_warm"):
+        stage = stages[name] = Stage(name)
+        started = time.perf_counter()
+        ingest_all(
+            esg_dir=esg_dir,
+            greenwash_dir=cases_dir,
+            batch_size=args.batch_size,
+            manifest_path=str(workdir / "ingest_manifest.sqlite3"),
+        )
+        stage.add(time.perf_counter() - started, args.ingest_files)
+
+
+def _add_timings(stages: dict[str, Stage], prefix: str, timings: dict[str, float]) -> None:
+    for key, value in timings.items():
+        name = f"{prefix}.{key.removesuffix('_ms')}"
+        stages.setdefault(name, Stage(name)).add(value / 1000)
+
+
+def _bench_analyze(args, companies: list[str], stages: dict[str, Stage]) -> None:
+    from concurrent.futures import ThreadPoolExecutor
+
+    from fastapi.testclient import TestClient
+
+    from backend.main import app
+
+    stage = stages["analyze"] = Stage("analyze")
+    rng = random.Random(args.seed)
+    companies = [rng.choice(companies) for _ in range(args.analyze_requests)]
+    with TestClient(app) as client:
+        def call(company: str) -> tuple[float, dict]:
+            started = time.perf_counter()
+            response = client.get(f"/analyze/{company}")
+            response.raise_for_status()
+            return time.perf_counter() - started, response.json().get("timings", {})
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+            for seconds, timings in pool.map(call, companies):
+                stage.add(seconds)
+                _add_timings(stages, "analyze", timings)
+        stage.wall_sec = time.perf_counter() - started
+
+
+def _bench_discovery(args, stages: dict[str, Stage]) -> None:
+    from backend.discovery import discover_and_ingest
+
+    stage = stages["discovery"] = Stage("discovery")
+    for run in range(args.discovery_runs):
+        started = time.perf_counter()
+        result = discover_and_ingest(f"BenchDiscover{run:03d}", sector="Energy", max_results=args.discovery_sources)
+        stage.add(time.perf_counter() - started, result.get("ingested", 0))
+        _add_timings(stages, "discovery", result.get("timings", {}))
+        if result.get("errors"):
+            print(f"  discovery run {run}: {'; '.join(result['errors'])}")
+
+
+def run(args: argparse.Namespace) -> dict:
+    stub = _StubServer(args.llm_latency_ms / 1000, args.source_latency_ms / 1000, args.discovery_sources)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    stages: dict[str, Stage] = {}
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        workdir = pathlib.Path(tmp)
+        _configure_environment(args, stub, workdir)
+        _reset_schema()
+
+        from backend.db import init_db
+        from backend.ingest import DATA_DIR, ingest_greenwash_examples
+
+        init_db()
+        ingest_greenwash_examples(
+            [path.read_text(encoding="utf-8").strip() for path in sorted((DATA_DIR / "greenwash_cases").glob("*.txt"))]
+        )
+
+        print(f"Loading ~{args.chunks} chunks for {args.companies} companies into schema {BENCH_SCHEMA}...")
+        chunks, companies = _bench_corpus(args, stages)
+        _bench_index_build(stages)
+        if args.ingest_files:
+            print(f"Running ingest_all over {args.ingest_files} files...")
+            _bench_ingest_all(args, workdir, stages)
+        if args.analyze_requests:
+            print(f"Running {args.analyze_requests} analyze requests (concurrency {args.concurrency})...")
+            _bench_analyze(args, companies, stages)
+        if args.discovery_runs:
+            print(f"Running {args.discovery_runs} discovery runs...")
+            _bench_discovery(args, stages)
+    stub.shutdown()
+
+    return {
+        "commit": _git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "scale": args.scale,
+            "target_chunks": args.chunks,
+            "chunks": chunks,
+            "companies": args.companies,
+            "chunks_per_doc": args.chunks_per_doc,
+            "doc_skew": args.doc_skew,
+            "sector_skew": args.sector_skew,
+            "length_sigma": args.length_sigma,
+            "embedding_dim": args.embedding_dim,
+            "vector_index_type": os.getenv("VECTOR_INDEX_TYPE", "hnsw"),
+            "concurrency": args.concurrency,
+            "llm_latency_ms": args.llm_latency_ms,
+            "source_latency_ms": args.source_latency_ms,
+            "seed": args.seed,
+        },
+        "stages": {name: stage.summary() for name, stage in stages.items()},
+    }
+
+
+def _print_table(results: dict) -> None:
+    header = f"{'stage':<30}{'n':>7}{'items/s':>12}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}"
+    print(header)
+    print("-" * len(header))
+    for name, summary in results["stages"].items():
+        if not summary["samples"]:
+            continue
+        throughput = summary["throughput_per_sec"]
+        print(
+            f"{name:<30}{summary['samples']:>7}{(throughput if throughput is not None else 0):>12.1f}"
+            f"{summary['p50_ms']:>11.1f}{summary['p95_ms']:>11.1f}{summary['p99_ms']:>11.1f}"
+        )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m backend.bench",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k", help="corpus size preset (chunks)")
+    parser.add_argument("--chunks", type=int, default=None, help="explicit corpus size; overrides --scale")
+    parser.add_argument("--companies", type=int, default=None, help="companies in the corpus (default: chunks / 50)")
+    parser.add_argument("--chunks-per-doc", type=int, default=4, help="mean document length, in chunks")
+    parser.add_argument("--doc-skew", type=float, default=1.0, help="Zipf exponent of docs per company")
+    parser.add_argument("--sector-skew", type=float, default=1.0, help="Zipf exponent of sector sizes")
+    parser.add_argument("--length-sigma", type=float, default=0.5, help="lognormal spread of document lengths")
+    parser.add_argument("--greenwash-cases", type=int, default=50, help="synthetic cases added to the repo's own")
+    parser.add_argument("--batch-size", type=int, default=200, help="documents per ingest batch")
+    parser.add_argument("--embedding-dim", type=int, default=int(os.getenv("EMBEDDING_DIM", "3072")))
+    parser.add_argument("--ingest-files", type=int, default=200)
+    parser.add_argument("--analyze-requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1, help="concurrent analyze requests")
+    parser.add_argument("--discovery-runs", type=int, default=10)
+    parser.add_argument("--discovery-sources", type=int, default=6, help="sources returned per discovery search")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--source-latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=pathlib.Path, default=None, help="write results as JSON")
+    args = parser.parse_args(argv)
+    args.chunks = args.chunks or SCALES[args.scale]
+    args.companies = max(1, args.companies or args.chunks // 50)
+
+    results = run(args)
+    _print_table(results)
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
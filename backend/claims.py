@@ -0,0 +1,127 @@
+"""
+Claim-level retrieval for /analyze.
+
+Every chunk of a company's recent documents is split into candidate
+sustainability claims (sentences that mention climate, energy, emissions,
+materials and similar topics). The strongest claims across all chunks are each
+embedded on their own, and every claim is matched against the greenwash
+patterns in one multi-query search. Matches are then aggregated per pattern, so
+one specific claim that resembles a known pattern is not diluted by the rest of
+the report the way a single embedding of all documents would be.
+"""
+
+import os
+import re
+
+import numpy as np
+
+CLAIMS_MAX_PER_COMPANY = int(os.getenv("CLAIMS_MAX_PER_COMPANY", "32"))
+CLAIM_MIN_CHARS = int(os.getenv("CLAIM_MIN_CHARS", "40"))
+CLAIM_MAX_CHARS = int(os.getenv("CLAIM_MAX_CHARS", "500"))
+# Claims are read from every chunk of a source, up to this many.
+CLAIMS_MAX_CHUNKS_PER_SOURCE = int(os.getenv("CLAIMS_MAX_CHUNKS_PER_SOURCE", "256"))
+
+# Sentence ends, blank lines and bullets; single line breaks are PDF wrapping.
+_SPLIT_RE = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[A-Z0-9])|\n\s*\n|[•▪●]\s*")
+_SENTENCE_END_RE = re.compile(r"[.!?][\"')\]]*\s+")
+_TOPIC_RE = re.compile(
+    r"\b(?:net[- ]?zero|carbon|co2|emission|greenhouse|ghg|climate|renewable|sustainab|offset|neutral|green|"
+    r"eco[- ]?friendly|recycl|circular|biodiversity|deforest|water|waste|packaging|scope [123]|decarboni[sz]|"
+    r"clean energy|solar|wind|environment|plastic|fossil|methane|nature)"
+)
+_COMMITMENT_RE = re.compile(
+    r"\b(?:we|our|committed|commit|pledge|aim|target|goal|will|by 20\d\d|100%|fully|entirely|leading)\b|\d+%"
+)
+
+
+def _truncate(sentence: str, max_chars: int) -> str:
+    if len(sentence) <= max_chars:
+        return sentence
+    cut = sentence[:max_chars]
+    return cut[: cut.rfind(" ")] if " " in cut else cut
+
+
+def _sentences(text: str) -> list[str]:
+    return [" ".join(part.split()) for part in _SPLIT_RE.split(text) if part and part.strip()]
+
+
+def chunk_passages(chunks: list[tuple[int, str]]) -> list[str]:
+    """Chunk texts ready for ``extract_claims``, given (chunk_index, content) pairs.
+
+    Chunks after the first overlap the previous one and start mid-sentence. That
+    sentence ends the previous chunk in full, so the leading fragment is dropped.
+    """
+    passages = []
+    for chunk_index, content in chunks:
+        if chunk_index > 0:
+            boundary = _SENTENCE_END_RE.search(content)
+            content = content[boundary.end() :] if boundary else ""
+        if content.strip():
+            passages.append(content)
+    return passages
+
+
+def extract_claims(texts: list[str], max_claims: int = CLAIMS_MAX_PER_COMPANY) -> list[str]:
+    """Candidate sustainability claims from a company's documents, in document order.
+
+    Sentences on sustainability topics are kept, deduplicated and capped at
+    ``max_claims``, preferring those with more topic terms and commitment language
+    (targets, percentages, "we will"). Without any such sentence, the leading
+    sentences stand in so a company can still be analysed.
+    """
+    max_claims = max(1, max_claims)
+    candidates: list[tuple[int, int, str]] = []
+    fallback: list[str] = []
+    seen: set[str] = set()
+    for text in texts:
+        for sentence in _sentences(text):
+            # Headings and table rows are short; claims are full sentences.
+            if len(sentence) < CLAIM_MIN_CHARS or len(sentence.split()) < 6:
+                continue
+            sentence = _truncate(sentence, CLAIM_MAX_CHARS)
+            key = sentence.lower()
+            if key in seen:
+                continue
+            seen.add(key)
+            # The patterns are lower-case; matching the lowered key is faster than IGNORECASE.
+            topics = len(_TOPIC_RE.findall(key))
+            if topics:
+                strength = topics + len(_COMMITMENT_RE.findall(key))
+                candidates.append((strength, len(candidates), sentence))
+            elif len(fallback) < max_claims:
+                fallback.append(sentence)
+    if not candidates:
+        if fallback:
+            return fallback
+        text = " ".join(" ".join(texts).split())
+        return [_truncate(text, CLAIM_MAX_CHARS)] if text else []
+    strongest = sorted(candidates, key=lambda item: (-item[0], item[1]))[:max_claims]
+    return [sentence for _, _, sentence in sorted(strongest, key=lambda item: item[1])]
+
+
+def claims_centroid(embeddings: list[np.ndarray]) -> np.ndarray:
+    """Mean direction of the claim embeddings, as one query vector for the company.
+
+    ``embeddings`` must not be empty: a company without claims has no centroid.
+    """
+    matrix = np.asarray(np.stack(embeddings), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).mean(axis=0)
+
+
+def aggregate_matches(
+    claims: list[str], matches: list[list[tuple[str, float]]], k: int = 5
+) -> list[tuple[str, float, str]]:
+    """Top-k greenwash patterns over all claims as (pattern, similarity, claim).
+
+    ``matches`` holds each claim's (pattern, similarity) results. A pattern scores
+    its best similarity to any claim, which is reported alongside it.
+    """
+    best: dict[str, tuple[float, str]] = {}
+    for claim, claim_matches in zip(claims, matches):
+        for content, similarity in claim_matches:
+            if content not in best or similarity > best[content][0]:
+                best[content] = (similarity, claim)
+    ranked = sorted(best.items(), key=lambda item: item[1][0], reverse=True)[: max(0, k)]
+    return [(content, similarity, claim) for content, (similarity, claim) in ranked]
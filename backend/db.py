@@ -1,36 +1,894 @@
+import io
 import os
+import re
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from hashlib import sha1
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
 import psycopg2
+import psycopg2.extensions
 from dotenv import load_dotenv
 
+from backend.embed import EMBEDDING_DIM
+from backend.metrics import histogram
+
 load_dotenv()
 
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT_SEC = float(os.getenv("DB_POOL_TIMEOUT_SEC", "10"))
+DB_POOL_HEALTHCHECK_SEC = float(os.getenv("DB_POOL_HEALTHCHECK_SEC", "30"))
+
+# Approximate nearest-neighbour index settings (pgvector).
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "hnsw").lower()  # hnsw | ivfflat | none
+VECTOR_INDEX_AUTO_BUILD_MAX_ROWS = int(os.getenv("VECTOR_INDEX_AUTO_BUILD_MAX_ROWS", "50000"))
+# Sectors with more esg_documents rows than this get their own partial ANN index.
+SECTOR_INDEX_MIN_ROWS = int(os.getenv("SECTOR_INDEX_MIN_ROWS", "20000"))
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "40"))
+IVFFLAT_LISTS = int(os.getenv("IVFFLAT_LISTS", "100"))
+IVFFLAT_PROBES = int(os.getenv("IVFFLAT_PROBES", "10"))
+VECTOR_INDEX_TYPES = ("hnsw", "ivfflat")
+VECTOR_TABLES = ("esg_documents", "greenwash_examples")
+# Embedding storage: full-precision `vector` or 2-byte `halfvec` components (pgvector >= 0.7).
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "vector").lower()  # vector | halfvec
+EMBEDDING_STORAGE_TYPES = ("vector", "halfvec")
+if EMBEDDING_STORAGE not in EMBEDDING_STORAGE_TYPES:
+    raise ValueError(f"EMBEDDING_STORAGE must be one of {EMBEDDING_STORAGE_TYPES}, got {EMBEDDING_STORAGE!r}")
+# Optional binary-quantized ANN index; candidates are reranked against the stored embeddings.
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()  # none | binary
+RERANK_CANDIDATES_FACTOR = int(os.getenv("RERANK_CANDIDATES_FACTOR", "4"))
+# pgvector can index at most 2000 dims as `vector` but 4000 as `halfvec`.
+_MAX_VECTOR_INDEX_DIM = 2000
+# halfvec and bit index expressions need pgvector 0.7+.
+_INDEX_EXPRESSION_MIN_VERSION = (0, 7)
+# Cleared by init_db() when the installed pgvector cannot build the configured index
+# expression; searches then compare the stored column directly, without an ANN index.
+_index_expression_supported = True
+
+
+DB_CONNECT_SECONDS = histogram("db_connect_duration_seconds", "Time to open a new Postgres connection.")
+DB_ACQUIRE_SECONDS = histogram(
+    "db_pool_acquire_duration_seconds",
+    "Time to check a connection out of the pool, including waits, health checks and reconnects.",
+)
+
+_format_component = "{:.7g}".format
+
+
+def format_vector(vector: np.ndarray) -> str:
+    """Compact pgvector text literal for a 1-d array, e.g. ``[0.1,0.2]``.
+
+    Seven significant digits is all a float4 component carries, so this is about half
+    the size of ``str(list)`` with no loss once stored.
+    """
+    return "[" + ",".join(map(_format_component, np.asarray(vector, dtype=np.float32).tolist())) + "]"
+
+
+class Vector:
+    """Query parameter wrapper that binds a 1-d array as a pgvector literal.
+
+    Only wrapped arrays are adapted, so other numpy parameters keep psycopg2's
+    default handling. A list of them binds as an array of vector literals.
+    """
+
+    __slots__ = ("array",)
+
+    def __init__(self, array: np.ndarray):
+        self.array = array
+
+
+def _adapt_vector(vector: Vector) -> psycopg2.extensions.AsIs:
+    return psycopg2.extensions.AsIs(f"'{format_vector(vector.array)}'")
+
+
+psycopg2.extensions.register_adapter(Vector, _adapt_vector)
+
+
+def _cast_vector(value: str | None, cur) -> np.ndarray | None:
+    if value is None:
+        return None
+    return np.array(value[1:-1].split(","), dtype=np.float32)
+
+
+def vector_from_bytes(data: bytes | memoryview) -> np.ndarray:
+    """Decode pgvector's binary send format (``vector_send(col)``) into a float32 array."""
+    return np.frombuffer(data, dtype=">f4", offset=4).astype(np.float32)
+
+
+_vector_types_registered = False
+
+
+def register_vector_types(conn) -> None:
+    """Make vector/halfvec result columns come back as float32 numpy arrays.
+
+    This parses the text output and is meant for ad-hoc queries; bulk reads select
+    ``vector_send(embedding::vector)`` and decode it with ``vector_from_bytes``.
+    Registration is process-wide and keyed by type OID, so it only needs to happen once,
+    after the extension exists.
+    """
+    global _vector_types_registered
+    if _vector_types_registered:
+        return
+    with conn.cursor() as cur:
+        cur.execute("SELECT typname, oid FROM pg_type WHERE typname IN ('vector', 'halfvec')")
+        rows = cur.fetchall()
+    for typname, oid in rows:
+        psycopg2.extensions.register_type(psycopg2.extensions.new_type((oid,), typname.upper(), _cast_vector))
+    _vector_types_registered = any(typname == "vector" for typname, _ in rows)
+
 
 def get_conn():
     database_url = os.getenv("DATABASE_URL")
     if database_url:
-        return psycopg2.connect(database_url)
-    return psycopg2.connect(
-        host=os.getenv("VECTORAI_HOST", "localhost"),
-        port=int(os.getenv("VECTORAI_PORT", "5432")),
-        database=os.getenv("VECTORAI_DB", "vectordb"),
-        user=os.getenv("VECTORAI_USER", "admin"),
-        password=os.getenv("VECTORAI_PASSWORD", "admin"),
-    )
+        conn = psycopg2.connect(database_url)
+    else:
+        conn = psycopg2.connect(
+            host=os.getenv("VECTORAI_HOST", "localhost"),
+            port=int(os.getenv("VECTORAI_PORT", "5432")),
+            database=os.getenv("VECTORAI_DB", "vectordb"),
+            user=os.getenv("VECTORAI_USER", "admin"),
+            password=os.getenv("VECTORAI_PASSWORD", "admin"),
+        )
+    if not _vector_types_registered:
+        register_vector_types(conn)
+        conn.rollback()
+    return conn
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available within the timeout."""
+
+
+class ConnectionPool:
+    """Thread-safe, blocking pool of psycopg2 connections.
+
+    Idle connections are reused LIFO so the warmest connection is handed out first.
+    A connection that has been idle longer than ``healthcheck_sec`` is pinged with
+    ``SELECT 1`` before it is returned, and replaced if the ping fails.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], psycopg2.extensions.connection] = get_conn,
+        min_size: int = DB_POOL_MIN_SIZE,
+        max_size: int = DB_POOL_MAX_SIZE,
+        timeout_sec: float = DB_POOL_TIMEOUT_SEC,
+        healthcheck_sec: float = DB_POOL_HEALTHCHECK_SEC,
+    ):
+        self._connect = connect
+        self.max_size = max(1, max_size)
+        self.min_size = max(0, min(min_size, self.max_size))
+        self.timeout_sec = timeout_sec
+        self.healthcheck_sec = healthcheck_sec
+        self._cond = threading.Condition()
+        self._idle: list[tuple[psycopg2.extensions.connection, float]] = []
+        self._size = 0
+        self._closed = False
+        self._checked_out = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._opened = 0
+        self._discarded = 0
+        self._healthcheck_failures = 0
+        self._wait_total_sec = 0.0
+        self._wait_max_sec = 0.0
+
+    def fill(self) -> None:
+        """Open connections until ``min_size`` are available (best effort)."""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def _open(self) -> psycopg2.extensions.connection:
+        with DB_CONNECT_SECONDS.time():
+            conn = self._connect()
+        with self._cond:
+            self._opened += 1
+        return conn
+
+    def _is_healthy(self, conn: psycopg2.extensions.connection) -> bool:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self) -> psycopg2.extensions.connection:
+        started = time.monotonic()
+        deadline = started + self.timeout_sec
+        conn = None
+        last_used = 0.0
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed.")
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"No database connection available within {self.timeout_sec:.1f}s "
+                        f"(max_size={self.max_size})."
+                    )
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+        try:
+            if conn is not None and (
+                conn.closed
+                or (
+                    time.monotonic() - last_used > self.healthcheck_sec
+                    and not self._is_healthy(conn)
+                )
+            ):
+                with self._cond:
+                    self._healthcheck_failures += 1
+                self._close_quietly(conn)
+                conn = None
+            if conn is None:
+                conn = self._open()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - started
+        DB_ACQUIRE_SECONDS.observe(waited)
+        with self._cond:
+            self._checked_out += 1
+            self._checkouts += 1
+            self._wait_total_sec += waited
+            self._wait_max_sec = max(self._wait_max_sec, waited)
+        return conn
+
+    def putconn(self, conn: psycopg2.extensions.connection, discard: bool = False) -> None:
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+        with self._cond:
+            self._checked_out -= 1
+            if discard or conn.closed or self._closed:
+                self._size -= 1
+                self._discarded += 1
+                keep = False
+            else:
+                self._idle.append((conn, time.monotonic()))
+                keep = True
+            self._cond.notify()
+        if not keep:
+            self._close_quietly(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[psycopg2.extensions.connection]:
+        """Check out a connection; commit on success, roll back on error."""
+        conn = self.getconn()
+        discard = False
+        try:
+            yield conn
+            conn.commit()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        except BaseException:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.putconn(conn, discard=discard)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._size -= len(idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            self._close_quietly(conn)
+
+    @staticmethod
+    def _close_quietly(conn: psycopg2.extensions.connection) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "checked_out": self._checked_out,
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "connections_opened": self._opened,
+                "connections_discarded": self._discarded,
+                "healthcheck_failures": self._healthcheck_failures,
+                "wait_time_total_sec": round(self._wait_total_sec, 4),
+                "wait_time_avg_sec": round(self._wait_total_sec / self._checkouts, 4) if self._checkouts else 0.0,
+                "wait_time_max_sec": round(self._wait_max_sec, 4),
+            }
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = ConnectionPool()
+                try:
+                    pool.fill()
+                except Exception as exc:
+                    print(f"Connection pool warm-up failed ({type(exc).__name__}); opening lazily.")
+                _pool = pool
+    return _pool
+
+
+@contextmanager
+def connection() -> Iterator[psycopg2.extensions.connection]:
+    """Borrow a pooled connection for the duration of one transaction."""
+    with get_pool().connection() as conn:
+        yield conn
+
+
+def pool_stats() -> dict:
+    pool = _pool
+    if pool is None:
+        return {"size": 0, "idle": 0, "checked_out": 0, "waiting": 0}
+    return pool.stats()
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
 
 
 def init_db():
-    conn = get_conn()
-    cur = conn.cursor()
+    with connection() as conn, conn.cursor() as cur:
+        _create_schema(cur)
+        register_vector_types(conn)
+        mismatched = {
+            table: column_type
+            for table, column_type in stored_embedding_types(cur).items()
+            if column_type != embedding_column_type()
+        }
+        for table, column_type in mismatched.items():
+            print(
+                f"{table}.embedding is {column_type} but EMBEDDING_DIM/EMBEDDING_STORAGE expect "
+                f"{embedding_column_type()}; run `python -m backend.migrate reproject`."
+            )
+        check_index_support(cur)
+        # Index DDL is written for the configured type, so it waits for the migration.
+        if not mismatched:
+            ensure_vector_indexes(cur)
+
+
+def stored_embedding_types(cur) -> dict[str, str]:
+    """Current SQL type of each table's ``embedding`` column, e.g. ``{"esg_documents": "vector(3072)"}``."""
+    cur.execute(
+        """
+        SELECT c.relname, format_type(a.atttypid, a.atttypmod)
+        FROM pg_attribute a
+        JOIN pg_class c ON c.oid = a.attrelid
+        WHERE c.relname = ANY(%s) AND c.relnamespace = current_schema()::regnamespace
+          AND a.attname = 'embedding' AND NOT a.attisdropped
+        """,
+        (list(VECTOR_TABLES),),
+    )
+    return dict(cur.fetchall())
+
+
+def embedding_column_type() -> str:
+    """SQL type of the ``embedding`` columns, e.g. ``vector(3072)`` or ``halfvec(1024)``."""
+    return f"{EMBEDDING_STORAGE}({EMBEDDING_DIM})"
+
+
+def _index_opclass() -> tuple[str, str]:
+    """(element type, operator) the ANN index is built over."""
+    if not _index_expression_supported:
+        return EMBEDDING_STORAGE, "<=>"
+    return _configured_index_opclass()
+
+
+def _configured_index_opclass() -> tuple[str, str]:
+    if VECTOR_QUANTIZATION == "binary":
+        return "bit", "<~>"
+    if EMBEDDING_STORAGE == "vector" and EMBEDDING_DIM > _MAX_VECTOR_INDEX_DIM:
+        return "halfvec", "<=>"
+    return EMBEDDING_STORAGE, "<=>"
+
+
+def _index_expression(operand: str) -> str:
+    element_type, _ = _index_opclass()
+    if element_type == "bit":
+        return f"binary_quantize({operand})::bit({EMBEDDING_DIM})"
+    if element_type != EMBEDDING_STORAGE:
+        return f"{operand}::{element_type}({EMBEDDING_DIM})"
+    return operand
+
+
+def query_vector_cte(param: str = "%(query)s") -> str:
+    """WITH clause that binds the query vector once, as ``query_vector.v``."""
+    return f"WITH query_vector AS MATERIALIZED (SELECT {param}::{embedding_column_type()} AS v)"
+
+
+def vector_distance_sql(column: str = "embedding", query: str = "(SELECT v FROM query_vector)") -> str:
+    """Distance between ``column`` and the ``query`` vector, written so the ANN index applies.
+
+    The index may be built over an expression of the column (a ``halfvec`` cast above
+    pgvector's 2000-dim ``vector`` limit, or a binary quantization), and queries must
+    order by that same expression. By default the query vector is read from
+    ``query_vector`` through a scalar subquery, which the planner evaluates once and
+    still accepts as an index-scan argument.
+    """
+    _, operator = _index_opclass()
+    return f"{_index_expression(column)} {operator} {_index_expression(query)}"
+
+
+def _nearest_sql(columns: str, table: str, where: str, query: str, limit: str = "%(k)s") -> str:
+    exact = f"embedding <=> {query}"
+    if VECTOR_QUANTIZATION != "binary":
+        distance = vector_distance_sql(query=query)
+        return f"""
+            SELECT {columns}, 1 - ({distance}) AS similarity
+            FROM {table}
+            {where}
+            ORDER BY {distance}
+            LIMIT {limit}
+            """
+    return f"""
+            SELECT {columns}, 1 - ({exact}) AS similarity
+            FROM (
+                SELECT {columns}, embedding
+                FROM {table}
+                {where}
+                ORDER BY {vector_distance_sql(query=query)}
+                LIMIT {limit} * {RERANK_CANDIDATES_FACTOR}
+            ) AS candidates
+            ORDER BY {exact}
+            LIMIT {limit}
+            """
+
+
+def _best_per_group_sql(
+    columns: str, table: str, where: str, query: str, group: str, candidates_factor: int | None
+) -> str:
+    """The k best rows with distinct ``group`` values, each the group's closest row.
+
+    With ``candidates_factor`` the ANN index shortlists ``k * candidates_factor`` rows
+    that are then grouped; without it every row matching ``where`` is compared exactly,
+    which never misses a group but costs a distance per matching row.
+    """
+    if candidates_factor is None:
+        exact = f"embedding <=> {query}"
+        best = f"""
+            SELECT DISTINCT ON ({group}) {columns}, 1 - ({exact}) AS similarity
+            FROM {table}
+            {where}
+            ORDER BY {group}, {exact}
+            """
+    else:
+        nearest = _nearest_sql(columns, table, where, query, f"%(k)s * {max(1, candidates_factor)}")
+        best = f"""
+            SELECT DISTINCT ON ({group}) *
+            FROM ({nearest}) AS nearest
+            ORDER BY {group}, similarity DESC
+            """
+    return f"""
+            SELECT *
+            FROM ({best}) AS best
+            ORDER BY similarity DESC
+            LIMIT %(k)s
+            """
+
+
+def _search_sql(
+    columns: str, table: str, where: str, query: str, group: str | None, candidates_factor: int | None
+) -> str:
+    if group is None:
+        return _nearest_sql(columns, table, where, query)
+    return _best_per_group_sql(columns, table, where, query, group, candidates_factor)
+
+
+def vector_search_sql(
+    columns: str,
+    table: str,
+    where: str = "",
+    group: str | None = None,
+    candidates_factor: int | None = None,
+) -> str:
+    """Query returning ``columns`` plus cosine ``similarity`` for the k rows nearest the query.
+
+    Expects ``%(query)s`` and ``%(k)s`` parameters. With binary quantization the index
+    only shortlists ``k * RERANK_CANDIDATES_FACTOR`` rows by Hamming distance, which are
+    then reranked by exact cosine distance on the stored embeddings.
+
+    With ``group`` (an SQL expression over ``columns``, e.g. ``LOWER(company)``) the
+    result holds at most one row per group; see ``_best_per_group_sql`` for
+    ``candidates_factor``.
+    """
+    return query_vector_cte() + _search_sql(
+        columns, table, where, "(SELECT v FROM query_vector)", group, candidates_factor
+    )
+
+
+def vector_search_many_sql(
+    columns: str,
+    table: str,
+    where: str = "",
+    filters: tuple[tuple[str, str], ...] = (),
+    group: str | None = None,
+    candidates_factor: int | None = None,
+) -> str:
+    """``vector_search_sql`` for many query vectors in one statement, via a LATERAL join.
+
+    Expects ``%(queries)s`` (a list of vectors) and ``%(k)s``. Per-query filter values
+    are passed as parallel lists named by ``filters`` ((name, SQL type) pairs) and
+    referenced in ``where`` as ``q.<name>``. Rows carry the query's position as
+    ``query_index`` and come back grouped by query, best match first.
+    """
+    names = ["v", *(name for name, _ in filters)]
+    arrays = [f"%(queries)s::{embedding_column_type()}[]", *(f"%({name})s::{sql_type}[]" for name, sql_type in filters)]
+    return f"""
+            WITH q AS MATERIALIZED (
+                SELECT (ord - 1)::int AS query_index, {", ".join(names)}
+                FROM unnest({", ".join(arrays)}) WITH ORDINALITY AS u({", ".join(names)}, ord)
+            )
+            SELECT q.query_index, nearest.*
+            FROM q
+            CROSS JOIN LATERAL ({_search_sql(columns, table, where, "q.v", group, candidates_factor)}) AS nearest
+            ORDER BY q.query_index, nearest.similarity DESC
+            """
+
+
+def vector_index_name(table: str, index_type: str) -> str:
+    return f"idx_{table}_embedding_{index_type}"
+
+
+def sector_index_name(sector: str, index_type: str = VECTOR_INDEX_TYPE) -> str:
+    """Name of the partial ANN index over one sector's ``esg_documents`` rows."""
+    digest = sha1(sector.lower().encode("utf-8")).hexdigest()[:12]
+    return f"idx_esg_documents_embedding_{index_type}_sector_{digest}"
+
+
+def _sql_literal(value: str) -> str:
+    quoted = psycopg2.extensions.QuotedString(value)
+    quoted.encoding = "utf8"
+    return quoted.getquoted().decode("utf-8")
+
+
+def vector_index_ddl(table: str, concurrently: bool = False, sector: str | None = None) -> str | None:
+    """CREATE INDEX statement for the configured ANN index, or None when indexing is off.
+
+    With ``sector`` the index is partial over that (case-insensitive) sector of
+    ``esg_documents``; queries use it when they filter on ``LOWER(sector) = '<sector>'``
+    with the sector as a literal.
+    """
+    if VECTOR_INDEX_TYPE not in VECTOR_INDEX_TYPES:
+        return None
+    element_type, _ = _index_opclass()
+    expression = _index_expression("embedding")
+    if expression != "embedding":
+        expression = f"({expression})"
+    opclass = "bit_hamming_ops" if element_type == "bit" else f"{element_type}_cosine_ops"
+    if VECTOR_INDEX_TYPE == "hnsw":
+        options = f"WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION})"
+    else:
+        options = f"WITH (lists = {IVFFLAT_LISTS})"
+    name = vector_index_name(table, VECTOR_INDEX_TYPE) if sector is None else sector_index_name(sector)
+    where = "" if sector is None else f" WHERE LOWER(sector) = {_sql_literal(sector.lower())}"
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS "
+        f"{name} ON {table} "
+        f"USING {VECTOR_INDEX_TYPE} ({expression} {opclass}) {options}{where}"
+    )
+
+
+def sector_indexes(cur) -> tuple[dict[str, str], list[str]]:
+    """Partial sector indexes to keep ({name: sector}) and existing ones to drop.
+
+    Every sector above SECTOR_INDEX_MIN_ROWS rows should have an index of the
+    configured type; sector indexes of other types or of sectors that have shrunk
+    are stale. Counting sectors reads the whole sector index.
+    """
+    wanted: dict[str, str] = {}
+    if VECTOR_INDEX_TYPE in VECTOR_INDEX_TYPES:
+        cur.execute(
+            """
+            SELECT LOWER(sector)
+            FROM esg_documents
+            WHERE sector IS NOT NULL
+            GROUP BY LOWER(sector)
+            HAVING COUNT(*) > %s
+            """,
+            (SECTOR_INDEX_MIN_ROWS,),
+        )
+        wanted = {sector_index_name(sector): sector for (sector,) in cur.fetchall()}
+    cur.execute(
+        """
+        SELECT c.relname
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = 'esg_documents'::regclass
+          AND c.relname LIKE 'idx\\_esg\\_documents\\_embedding\\_%\\_sector\\_%'
+        """
+    )
+    stale = sorted(name for (name,) in cur.fetchall() if name not in wanted)
+    return wanted, stale
+
+
+def check_index_support(cur) -> str | None:
+    """Why the installed pgvector cannot build the configured ANN index, or None.
+
+    Also switches searches to plain column distances when the index expression
+    (a ``halfvec`` cast or binary quantization) is unavailable.
+    """
+    global _index_expression_supported
+    element_type, _ = _configured_index_opclass()
+    version = pgvector_version(cur)
+    supported = element_type == EMBEDDING_STORAGE or version >= _INDEX_EXPRESSION_MIN_VERSION
+    _index_expression_supported = supported
+    if supported:
+        return None
+    installed = ".".join(map(str, version)) or "not installed"
+    return (
+        f"indexing {EMBEDDING_DIM}-dim embeddings as {element_type} needs pgvector 0.7+ "
+        f"(installed: {installed}); set EMBEDDING_DIM <= {_MAX_VECTOR_INDEX_DIM} or upgrade pgvector"
+    )
+
+
+def ensure_vector_indexes(cur, force: bool = False) -> None:
+    """Create the configured ANN index on each vector table and drop indexes of other types.
+
+    Building an index over a large existing table is slow and blocks writes, so tables
+    estimated above VECTOR_INDEX_AUTO_BUILD_MAX_ROWS are left for
+    ``python -m backend.migrate build-indexes`` unless ``force`` is set, and so are the
+    partial indexes of sectors above SECTOR_INDEX_MIN_ROWS. When the installed
+    pgvector cannot build the index, searches run exact and nothing is built.
+    """
+    if VECTOR_INDEX_TYPE in VECTOR_INDEX_TYPES:
+        unsupported = check_index_support(cur)
+        if unsupported:
+            print(f"Skipping {VECTOR_INDEX_TYPE} indexes: {unsupported}.")
+            return
+    for table in VECTOR_TABLES:
+        for index_type in VECTOR_INDEX_TYPES:
+            if index_type != VECTOR_INDEX_TYPE:
+                cur.execute(f"DROP INDEX IF EXISTS {vector_index_name(table, index_type)}")
+        ddl = vector_index_ddl(table)
+        if ddl is None:
+            continue
+        cur.execute("SELECT to_regclass(%s)", (vector_index_name(table, VECTOR_INDEX_TYPE),))
+        if cur.fetchone()[0] is not None:
+            continue
+        cur.execute("SELECT GREATEST(reltuples, 0)::BIGINT FROM pg_class WHERE oid = %s::regclass", (table,))
+        estimated_rows = cur.fetchone()[0]
+        if estimated_rows > VECTOR_INDEX_AUTO_BUILD_MAX_ROWS and not force:
+            print(
+                f"Skipping {VECTOR_INDEX_TYPE} index build on {table} (~{estimated_rows} rows); "
+                "run `python -m backend.migrate build-indexes` during a maintenance window."
+            )
+            continue
+        cur.execute(ddl)
+
+    cur.execute("SELECT GREATEST(reltuples, 0)::BIGINT FROM pg_class WHERE oid = 'esg_documents'::regclass")
+    if cur.fetchone()[0] > VECTOR_INDEX_AUTO_BUILD_MAX_ROWS and not force:
+        return
+    wanted, stale = sector_indexes(cur)
+    for name in stale:
+        cur.execute(f"DROP INDEX IF EXISTS {name}")
+    for sector in wanted.values():
+        cur.execute(vector_index_ddl("esg_documents", sector=sector))
+
+
+def company_scope(company: str) -> str:
+    return f"company:{company.strip().lower()}"
+
+
+def sector_scope(sector: str) -> str:
+    return f"sector:{sector.strip().lower()}"
+
+
+GREENWASH_SCOPE = "greenwash"
+
+
+def bump_corpus_versions(cur, scopes: list[str]) -> None:
+    """Increment the change counter of each scope inside the caller's transaction."""
+    if not scopes:
+        return
+    cur.execute(
+        """
+        INSERT INTO corpus_versions (scope, version)
+        SELECT scope, 1 FROM unnest(%s::text[]) AS scope
+        ON CONFLICT (scope) DO UPDATE
+        SET version = corpus_versions.version + 1, updated_at = NOW()
+        """,
+        (sorted(set(scopes)),),
+    )
+
+
+def fetch_corpus_versions(scopes: list[str]) -> dict[str, int]:
+    """Return the current version of each scope (0 for scopes never bumped)."""
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT scope, version FROM corpus_versions WHERE scope = ANY(%s)",
+            (list(scopes),),
+        )
+        found = dict(cur.fetchall())
+    return {scope: found.get(scope, 0) for scope in scopes}
+
+
+_PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+_PGCOPY_TRAILER = struct.pack("!h", -1)
+
+
+def _encode_copy_value(value, pg_type: str) -> bytes:
+    if pg_type == "int4":
+        return struct.pack("!i", value)
+    if pg_type == "text":
+        return str(value).encode("utf-8")
+    if pg_type in ("vector", "halfvec"):
+        # pgvector binary format: int16 dim, int16 unused, big-endian float4 (or float2) components.
+        components = np.asarray(value, dtype=">f4" if pg_type == "vector" else ">f2")
+        return struct.pack("!hh", components.size, 0) + components.tobytes()
+    raise ValueError(f"Unsupported COPY column type: {pg_type}")
+
+
+def copy_rows(cur, table: str, columns: list[tuple[str, str]], rows: Iterable[tuple]) -> int:
+    """Bulk-load rows into ``table`` with one binary COPY ... FROM STDIN; returns the row count.
+
+    ``columns`` pairs each column name with its wire type (``int4``, ``text``, ``vector``
+    or ``halfvec``). Vectors travel as raw float bytes instead of decimal text.
+    """
+    buffer = io.BytesIO()
+    buffer.write(_PGCOPY_HEADER)
+    field_count = struct.pack("!h", len(columns))
+    count = 0
+    for row in rows:
+        buffer.write(field_count)
+        for value, (_name, pg_type) in zip(row, columns):
+            if value is None:
+                buffer.write(struct.pack("!i", -1))
+                continue
+            encoded = _encode_copy_value(value, pg_type)
+            buffer.write(struct.pack("!i", len(encoded)))
+            buffer.write(encoded)
+        count += 1
+    buffer.write(_PGCOPY_TRAILER)
+    if count:
+        buffer.seek(0)
+        names = ", ".join(name for name, _ in columns)
+        cur.copy_expert(f"COPY {table} ({names}) FROM STDIN WITH (FORMAT binary)", buffer)
+    return count
+
+
+_pgvector_version: tuple[int, ...] | None = None
+
+
+def pgvector_version(cur) -> tuple[int, ...]:
+    """Installed pgvector extension version, e.g. ``(0, 8, 0)``; looked up once per process."""
+    global _pgvector_version
+    if _pgvector_version is None:
+        cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        row = cur.fetchone()
+        _pgvector_version = tuple(int(part) for part in re.findall(r"\d+", row[0])) if row else ()
+    return _pgvector_version
+
+
+def set_search_params(
+    cur, ef_search: int | None = None, probes: int | None = None, iterative: bool = False
+) -> None:
+    """Apply per-query ANN search settings for the current transaction only.
+
+    ``iterative`` lets filtered index scans keep going until LIMIT rows pass the
+    filter (pgvector 0.8+; rows may come back slightly out of order, so re-sort).
+    """
+    if VECTOR_INDEX_TYPE == "hnsw":
+        cur.execute("SELECT set_config('hnsw.ef_search', %s, true)", (str(ef_search or HNSW_EF_SEARCH),))
+    elif VECTOR_INDEX_TYPE == "ivfflat":
+        cur.execute("SELECT set_config('ivfflat.probes', %s, true)", (str(probes or IVFFLAT_PROBES),))
+    if iterative and VECTOR_INDEX_TYPE in VECTOR_INDEX_TYPES and pgvector_version(cur) >= (0, 8):
+        cur.execute(f"SELECT set_config('{VECTOR_INDEX_TYPE}.iterative_scan', 'relaxed_order', true)")
+
+
+def _create_schema(cur) -> None:
     cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
+    embedding_type = embedding_column_type()
+    # One row per ingested source document; its embedded chunks live in esg_documents.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS esg_sources (
+            id SERIAL PRIMARY KEY,
+            company TEXT,
+            sector TEXT,
+            doc_type TEXT,
+            source_url TEXT,
+            source_title TEXT,
+            source_publisher TEXT,
+            published_at TEXT,
+            retrieved_at TEXT,
+            source_type TEXT,
+            retrieval_method TEXT,
+            content_hash TEXT,
+            chars INTEGER,
+            chunk_count INTEGER,
+            created_at TIMESTAMPTZ DEFAULT NOW()
+        );
+        """
+    )
+    cur.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_esg_sources_content_hash
+        ON esg_sources (content_hash);
+        """
+    )
+    # Company lookups match on LOWER(company) and read the newest sources first, so
+    # these serve "WHERE LOWER(company) = ... ORDER BY id DESC LIMIT k" as a range scan.
+    cur.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_esg_sources_company_recent
+        ON esg_sources (LOWER(company), id DESC);
+        """
+    )
     cur.execute(
         """
+        CREATE INDEX IF NOT EXISTS idx_esg_sources_company_urls
+        ON esg_sources (LOWER(company), id DESC)
+        WHERE source_url IS NOT NULL;
+        """
+    )
+    cur.execute(
+        f"""
         CREATE TABLE IF NOT EXISTS esg_documents (
             id SERIAL PRIMARY KEY,
             company TEXT,
             sector TEXT,
             doc_type TEXT,
             content TEXT,
-            embedding VECTOR(3072),
+            embedding {embedding_type},
             source_url TEXT,
             source_title TEXT,
             source_publisher TEXT,
@@ -38,7 +896,10 @@ def init_db():
             retrieved_at TEXT,
             source_type TEXT,
             retrieval_method TEXT,
-            content_hash TEXT
+            content_hash TEXT,
+            parent_id INTEGER REFERENCES esg_sources (id) ON DELETE CASCADE,
+            chunk_index INTEGER NOT NULL DEFAULT 0,
+            chunk_start INTEGER NOT NULL DEFAULT 0
         );
         """
     )
@@ -52,6 +913,9 @@ def init_db():
         "ALTER TABLE esg_documents ADD COLUMN IF NOT EXISTS source_type TEXT;",
         "ALTER TABLE esg_documents ADD COLUMN IF NOT EXISTS retrieval_method TEXT;",
         "ALTER TABLE esg_documents ADD COLUMN IF NOT EXISTS content_hash TEXT;",
+        "ALTER TABLE esg_documents ADD COLUMN IF NOT EXISTS parent_id INTEGER REFERENCES esg_sources (id) ON DELETE CASCADE;",
+        "ALTER TABLE esg_documents ADD COLUMN IF NOT EXISTS chunk_index INTEGER NOT NULL DEFAULT 0;",
+        "ALTER TABLE esg_documents ADD COLUMN IF NOT EXISTS chunk_start INTEGER NOT NULL DEFAULT 0;",
     ):
         cur.execute(ddl)
     cur.execute(
@@ -62,13 +926,117 @@ def init_db():
     )
     cur.execute(
         """
+        CREATE INDEX IF NOT EXISTS idx_esg_documents_parent
+        ON esg_documents (parent_id, chunk_index);
+        """
+    )
+    # Peer search filters chunks on LOWER(sector) and excludes LOWER(company).
+    cur.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_esg_documents_sector_company
+        ON esg_documents (LOWER(sector), LOWER(company));
+        """
+    )
+    _backfill_esg_sources(cur)
+    # Change counters per scope ("company:<name>", "sector:<name>", "greenwash"),
+    # bumped by ingestion so cached analyses can tell when their inputs changed.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS corpus_versions (
+            scope TEXT PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMPTZ DEFAULT NOW()
+        );
+        """
+    )
+    cur.execute(
+        f"""
         CREATE TABLE IF NOT EXISTS greenwash_examples (
             id SERIAL PRIMARY KEY,
             content TEXT,
-            embedding VECTOR(3072)
+            embedding {embedding_type},
+            content_hash TEXT
         );
         """
     )
-    conn.commit()
-    cur.close()
-    conn.close()
+    cur.execute("ALTER TABLE greenwash_examples ADD COLUMN IF NOT EXISTS content_hash TEXT;")
+    _backfill_greenwash_hashes(cur)
+    cur.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_greenwash_examples_content_hash
+        ON greenwash_examples (content_hash);
+        """
+    )
+
+
+def _backfill_greenwash_hashes(cur) -> None:
+    """Hash greenwash rows from before content_hash existed and drop their duplicates.
+
+    Earlier ingestion re-inserted every case file on each run; the oldest copy is kept.
+    """
+    cur.execute("SELECT 1 FROM greenwash_examples WHERE content_hash IS NULL LIMIT 1")
+    if cur.fetchone() is None:
+        return
+    cur.execute(
+        """
+        UPDATE greenwash_examples
+        SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex')
+        WHERE content_hash IS NULL AND content IS NOT NULL
+        """
+    )
+    cur.execute(
+        """
+        DELETE FROM greenwash_examples newer
+        USING greenwash_examples older
+        WHERE newer.content_hash = older.content_hash AND newer.id > older.id
+        """
+    )
+    if cur.rowcount:
+        bump_corpus_versions(cur, [GREENWASH_SCOPE])
+
+
+def _backfill_esg_sources(cur) -> None:
+    """Give whole-document rows from before chunking a parent esg_sources row.
+
+    Each legacy row becomes a single-chunk source that reuses the row's id, so the
+    mapping back is trivial and later inserts continue from the highest id.
+    """
+    cur.execute("SELECT 1 FROM esg_documents WHERE parent_id IS NULL LIMIT 1")
+    if cur.fetchone() is None:
+        return
+    cur.execute(
+        """
+        INSERT INTO esg_sources (
+            id, company, sector, doc_type,
+            source_url, source_title, source_publisher,
+            published_at, retrieved_at, source_type, retrieval_method,
+            content_hash, chars, chunk_count
+        )
+        SELECT
+            id, company, sector, doc_type,
+            source_url, source_title, source_publisher,
+            published_at, retrieved_at, source_type, retrieval_method,
+            content_hash, LENGTH(content), 1
+        FROM esg_documents
+        WHERE parent_id IS NULL
+        ON CONFLICT (id) DO NOTHING
+        """
+    )
+    cur.execute(
+        """
+        UPDATE esg_documents d
+        SET parent_id = d.id
+        FROM esg_sources s
+        WHERE d.parent_id IS NULL
+          AND s.id = d.id
+          AND s.content_hash IS NOT DISTINCT FROM d.content_hash
+        """
+    )
+    cur.execute(
+        """
+        SELECT setval(
+            pg_get_serial_sequence('esg_sources', 'id'),
+            GREATEST((SELECT MAX(id) FROM esg_sources), 1)
+        )
+        """
+    )
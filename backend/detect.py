@@ -1,67 +1,395 @@
-from backend.db import get_conn
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from backend.claims import CLAIMS_MAX_CHUNKS_PER_SOURCE
+from backend.db import (
+    HNSW_EF_SEARCH,
+    SECTOR_INDEX_MIN_ROWS,
+    VECTOR_INDEX_TYPE,
+    Vector,
+    connection,
+    sector_index_name,
+    set_search_params,
+    vector_search_many_sql,
+    vector_search_sql,
+)
 from backend.embed import embed_text
+from backend.greenwash_index import greenwash_index
+from backend.metrics import histogram
 
+SEARCH_SECONDS = histogram(
+    "search_duration_seconds",
+    "Retrieval query latency by search, including any query embedding.",
+    ("search",),
+)
 
-def search_similar_greenwash(text: str, k: int = 5) -> list[tuple[str, float]]:
-    """Return top-k greenwash examples most similar to the query text."""
-    emb = embed_text(text)
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT content, 1 - (embedding <=> %s::vector) AS similarity
-        FROM greenwash_examples
-        ORDER BY embedding <=> %s::vector
-        LIMIT %s
-        """,
-        (str(emb), str(emb), k),
-    )
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    return rows
+# Peer search compares every chunk of sectors up to this size exactly; larger sectors
+# use their partial sector index (or, until it is built, the table's ANN index) and
+# group a PEER_CANDIDATES_FACTOR * k shortlist by company.
+PEER_EXACT_MAX_ROWS = int(os.getenv("PEER_EXACT_MAX_ROWS", str(SECTOR_INDEX_MIN_ROWS)))
+PEER_CANDIDATES_FACTOR = int(os.getenv("PEER_CANDIDATES_FACTOR", "10"))
+PEER_SECTOR_SIZE_TTL_SEC = float(os.getenv("PEER_SECTOR_SIZE_TTL_SEC", "300"))
+PEER_SECTOR_CACHE_MAX = int(os.getenv("PEER_SECTOR_CACHE_MAX", "1024"))
+
+# Peer search modes: every sector row compared exactly, the sector's partial ANN
+# index, or the table-wide ANN index filtered to the sector.
+_EXACT = "exact"
+_SECTOR_INDEX = "sector_index"
+_ANN = "ann"
+
+# Lower-cased sector -> (search mode, monotonic time decided), least recently used first.
+_sector_modes: OrderedDict[str, tuple[str, float]] = OrderedDict()
+_sector_modes_lock = threading.Lock()
+
+
+@SEARCH_SECONDS.time(search="greenwash")
+def search_similar_greenwash(
+    text: str,
+    k: int = 5,
+    ef_search: int | None = None,
+    probes: int | None = None,
+    embedding: np.ndarray | None = None,
+) -> list[tuple[str, float]]:
+    """Return top-k greenwash examples most similar to the query text.
+
+    Pass ``embedding`` when the caller has already embedded ``text``. Served from the
+    in-memory greenwash index when it is loaded (exact search, so ``ef_search`` and
+    ``probes`` only apply to the database fallback).
+    """
+    emb = embedding if embedding is not None else embed_text(text)
+    if greenwash_index.ready:
+        return greenwash_index.search(emb, k)
+    with connection() as conn, conn.cursor() as cur:
+        set_search_params(cur, ef_search=ef_search, probes=probes)
+        cur.execute(
+            vector_search_sql("content", "greenwash_examples"),
+            {"query": Vector(emb), "k": k},
+        )
+        return cur.fetchall()
 
 
+@SEARCH_SECONDS.time(search="greenwash_many")
+def search_similar_greenwash_many(
+    embeddings: list[np.ndarray],
+    k: int = 5,
+    ef_search: int | None = None,
+    probes: int | None = None,
+) -> list[list[tuple[str, float]]]:
+    """``search_similar_greenwash`` for many pre-computed query embeddings at once."""
+    if greenwash_index.ready:
+        return greenwash_index.search_many(embeddings, k)
+    results: list[list[tuple[str, float]]] = [[] for _ in embeddings]
+    if not embeddings:
+        return results
+    with connection() as conn, conn.cursor() as cur:
+        set_search_params(cur, ef_search=ef_search, probes=probes)
+        cur.execute(
+            vector_search_many_sql("content", "greenwash_examples"),
+            {"queries": [Vector(emb) for emb in embeddings], "k": k},
+        )
+        for query_index, content, similarity in cur.fetchall():
+            results[query_index].append((content, similarity))
+    return results
+
+
+@SEARCH_SECONDS.time(search="company_esg")
 def search_company_esg(company: str, k: int = 8) -> list[tuple[str, str, str, str | None, str | None, str | None, str | None]]:
-    """Return the company's own ESG document chunks."""
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT content, sector, doc_type, source_url, source_title, source_publisher, published_at
-        FROM esg_documents
-        WHERE LOWER(company) = LOWER(%s)
-        ORDER BY id DESC
-        LIMIT %s
-        """,
-        (company, k),
-    )
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    return rows
+    """Return the leading chunk of each of the company's k most recent ESG sources."""
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT d.content, s.sector, s.doc_type, s.source_url, s.source_title, s.source_publisher, s.published_at
+            FROM esg_sources s
+            JOIN esg_documents d ON d.parent_id = s.id AND d.chunk_index = 0
+            WHERE LOWER(s.company) = LOWER(%s)
+            ORDER BY s.id DESC
+            LIMIT %s
+            """,
+            (company, k),
+        )
+        return cur.fetchall()
+
+
+@SEARCH_SECONDS.time(search="company_esg_many")
+def search_company_esg_many(
+    companies: list[str], k: int = 8
+) -> dict[str, list[tuple[str, str, str, str | None, str | None, str | None, str | None]]]:
+    """``search_company_esg`` for many companies in one query, keyed by lower-cased name."""
+    results: dict[str, list] = {company.lower(): [] for company in companies}
+    if not companies:
+        return results
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT c.company_key, r.content, r.sector, r.doc_type, r.source_url, r.source_title, r.source_publisher,
+                   r.published_at
+            FROM unnest(%s::text[]) AS c(company_key)
+            CROSS JOIN LATERAL (
+                SELECT s.id, d.content, s.sector, s.doc_type, s.source_url, s.source_title, s.source_publisher,
+                       s.published_at
+                FROM esg_sources s
+                JOIN esg_documents d ON d.parent_id = s.id AND d.chunk_index = 0
+                WHERE LOWER(s.company) = c.company_key
+                ORDER BY s.id DESC
+                LIMIT %s
+            ) AS r
+            ORDER BY c.company_key, r.id DESC
+            """,
+            (list(results), k),
+        )
+        for company_key, *row in cur.fetchall():
+            results[company_key].append(tuple(row))
+    return results
+
+
+@SEARCH_SECONDS.time(search="company_chunks")
+def search_company_chunks(
+    company: str, k: int = 8, max_chunks: int = CLAIMS_MAX_CHUNKS_PER_SOURCE
+) -> list[tuple[int, str]]:
+    """Return (chunk_index, content) of every chunk of the company's k most recent ESG
+    sources, up to ``max_chunks`` per source, newest source first and in document order.
+    """
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT d.chunk_index, d.content
+            FROM (
+                SELECT id FROM esg_sources WHERE LOWER(company) = LOWER(%s) ORDER BY id DESC LIMIT %s
+            ) AS s
+            JOIN esg_documents d ON d.parent_id = s.id AND d.chunk_index < %s
+            ORDER BY s.id DESC, d.chunk_index
+            """,
+            (company, k, max_chunks),
+        )
+        return cur.fetchall()
+
 
+@SEARCH_SECONDS.time(search="company_chunks_many")
+def search_company_chunks_many(
+    companies: list[str], k: int = 8, max_chunks: int = CLAIMS_MAX_CHUNKS_PER_SOURCE
+) -> dict[str, list[tuple[int, str]]]:
+    """``search_company_chunks`` for many companies in one query, keyed by lower-cased name."""
+    results: dict[str, list] = {company.lower(): [] for company in companies}
+    if not companies:
+        return results
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT c.company_key, d.chunk_index, d.content
+            FROM unnest(%s::text[]) AS c(company_key)
+            CROSS JOIN LATERAL (
+                SELECT s.id FROM esg_sources s
+                WHERE LOWER(s.company) = c.company_key
+                ORDER BY s.id DESC
+                LIMIT %s
+            ) AS r
+            JOIN esg_documents d ON d.parent_id = r.id AND d.chunk_index < %s
+            ORDER BY c.company_key, r.id DESC, d.chunk_index
+            """,
+            (list(results), k, max_chunks),
+        )
+        for company_key, chunk_index, content in cur.fetchall():
+            results[company_key].append((chunk_index, content))
+    return results
 
-def search_peer_esg(company: str, sector: str, text: str, k: int = 5) -> list[tuple[str, str, float]]:
-    """Return ESG docs from same-sector peers, ranked by similarity to the query text."""
-    emb = embed_text(text)
-    conn = get_conn()
-    cur = conn.cursor()
+
+def _remember_sector_mode(key: str, mode: str, now: float) -> None:
+    with _sector_modes_lock:
+        _sector_modes[key] = (mode, now)
+        _sector_modes.move_to_end(key)
+        while len(_sector_modes) > PEER_SECTOR_CACHE_MAX:
+            _sector_modes.popitem(last=False)
+
+
+def _peer_search_modes(cur, sectors: list[str]) -> dict[str, str]:
+    """Search mode per lower-cased sector.
+
+    Sector sizes are counted up to PEER_EXACT_MAX_ROWS (so the check stays cheap for
+    large sectors), checked for a valid partial sector index, and the resulting mode
+    is cached for PEER_SECTOR_SIZE_TTL_SEC.
+    """
+    keys = {sector.lower(): sector for sector in sectors}
+    if VECTOR_INDEX_TYPE not in ("hnsw", "ivfflat"):
+        return dict.fromkeys(keys, _EXACT)
+    now = time.monotonic()
+    modes: dict[str, str] = {}
+    with _sector_modes_lock:
+        for key in keys:
+            cached = _sector_modes.get(key)
+            if cached is not None and now - cached[1] <= PEER_SECTOR_SIZE_TTL_SEC:
+                _sector_modes.move_to_end(key)
+                modes[key] = cached[0]
+    stale = [sector for key, sector in keys.items() if key not in modes]
+    if stale:
+        cur.execute(
+            """
+            SELECT s.sector, (
+                SELECT COUNT(*) FROM (
+                    SELECT 1 FROM esg_documents WHERE LOWER(sector) = LOWER(s.sector) LIMIT %s
+                ) AS capped
+            ), EXISTS (
+                SELECT 1 FROM pg_index WHERE indexrelid = to_regclass(s.index_name) AND indisvalid
+            )
+            FROM unnest(%s::text[], %s::text[]) AS s(sector, index_name)
+            """,
+            (PEER_EXACT_MAX_ROWS + 1, stale, [sector_index_name(sector) for sector in stale]),
+        )
+        for sector, rows, indexed in cur.fetchall():
+            if rows <= PEER_EXACT_MAX_ROWS:
+                mode = _EXACT
+            else:
+                mode = _SECTOR_INDEX if indexed else _ANN
+            modes[sector.lower()] = mode
+            _remember_sector_mode(sector.lower(), mode, now)
+    return modes
+
+
+def _set_peer_search_params(cur, k: int, candidates_factor: int | None, ef_search: int | None, probes: int | None):
+    if candidates_factor is not None and ef_search is None:
+        # The HNSW candidate list must hold the whole shortlist (pgvector caps it at 1000).
+        ef_search = min(1000, max(HNSW_EF_SEARCH, k * candidates_factor))
+    set_search_params(cur, ef_search=ef_search, probes=probes, iterative=candidates_factor is not None)
+
+
+def _peer_query(
+    cur,
+    queries: list[tuple[str, str]],
+    embeddings: list[np.ndarray],
+    k: int,
+    mode: str,
+    ef_search: int | None,
+    probes: int | None,
+    sector: str | None = None,
+) -> list[list[tuple[str, str, float]]]:
+    """One LATERAL peer search; ``sector`` (lower-cased) is required for _SECTOR_INDEX.
+
+    A partial index is only used when the query's sector is a literal that matches
+    its predicate, so that mode searches one sector per statement.
+    """
+    results: list[list[tuple[str, str, float]]] = [[] for _ in queries]
+    candidates_factor = None if mode == _EXACT else PEER_CANDIDATES_FACTOR
+    _set_peer_search_params(cur, k, candidates_factor, ef_search, probes)
+    sector_filter = "LOWER(sector) = %(sector_key)s" if mode == _SECTOR_INDEX else "LOWER(sector) = LOWER(q.sector)"
     cur.execute(
-        """
-        SELECT content, company, 1 - (embedding <=> %s::vector) AS similarity
-        FROM esg_documents
-        WHERE LOWER(sector) = LOWER(%s)
-          AND LOWER(company) != LOWER(%s)
-        ORDER BY embedding <=> %s::vector
-        LIMIT %s
-        """,
-        (str(emb), sector, company, str(emb), k),
+        vector_search_many_sql(
+            "content, company",
+            "esg_documents",
+            f"WHERE {sector_filter} AND LOWER(company) != LOWER(q.company)",
+            filters=(("company", "text"), ("sector", "text")),
+            group="LOWER(company)",
+            candidates_factor=candidates_factor,
+        ),
+        {
+            "queries": [Vector(emb) for emb in embeddings],
+            "company": [company for company, _ in queries],
+            "sector": [sector for _, sector in queries],
+            "sector_key": sector,
+            "k": k,
+        },
     )
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    return rows
+    for query_index, content, company, similarity in cur.fetchall():
+        results[query_index].append((content, company, similarity))
+    return results
+
+
+@SEARCH_SECONDS.time(search="peer_esg")
+def search_peer_esg(
+    company: str,
+    sector: str | None,
+    text: str,
+    k: int = 5,
+    ef_search: int | None = None,
+    probes: int | None = None,
+    embedding: np.ndarray | None = None,
+) -> list[tuple[str, str, float]]:
+    """Return the best-matching ESG chunk of up to k same-sector peers, most similar first.
+
+    Sectors of up to PEER_EXACT_MAX_ROWS chunks are searched exactly through the
+    sector index, so results never depend on how the ANN index filters. Larger ones
+    use their partial sector index (see ``backend.db.sector_indexes``) with a
+    PEER_CANDIDATES_FACTOR times larger shortlist; until it is built they use the
+    table-wide ANN index with the sector as a filter and, on pgvector 0.8+,
+    iterative scans. If fewer than k peers come back, the search is repeated
+    exactly. A company without a sector has no peers.
+    """
+    if not sector:
+        return []
+    return _search_peers(
+        [(company, sector)],
+        [embedding if embedding is not None else embed_text(text)],
+        k,
+        ef_search,
+        probes,
+    )[0]
+
+
+@SEARCH_SECONDS.time(search="peer_esg_many")
+def search_peer_esg_many(
+    queries: list[tuple[str, str | None]],
+    embeddings: list[np.ndarray],
+    k: int = 5,
+    ef_search: int | None = None,
+    probes: int | None = None,
+) -> list[list[tuple[str, str, float]]]:
+    """``search_peer_esg`` for many (company, sector) pairs and their embeddings.
+
+    One query for the exactly searched sectors, one per sector with a partial index
+    and one for the rest, plus one exact query for ANN searches that came back
+    with fewer than k peers.
+    """
+    return _search_peers(queries, embeddings, k, ef_search, probes)
+
+
+def _search_peers(
+    queries: list[tuple[str, str | None]],
+    embeddings: list[np.ndarray],
+    k: int,
+    ef_search: int | None,
+    probes: int | None,
+) -> list[list[tuple[str, str, float]]]:
+    results: list[list[tuple[str, str, float]]] = [[] for _ in queries]
+    searchable = [index for index, (_, sector) in enumerate(queries) if sector]
+    if not searchable:
+        return results
+    with connection() as conn, conn.cursor() as cur:
+        modes = _peer_search_modes(cur, [queries[index][1] for index in searchable])
+        groups: dict[tuple[str, str | None], list[int]] = {}
+        for index in searchable:
+            key = queries[index][1].lower()
+            mode = modes[key]
+            groups.setdefault((mode, key if mode == _SECTOR_INDEX else None), []).append(index)
+        short: list[int] = []
+        for (mode, sector), indexes in groups.items():
+            rows = _peer_query(
+                cur,
+                [queries[index] for index in indexes],
+                [embeddings[index] for index in indexes],
+                k, mode, ef_search, probes, sector,
+            )
+            for index, peers in zip(indexes, rows):
+                results[index] = peers
+                if mode != _EXACT and len(peers) < k:
+                    short.append(index)
+        if short:
+            # The shortlist held too few other companies (or, without a sector index,
+            # the sector filter emptied it on pgvector < 0.8). Search those sectors
+            # exactly until their mode expires.
+            now = time.monotonic()
+            for index in short:
+                _remember_sector_mode(queries[index][1].lower(), _EXACT, now)
+            rows = _peer_query(
+                cur,
+                [queries[index] for index in short],
+                [embeddings[index] for index in short],
+                k, _EXACT, ef_search, probes,
+            )
+            for index, peers in zip(short, rows):
+                results[index] = peers
+    return results
 
 
 def risk_score(similarities: list[tuple[str, float]]) -> float:
@@ -1,19 +1,33 @@
 import json
 import os
 import re
+import threading
 import time
 import urllib.parse
 import urllib.request
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from datetime import UTC, datetime
 from html import unescape
-from io import BytesIO
-from typing import Any
+from typing import Any, Callable
 
 from openai import APIConnectionError, APITimeoutError, OpenAI, RateLimitError
-from pypdf import PdfReader
 
-from backend.ingest import ingest_esg_doc
+from backend.ingest import EsgDocument, ingest_esg_docs
+from backend.metrics import histogram
+from backend.pdf_extract import extract_pdf_text
+
+MAX_SOURCE_CHARS = 15000
+DISCOVERY_STAGE_SECONDS = histogram(
+    "discovery_stage_duration_seconds",
+    "Discovery stage latency: the web search call and each micro-batch ingest.",
+    ("stage", "outcome"),
+)
+DISCOVERY_FETCH_SECONDS = histogram(
+    "discovery_fetch_duration_seconds",
+    "Download and text extraction time of one discovered source.",
+    ("outcome",),
+)
 
 
 @dataclass
@@ -51,16 +65,6 @@ def _clean_text(value: str) -> str:
     return re.sub(r"\s+", " ", no_entities).strip()
 
 
-def _extract_pdf_text(data: bytes) -> str:
-    reader = PdfReader(BytesIO(data))
-    pages = []
-    for page in reader.pages:
-        text = (page.extract_text() or "").strip()
-        if text:
-            pages.append(text)
-    return "\n\n".join(pages).strip()
-
-
 def _fetch_source_text(url: str, timeout_sec: int = 20) -> str:
     req = urllib.request.Request(
         url,
@@ -74,7 +78,8 @@ def _fetch_source_text(url: str, timeout_sec: int = 20) -> str:
 
     if "pdf" in ctype or url.lower().endswith(".pdf"):
         try:
-            return _extract_pdf_text(raw)
+            # Only the first MAX_SOURCE_CHARS are kept, so stop extracting there.
+            return extract_pdf_text(raw, max_chars=MAX_SOURCE_CHARS)
         except Exception:
             return ""
 
@@ -282,10 +287,162 @@ def _dedupe_candidates(candidates: list[SourceCandidate]) -> list[SourceCandidat
     return deduped
 
 
+def _fetch_candidate(
+    candidate: SourceCandidate,
+    deadline: float,
+    per_source_timeout_sec: int,
+    host_limits: dict[str, threading.Semaphore],
+    cancelled: threading.Event,
+) -> tuple[str, str | None]:
+    """Fetch and extract one candidate; returns (status, document body or None)."""
+    host_limit = host_limits[_domain_from_url(candidate.url)]
+    if not host_limit.acquire(timeout=max(0.0, deadline - time.monotonic())):
+        return "cut_off", None
+    try:
+        remaining = deadline - time.monotonic()
+        if cancelled.is_set() or remaining <= 0:
+            return "cut_off", None
+        with DISCOVERY_FETCH_SECONDS.time(outcome="error") as timer:
+            try:
+                timeout_sec = max(1, min(per_source_timeout_sec, int(remaining)))
+                extracted = _fetch_source_text(candidate.url, timeout_sec=timeout_sec)
+            except Exception:
+                return "fetch_failed", None
+            timer.labels["outcome"] = "ok"
+    finally:
+        host_limit.release()
+
+    if len(extracted) < 240:
+        return "too_short", None
+    trimmed = extracted[:MAX_SOURCE_CHARS]
+    return "fetched", f"{candidate.title}\n\n{candidate.snippet}\n\n{trimmed}".strip()
+
+
+def _fetch_and_ingest(
+    candidates: list[SourceCandidate],
+    company: str,
+    sector: str,
+    deadline: float,
+    per_source_timeout_sec: int,
+    max_workers: int,
+    per_host_limit: int,
+    progress: Callable[[dict], None] | None = None,
+) -> tuple[list[str], int]:
+    """Fetch candidates concurrently and ingest them as they arrive, all before ``deadline``.
+
+    Fetched sources are ingested in micro-batches whenever fetches complete, so
+    embedding overlaps with the remaining downloads. Ingest time counts against the
+    budget: each batch is trimmed to what the observed ingest rate says fits before
+    the deadline (the first document alone sets the rate), and fetched sources that
+    do not fit are reported as "deferred". When the deadline passes, queued fetches
+    are cancelled ("cut_off") and running ones are abandoned ("timed_out").
+    Returns one status per candidate and the number of newly ingested documents.
+    ``progress`` is called with fetch/ingest counts as candidates complete.
+    """
+    statuses = ["cut_off"] * len(candidates)
+    if not candidates:
+        return statuses, 0
+
+    host_limits = {
+        host: threading.Semaphore(max(1, per_host_limit))
+        for host in {_domain_from_url(candidate.url) for candidate in candidates}
+    }
+    cancelled = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(candidates))))
+    futures = {
+        executor.submit(_fetch_candidate, candidate, deadline, per_source_timeout_sec, host_limits, cancelled): idx
+        for idx, candidate in enumerate(candidates)
+    }
+    pending = set(futures)
+    ingested = 0
+    ingest_sec_per_char: float | None = None
+
+    def report_progress() -> None:
+        if progress is not None:
+            progress(
+                {
+                    "stage": "fetching",
+                    "candidates": len(candidates),
+                    "completed": len(candidates) - len(pending),
+                    "ingested": ingested,
+                }
+            )
+
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            ready: list[tuple[int, str]] = []
+            for future in done:
+                idx = futures[future]
+                status, body = future.result()
+                statuses[idx] = status
+                if body is not None:
+                    ready.append((idx, body))
+            while ready:
+                remaining = deadline - time.monotonic()
+                fits = 0
+                if ingest_sec_per_char is None:
+                    fits = 1 if remaining > 0 else 0
+                else:
+                    cost = 0.0
+                    for _idx, body in ready:
+                        cost += len(body) * ingest_sec_per_char
+                        if cost > remaining:
+                            break
+                        fits += 1
+                if not fits:
+                    for idx, _body in ready:
+                        statuses[idx] = "deferred"
+                    break
+                batch, ready = ready[:fits], ready[fits:]
+                docs = [
+                    EsgDocument(
+                        company=company,
+                        sector=sector,
+                        doc_type=_normalize_doc_type(candidates[idx].doc_type),
+                        text=body,
+                        metadata={
+                            "source_url": candidates[idx].url,
+                            "source_title": candidates[idx].title,
+                            "source_publisher": candidates[idx].publisher,
+                            "published_at": candidates[idx].published_at,
+                            "retrieved_at": _now_iso(),
+                            "source_type": candidates[idx].source_type,
+                            "retrieval_method": "live_discovery",
+                        },
+                    )
+                    for idx, body in batch
+                ]
+                ingest_started = time.monotonic()
+                with DISCOVERY_STAGE_SECONDS.time(stage="ingest", outcome="error") as timer:
+                    inserted_flags = ingest_esg_docs(docs)
+                    timer.labels["outcome"] = "ok"
+                batch_chars = sum(len(body) for _idx, body in batch)
+                ingest_sec_per_char = (time.monotonic() - ingest_started) / max(1, batch_chars)
+                for (idx, _body), inserted in zip(batch, inserted_flags):
+                    statuses[idx] = "ingested" if inserted else "duplicate"
+                    ingested += int(inserted)
+            report_progress()
+    finally:
+        cancelled.set()
+        for future in pending:
+            statuses[futures[future]] = "cut_off" if future.cancel() else "timed_out"
+        executor.shutdown(wait=False, cancel_futures=True)
+    return statuses, ingested
+
+
+def discovery_enabled() -> bool:
+    return os.getenv("LIVE_DISCOVERY_ENABLED", "true").lower() == "true"
+
+
 def discover_and_ingest(
     company: str,
     sector: str = "Unknown",
     max_results: int = 8,
+    progress: Callable[[dict], None] | None = None,
 ) -> dict:
     started = time.monotonic()
     time_budget_sec = _float_env("DISCOVERY_TIME_BUDGET_SEC", 35.0)
@@ -293,7 +450,7 @@ def discover_and_ingest(
     openai_timeout_sec = _float_env("DISCOVERY_OPENAI_TIMEOUT_SEC", 12.0)
     openai_max_attempts = _int_env("DISCOVERY_OPENAI_MAX_ATTEMPTS", 2)
 
-    if os.getenv("LIVE_DISCOVERY_ENABLED", "true").lower() != "true":
+    if not discovery_enabled():
         return {
             "status": "disabled",
             "company": company,
@@ -303,9 +460,12 @@ def discover_and_ingest(
             "sources": [],
         }
 
+    if progress is not None:
+        progress({"stage": "searching"})
     queries = _build_queries(company)
     raw_candidates: list[SourceCandidate] = []
     errors: list[str] = []
+    timings: dict[str, float] = {}
 
     # Primary: OpenAI web search via gpt-4o-mini + web_search_preview tool.
     try:
@@ -315,15 +475,17 @@ def discover_and_ingest(
             errors.append("Discovery time budget too low to run OpenAI live search.")
         else:
             search_timeout_sec = min(max(3.0, remaining_budget - 2.0), max(3.0, openai_timeout_sec))
-            raw_candidates.extend(
-                _search_with_openai(
-                    company,
-                    queries=queries,
-                    max_results=max_results * 2,
-                    request_timeout_sec=search_timeout_sec,
-                    max_attempts=openai_max_attempts,
+            with DISCOVERY_STAGE_SECONDS.time(stage="search", outcome="error") as timer:
+                raw_candidates.extend(
+                    _search_with_openai(
+                        company,
+                        queries=queries,
+                        max_results=max_results * 2,
+                        request_timeout_sec=search_timeout_sec,
+                        max_attempts=openai_max_attempts,
+                    )
                 )
-            )
+                timer.labels["outcome"] = "ok"
     except Exception as exc:
         details = str(exc).strip()
         if details:
@@ -331,53 +493,44 @@ def discover_and_ingest(
         else:
             errors.append(f"OpenAI discovery unavailable: {type(exc).__name__}")
 
+    timings["search_ms"] = round((time.monotonic() - started) * 1000, 1)
+
     # Keep candidate set tight so discovery finishes quickly.
     candidates = _dedupe_candidates(raw_candidates)[: max_results]
-    ingested = 0
-    sources: list[dict] = []
-
-    for candidate in candidates:
-        if (time.monotonic() - started) > time_budget_sec:
-            errors.append(f"Discovery time budget reached ({time_budget_sec:.0f}s).")
-            break
-        try:
-            extracted = _fetch_source_text(candidate.url, timeout_sec=per_source_timeout_sec)
-        except Exception:
-            continue
-        if len(extracted) < 240:
-            continue
-
-        trimmed = extracted[:15000]
-        body = f"{candidate.title}\n\n{candidate.snippet}\n\n{trimmed}".strip()
-        inserted = ingest_esg_doc(
-            company=company,
-            sector=sector,
-            doc_type=_normalize_doc_type(candidate.doc_type),
-            text=body,
-            metadata={
-                "source_url": candidate.url,
-                "source_title": candidate.title,
-                "source_publisher": candidate.publisher,
-                "published_at": candidate.published_at,
-                "retrieved_at": _now_iso(),
-                "source_type": candidate.source_type,
-                "retrieval_method": "live_discovery",
-            },
-        )
-        if inserted:
-            ingested += 1
-        sources.append(
-            {
-                "title": candidate.title,
-                "url": candidate.url,
-                "publisher": candidate.publisher,
-                "published_at": candidate.published_at,
-                "doc_type": _normalize_doc_type(candidate.doc_type),
-                "source_type": candidate.source_type,
-                "relevance": round(candidate.relevance, 3),
-                "inserted": inserted,
-            }
-        )
+    deadline = started + time_budget_sec
+    if progress is not None:
+        progress({"stage": "fetching", "candidates": len(candidates), "completed": 0, "ingested": 0})
+    statuses, ingested = _fetch_and_ingest(
+        candidates,
+        company=company,
+        sector=sector,
+        deadline=deadline,
+        per_source_timeout_sec=per_source_timeout_sec,
+        max_workers=_int_env("DISCOVERY_FETCH_CONCURRENCY", 6),
+        per_host_limit=_int_env("DISCOVERY_PER_HOST_CONCURRENCY", 2),
+        progress=progress,
+    )
+    timings["fetch_ingest_ms"] = round((time.monotonic() - started) * 1000 - timings["search_ms"], 1)
+    if any(status in {"timed_out", "cut_off", "deferred"} for status in statuses):
+        errors.append(f"Discovery time budget reached ({time_budget_sec:.0f}s).")
+
+    sources = [
+        {
+            "title": candidate.title,
+            "url": candidate.url,
+            "publisher": candidate.publisher,
+            "published_at": candidate.published_at,
+            "doc_type": _normalize_doc_type(candidate.doc_type),
+            "source_type": candidate.source_type,
+            "relevance": round(candidate.relevance, 3),
+            "status": status,
+            "inserted": status == "ingested",
+        }
+        for candidate, status in zip(candidates, statuses)
+    ]
+    fetch_summary: dict[str, int] = {}
+    for status in statuses:
+        fetch_summary[status] = fetch_summary.get(status, 0) + 1
 
     return {
         "status": "ok",
@@ -386,6 +539,8 @@ def discover_and_ingest(
         "ingested": ingested,
         "errors": errors,
         "sources": sources,
+        "fetch_summary": fetch_summary,
         "queries": queries,
         "duration_sec": round(time.monotonic() - started, 2),
+        "timings": timings,
     }
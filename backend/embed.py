@@ -1,36 +1,401 @@
 import os
-import random
+import pathlib
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from hashlib import sha256
+import numpy as np
 from openai import OpenAI
 from dotenv import load_dotenv
 
+from backend.metrics import counter, histogram
+
 load_dotenv()
 
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 USE_LOCAL_EMBEDDINGS = os.getenv("USE_LOCAL_EMBEDDINGS", "false").lower() == "true"
 OPENAI_EMBEDDINGS_AVAILABLE = True
+EMBEDDING_MODEL = "text-embedding-3-large"
+EMBEDDING_NATIVE_DIM = 3072
+# Shortened embeddings via the API's `dimensions` parameter; 1024 keeps most of the
+# retrieval quality at a third of the storage.
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", str(EMBEDDING_NATIVE_DIM)))
+if not 0 < EMBEDDING_DIM <= EMBEDDING_NATIVE_DIM:
+    raise ValueError(f"EMBEDDING_DIM must be between 1 and {EMBEDDING_NATIVE_DIM}, got {EMBEDDING_DIM}")
+# Provider limits per embeddings request (OpenAI: 2048 inputs, 300k tokens).
+EMBED_BATCH_MAX_ITEMS = int(os.getenv("EMBED_BATCH_MAX_ITEMS", "2048"))
+EMBED_BATCH_MAX_TOKENS = int(os.getenv("EMBED_BATCH_MAX_TOKENS", "300000"))
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "4"))
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "true").lower() == "true"
+EMBED_CACHE_PATH = os.getenv(
+    "EMBED_CACHE_PATH",
+    str(pathlib.Path(__file__).resolve().parent.parent / "data" / "embedding_cache.sqlite3"),
+)
+EMBED_CACHE_MEMORY_ITEMS = int(os.getenv("EMBED_CACHE_MEMORY_ITEMS", "2048"))
+EMBED_CACHE_MAX_MB = float(os.getenv("EMBED_CACHE_MAX_MB", "512"))
+# Disk hits refresh last_used in batches of this size (or with the next write).
+TOUCH_FLUSH_ITEMS = 256
+
+EMBED_SECONDS = histogram(
+    "embedding_batch_duration_seconds",
+    "Time to embed one provider-sized batch, by the backend that produced it.",
+    ("provider",),
+)
+EMBED_TEXTS = counter("embedding_texts", "Unique texts embedded, by where the vector came from.", ("source",))
+EMBED_FALLBACKS = counter(
+    "embedding_fallbacks",
+    "Provider embedding failures that switched the process to local embeddings.",
+    ("error",),
+)
+
+
+class EmbeddingCache:
+    """Two-tier cache of embeddings keyed by (model, dimension, sha256 of text).
+
+    An in-process LRU sits in front of a SQLite file. Vectors are stored as float32
+    blobs; when the file exceeds ``max_bytes`` the least recently used rows are evicted.
+    Disk hits update ``last_used`` lazily, in batches, so reads do not each write.
+    """
+
+    def __init__(self, path: str, memory_items: int, max_bytes: int):
+        self.memory_items = max(0, memory_items)
+        self.max_bytes = max_bytes
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        # Guards the SQLite connection, _disk_bytes and the pending last_used updates.
+        self._db_lock = threading.Lock()
+        self._touched: dict[str, float] = {}
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._memory_evictions = 0
+        self._disk_evictions = 0
+        self._db: sqlite3.Connection | None = None
+        self._disk_bytes = 0
+        try:
+            pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+            self._disk_bytes = db.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+            self._db = db
+        except sqlite3.Error as exc:
+            print(f"Embedding cache disk tier disabled ({type(exc).__name__}): memory only.")
+
+    @staticmethod
+    def key(model: str, dim: int, text: str) -> str:
+        return f"{model}:{dim}:{sha256(text.encode('utf-8')).hexdigest()}"
+
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        found: dict[str, np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            self._memory_hits += len(found)
+        missing = [key for key in keys if key not in found]
+        disk_found: dict[str, np.ndarray] = {}
+        if missing and self._db is not None:
+            # Disk lookups hold only the SQLite lock, so memory hits never wait on them.
+            with self._db_lock:
+                for start in range(0, len(missing), 500):
+                    part = missing[start : start + 500]
+                    placeholders = ",".join("?" * len(part))
+                    rows = self._db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part
+                    ).fetchall()
+                    for key, blob in rows:
+                        disk_found[key] = np.frombuffer(blob, dtype=np.float32)
+                if disk_found:
+                    self._touched.update(dict.fromkeys(disk_found, time.time()))
+                    if len(self._touched) >= TOUCH_FLUSH_ITEMS:
+                        self._db.execute("BEGIN")
+                        self._flush_touched()
+                        self._db.execute("COMMIT")
+        with self._lock:
+            for key, vector in disk_found.items():
+                self._remember(key, vector)
+            self._disk_hits += len(disk_found)
+            found.update(disk_found)
+            self._misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: dict[str, np.ndarray]) -> None:
+        if not items:
+            return
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+        if self._db is None:
+            return
+        now = time.time()
+        rows = [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items.items()]
+        keys = list(items)
+        with self._db_lock:
+            self._db.execute("BEGIN")
+            # INSERT OR REPLACE of a cached key frees the old blob; count only the difference.
+            replaced = 0
+            for start in range(0, len(keys), 500):
+                part = keys[start : start + 500]
+                placeholders = ",".join("?" * len(part))
+                replaced += self._db.execute(
+                    f"SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings WHERE key IN ({placeholders})", part
+                ).fetchone()[0]
+            self._db.executemany("INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows)
+            self._flush_touched()
+            self._db.execute("COMMIT")
+            self._disk_bytes += sum(len(blob) for _, blob, _ in rows) - replaced
+            if self._disk_bytes > self.max_bytes:
+                self._evict_disk()
+
+    def _flush_touched(self) -> None:
+        """Write the batched ``last_used`` updates of disk hits; caller holds ``_db_lock``."""
+        if not self._touched:
+            return
+        self._db.executemany(
+            "UPDATE embeddings SET last_used = MAX(last_used, ?) WHERE key = ?",
+            [(used, key) for key, used in self._touched.items()],
+        )
+        self._touched.clear()
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        if self.memory_items == 0:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+            self._memory_evictions += 1
+
+    def _evict_disk(self) -> None:
+        # Trim to 90% of the budget so eviction doesn't run on every insert.
+        self._flush_touched()
+        target = int(self.max_bytes * 0.9)
+        while self._disk_bytes > target:
+            rows = self._db.execute(
+                "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used LIMIT 256"
+            ).fetchall()
+            if not rows:
+                self._disk_bytes = 0
+                break
+            victims: list[str] = []
+            for key, size in rows:
+                if self._disk_bytes <= target:
+                    break
+                victims.append(key)
+                self._disk_bytes -= size
+            self._db.executemany("DELETE FROM embeddings WHERE key = ?", [(key,) for key in victims])
+            self._disk_evictions += len(victims)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._memory_hits + self._disk_hits + self._misses
+            return {
+                "memory_items": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_rate": round((self._memory_hits + self._disk_hits) / lookups, 4) if lookups else 0.0,
+                "memory_evictions": self._memory_evictions,
+                "disk_evictions": self._disk_evictions,
+            }
+
+
+embedding_cache = (
+    EmbeddingCache(EMBED_CACHE_PATH, EMBED_CACHE_MEMORY_ITEMS, int(EMBED_CACHE_MAX_MB * 1024 * 1024))
+    if EMBED_CACHE_ENABLED
+    else None
+)
+
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# Fixed seed for the feature hash so local embeddings are stable across processes.
+LOCAL_EMBEDDING_SEED = 0x5EED
+
+
+def _local_features(text: str) -> list[str]:
+    """Word unigrams, word bigrams and character trigrams of the normalised text."""
+    words = _WORD_RE.findall(text.lower())
+    features = list(words)
+    features.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+    for word in words:
+        padded = f"#{word}#"
+        features.extend(f"#3{padded[i : i + 3]}" for i in range(len(padded) - 2))
+    return features
+
+
+def _local_embeddings(texts: list[str], dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Deterministic bag-of-n-grams embeddings via signed feature hashing.
 
+    Returns an L2-normalised float32 matrix of shape (len(texts), dim). Texts sharing
+    vocabulary get genuinely similar vectors, so the fallback still ranks sensibly.
+    """
+    rows: list[np.ndarray] = []
+    cols: list[np.ndarray] = []
+    for row, text in enumerate(texts):
+        hashes = np.fromiter(
+            (zlib.crc32(feature.encode("utf-8"), LOCAL_EMBEDDING_SEED) for feature in _local_features(text)),
+            dtype=np.int64,
+        )
+        cols.append(hashes)
+        rows.append(np.full(hashes.shape, row, dtype=np.int64))
+
+    hashes = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+    signs = np.where((hashes // dim) % 2 == 0, 1.0, -1.0)
+    flat_index = np.concatenate(rows) * dim + hashes % dim if rows else hashes
+    matrix = np.bincount(flat_index, weights=signs, minlength=len(texts) * dim)
+    matrix = matrix.astype(np.float32).reshape(len(texts), dim)
+    # Sublinear term frequency, then unit length so cosine distance is well defined.
+    matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+    norms = np.linalg.norm(matrix, axis=1)
+    empty = norms == 0
+    if empty.any():
+        # Texts without any word characters get a seeded random direction instead of zeros.
+        for row in np.flatnonzero(empty):
+            seed = int.from_bytes(sha256(texts[row].encode("utf-8")).digest()[:8], "big")
+            matrix[row] = np.random.default_rng(seed).standard_normal(dim, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1)
+    return matrix / norms[:, None]
+
+
+def _local_embedding(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    return _local_embeddings([text], dim)[0]
+
+
+def reduce_embeddings(matrix: np.ndarray, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Shorten provider embeddings to ``dim`` components without calling the API again.
+
+    text-embedding-3 models are trained so that a prefix of the vector, renormalised,
+    is what the ``dimensions`` parameter returns.
+    """
+    reduced = np.asarray(matrix, dtype=np.float32)[..., :dim]
+    norms = np.linalg.norm(reduced, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return reduced / norms
+
+
+def _estimate_tokens(text: str) -> int:
+    # English averages ~4 chars per token; 3 keeps batches under the limit for denser text.
+    return len(text) // 3 + 1
+
+
+def _pack_batches(texts: list[str]) -> list[list[int]]:
+    """Group text indices into batches that respect the per-request item and token limits."""
+    batches: list[list[int]] = []
+    current: list[int] = []
+    current_tokens = 0
+    for idx, text in enumerate(texts):
+        tokens = _estimate_tokens(text)
+        if current and (
+            len(current) >= EMBED_BATCH_MAX_ITEMS or current_tokens + tokens > EMBED_BATCH_MAX_TOKENS
+        ):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(idx)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
 
-def _local_embedding(text: str, dim: int = 3072) -> list[float]:
-    # Deterministic fallback so vector search still works without OpenAI quota/network.
-    seed = int.from_bytes(sha256(text.encode("utf-8")).digest()[:8], "big")
-    rng = random.Random(seed)
-    return [rng.uniform(-1.0, 1.0) for _ in range(dim)]
 
+def _using_local_embeddings() -> bool:
+    return USE_LOCAL_EMBEDDINGS or not OPENAI_EMBEDDINGS_AVAILABLE
 
-def embed_text(text: str) -> list[float]:
+
+def _embed_batch(texts: list[str]) -> tuple[list[np.ndarray], bool]:
+    """Embed one provider-sized batch; the flag says whether the provider produced it."""
     global OPENAI_EMBEDDINGS_AVAILABLE
 
-    if USE_LOCAL_EMBEDDINGS or not OPENAI_EMBEDDINGS_AVAILABLE:
-        return _local_embedding(text)
+    if _using_local_embeddings():
+        with EMBED_SECONDS.time(provider="local"):
+            return list(_local_embeddings(texts)), False
 
+    started = time.perf_counter()
     try:
+        options = {"dimensions": EMBEDDING_DIM} if EMBEDDING_DIM != EMBEDDING_NATIVE_DIM else {}
         response = client.embeddings.create(
-            model="text-embedding-3-large",
-            input=text,
+            model=EMBEDDING_MODEL,
+            input=texts,
+            **options,
         )
-        return response.data[0].embedding
+        ordered = sorted(response.data, key=lambda item: item.index)
+        vectors = list(np.asarray([item.embedding for item in ordered], dtype=np.float32))
+        EMBED_SECONDS.observe(time.perf_counter() - started, provider="openai")
+        return vectors, True
     except Exception as exc:
+        EMBED_SECONDS.observe(time.perf_counter() - started, provider="openai_failed")
+        EMBED_FALLBACKS.inc(error=type(exc).__name__)
         OPENAI_EMBEDDINGS_AVAILABLE = False
         print(f"Embedding fallback enabled ({type(exc).__name__}): using local embeddings.")
-        return _local_embedding(text)
+        with EMBED_SECONDS.time(provider="local"):
+            return list(_local_embeddings(texts)), False
+
+
+def embed_texts(texts: list[str]) -> list[np.ndarray]:
+    """Embed many texts with as few provider requests as possible, preserving order.
+
+    Duplicate inputs are embedded once and provider embeddings are served from the
+    embedding cache when possible. Batches run concurrently, bounded by
+    EMBED_MAX_CONCURRENCY.
+    """
+    unique_texts = list(dict.fromkeys(texts))
+    if not unique_texts:
+        return []
+
+    by_text: dict[str, np.ndarray] = {}
+    cache = embedding_cache if not _using_local_embeddings() else None
+    keys: dict[str, str] = {}
+    if cache is not None:
+        keys = {text: EmbeddingCache.key(EMBEDDING_MODEL, EMBEDDING_DIM, text) for text in unique_texts}
+        cached = cache.get_many(list(keys.values()))
+        by_text = {text: cached[key] for text, key in keys.items() if key in cached}
+
+    missing = [text for text in unique_texts if text not in by_text]
+    if by_text:
+        EMBED_TEXTS.inc(len(by_text), source="cache")
+    batches = [[missing[i] for i in batch] for batch in _pack_batches(missing)]
+    if len(batches) == 1:
+        batch_results = [_embed_batch(batches[0])]
+    elif batches:
+        with ThreadPoolExecutor(max_workers=max(1, min(EMBED_MAX_CONCURRENCY, len(batches)))) as pool:
+            batch_results = list(pool.map(_embed_batch, batches))
+    else:
+        batch_results = []
+
+    to_cache: dict[str, np.ndarray] = {}
+    for batch, (vectors, from_provider) in zip(batches, batch_results):
+        by_text.update(zip(batch, vectors))
+        EMBED_TEXTS.inc(len(batch), source="openai" if from_provider else "local")
+        if cache is not None and from_provider:
+            to_cache.update((keys[text], vector) for text, vector in zip(batch, vectors))
+    if cache is not None:
+        cache.put_many(to_cache)
+    return [by_text[text] for text in texts]
+
+
+def embedding_cache_stats() -> dict:
+    if embedding_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **embedding_cache.stats()}
+
+
+def embed_text(text: str) -> np.ndarray:
+    return embed_texts([text])[0]
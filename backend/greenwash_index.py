@@ -0,0 +1,143 @@
+"""
+In-memory exact search over greenwash_examples.
+
+The example set is small and rarely changes, so it is held as one normalized
+float32 matrix and searched with a single matrix-vector product. Postgres stays
+the system of record: the matrix is loaded at startup, reloaded after in-process
+ingestion, and re-checked against the greenwash corpus version at most every
+GREENWASH_INDEX_REFRESH_SEC so ingestion from other processes is picked up. The
+check runs in a background thread, so a database error never fails a search.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from backend.db import GREENWASH_SCOPE, connection, fetch_corpus_versions, vector_from_bytes
+
+GREENWASH_INDEX_ENABLED = os.getenv("GREENWASH_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+GREENWASH_INDEX_REFRESH_SEC = float(os.getenv("GREENWASH_INDEX_REFRESH_SEC", "60"))
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    contents: list[str]
+    matrix: np.ndarray
+    version: int
+    checked_at: float
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class GreenwashIndex:
+    def __init__(self, enabled: bool = GREENWASH_INDEX_ENABLED, refresh_sec: float = GREENWASH_INDEX_REFRESH_SEC):
+        self.enabled = enabled
+        self.refresh_sec = refresh_sec
+        self._snapshot: _Snapshot | None = None
+        self._load_lock = threading.Lock()
+        self._checking = False
+        self._searches = 0
+        self._loads = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.enabled and self._snapshot is not None
+
+    def load(self) -> None:
+        """(Re)load every greenwash example from Postgres and swap in a new matrix."""
+        if not self.enabled:
+            return
+        with self._load_lock:
+            with connection() as conn, conn.cursor() as cur:
+                # Read the version first: a concurrent ingest then at worst triggers one extra reload.
+                cur.execute("SELECT version FROM corpus_versions WHERE scope = %s", (GREENWASH_SCOPE,))
+                row = cur.fetchone()
+                version = row[0] if row else 0
+                cur.execute(
+                    "SELECT content, vector_send(embedding::vector) FROM greenwash_examples "
+                    "WHERE embedding IS NOT NULL ORDER BY id"
+                )
+                rows = cur.fetchall()
+            contents = [content for content, _ in rows]
+            if rows:
+                matrix = _normalize_rows(np.stack([vector_from_bytes(data) for _, data in rows]))
+            else:
+                matrix = np.empty((0, 0), dtype=np.float32)
+            self._snapshot = _Snapshot(contents, matrix, version, time.monotonic())
+            self._loads += 1
+
+    def _maybe_refresh(self, snapshot: _Snapshot) -> None:
+        if self.refresh_sec <= 0 or time.monotonic() - snapshot.checked_at < self.refresh_sec:
+            return
+        with self._load_lock:
+            if self._checking or self._snapshot is not snapshot:
+                return
+            self._checking = True
+        # Searches keep using the current snapshot; the version check never blocks them.
+        threading.Thread(target=self._refresh, args=(snapshot,), name="greenwash-index-refresh", daemon=True).start()
+
+    def _refresh(self, snapshot: _Snapshot) -> None:
+        try:
+            version = fetch_corpus_versions([GREENWASH_SCOPE])[GREENWASH_SCOPE]
+            if version != snapshot.version:
+                self.load()
+            else:
+                self._snapshot = _Snapshot(snapshot.contents, snapshot.matrix, snapshot.version, time.monotonic())
+        except Exception as exc:
+            # Keep serving the loaded matrix and retry after another refresh interval.
+            print(f"Greenwash index refresh failed ({type(exc).__name__}): {exc}")
+            if self._snapshot is snapshot:
+                self._snapshot = _Snapshot(snapshot.contents, snapshot.matrix, snapshot.version, time.monotonic())
+        finally:
+            self._checking = False
+
+    def search(self, embedding: np.ndarray, k: int = 5) -> list[tuple[str, float]]:
+        """Return the top-k (content, cosine similarity) pairs, best first."""
+        return self.search_many([embedding], k)[0]
+
+    def search_many(self, embeddings: list[np.ndarray], k: int = 5) -> list[list[tuple[str, float]]]:
+        """``search`` for several query vectors with one matrix product."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            raise RuntimeError("Greenwash index is not loaded")
+        self._maybe_refresh(snapshot)
+        snapshot = self._snapshot
+        self._searches += len(embeddings)
+        if k <= 0 or not snapshot.contents or not len(embeddings):
+            return [[] for _ in embeddings]
+
+        queries = _normalize_rows(np.asarray(np.stack(embeddings), dtype=np.float32))
+        scores = queries @ snapshot.matrix.T
+        if k < scores.shape[1]:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return [
+            [(snapshot.contents[idx], float(score)) for idx, score in zip(row, row_scores)]
+            for row, row_scores in zip(top.tolist(), top_scores.tolist())
+        ]
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "enabled": self.enabled,
+            "loaded": snapshot is not None,
+            "examples": len(snapshot.contents) if snapshot else 0,
+            "version": snapshot.version if snapshot else None,
+            "loads": self._loads,
+            "searches": self._searches,
+        }
+
+
+greenwash_index = GreenwashIndex()
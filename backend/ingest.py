@@ -3,21 +3,421 @@ Ingestion script for ESG documents and greenwashing examples.
 
 ESG doc filename convention:  CompanyName_Sector_DocType.txt
 Greenwash case files:         any .txt file in data/greenwash_cases/
+
+ESG documents are stored as one esg_sources row per document plus one
+esg_documents row per embedded chunk.
 """
 
+import argparse
 import os
 import pathlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from hashlib import sha256
-from backend.embed import embed_text
-from backend.db import get_conn, init_db
+from typing import Callable, Iterable, Iterator, TextIO
+import numpy as np
+from psycopg2.extras import execute_values
+from backend.embed import embed_texts
+from backend.db import (
+    EMBEDDING_STORAGE,
+    GREENWASH_SCOPE,
+    bump_corpus_versions,
+    company_scope,
+    connection,
+    copy_rows,
+    init_db,
+    sector_scope,
+)
+from backend.greenwash_index import greenwash_index
+from backend.manifest import INGEST_MANIFEST_PATH, IngestManifest, ManifestEntry
 
 DATA_DIR = pathlib.Path(__file__).resolve().parent.parent / "data"
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "800"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "100"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "200"))
+INGEST_STREAM_EMBED_BATCH = 32
+ESG_CHUNK_COLUMNS = [
+    ("parent_id", "int4"),
+    ("chunk_index", "int4"),
+    ("chunk_start", "int4"),
+    ("company", "text"),
+    ("sector", "text"),
+    ("doc_type", "text"),
+    ("content", "text"),
+    ("embedding", EMBEDDING_STORAGE),
+]
+GREENWASH_COLUMNS = [("content", "text"), ("embedding", EMBEDDING_STORAGE), ("content_hash", "text")]
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END = {".", "!", "?"}
+
+
+@dataclass
+class TextChunk:
+    index: int
+    start: int
+    end: int
+    text: str
 
 
 def _hash_content(text: str) -> str:
     return sha256(text.encode("utf-8")).hexdigest()
 
 
+def _token_cost(token: str) -> int:
+    # BPE tokenizers split long words into several pieces; ~6 chars per piece
+    # over-estimates slightly, which keeps chunks safely under the model limit.
+    return max(1, (len(token) + 5) // 6)
+
+
+def chunk_text(
+    text: str,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+) -> list[TextChunk]:
+    """Split text into overlapping chunks of at most ``max_tokens`` estimated tokens.
+
+    Chunks prefer to end on a sentence boundary in the back half of the window and
+    carry their character offsets into the original text.
+    """
+    max_tokens = max(1, max_tokens)
+    overlap_tokens = max(0, min(overlap_tokens, max_tokens // 2))
+    spans = [(m.start(), m.end(), _token_cost(m.group())) for m in _TOKEN_RE.finditer(text)]
+    chunks: list[TextChunk] = []
+    start = 0
+    while start < len(spans):
+        end = start
+        used = 0
+        while end < len(spans) and (end == start or used + spans[end][2] <= max_tokens):
+            used += spans[end][2]
+            end += 1
+        if end < len(spans):
+            for i in range(end - 1, start + (end - start) // 2, -1):
+                if text[spans[i][0] : spans[i][1]] in _SENTENCE_END:
+                    end = i + 1
+                    break
+
+        char_start, char_end = spans[start][0], spans[end - 1][1]
+        chunks.append(TextChunk(len(chunks), char_start, char_end, text[char_start:char_end]))
+        if end >= len(spans):
+            break
+
+        # Step back so the next chunk repeats roughly `overlap_tokens` of context.
+        next_start = end
+        overlap = 0
+        while next_start > start + 1 and overlap + spans[next_start - 1][2] <= overlap_tokens:
+            next_start -= 1
+            overlap += spans[next_start][2]
+        start = next_start
+    return chunks
+
+
+class _StreamingChunker:
+    """Chunks text that arrives in pieces, releasing each chunk once it is final.
+
+    ``chunk_text`` only looks forward from a chunk's start, so every chunk but the
+    last one of the text so far is exactly what chunking the whole document would
+    produce. Only the unfinished tail is kept and re-chunked as pieces arrive; the
+    document itself is summarised by its length and content hash, and handed to
+    ``sink`` as it is accepted.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = CHUNK_MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+        sink: Callable[[str], object] | None = None,
+    ):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.chunks: list[TextChunk] = []
+        self.length = 0
+        self._sink = sink
+        self._hash = sha256()
+        self._pending_space = ""
+        self._tail = ""
+        self._tail_start = 0
+
+    @property
+    def content_hash(self) -> str:
+        return self._hash.hexdigest()
+
+    def _offset(self, chunk: TextChunk) -> TextChunk:
+        return TextChunk(len(self.chunks), chunk.start + self._tail_start, chunk.end + self._tail_start, chunk.text)
+
+    def feed(self, text: str) -> list[TextChunk]:
+        """Add raw text; returns newly final chunks.
+
+        The document is everything fed so far with leading and trailing whitespace
+        stripped, so trailing whitespace is held back until more text follows it.
+        """
+        if not self.length:
+            text = text.lstrip()
+        body = text.rstrip()
+        if not body:
+            if self.length:
+                self._pending_space += text
+            return []
+        piece = self._pending_space + body
+        self._pending_space = text[len(body):]
+        self.length += len(piece)
+        self._hash.update(piece.encode("utf-8"))
+        if self._sink is not None:
+            self._sink(piece)
+
+        self._tail += piece
+        tail_chunks = chunk_text(self._tail, self.max_tokens, self.overlap_tokens)
+        released = []
+        for chunk in tail_chunks[:-1]:
+            released.append(self._offset(chunk))
+            self.chunks.append(released[-1])
+        if len(tail_chunks) > 1:
+            cut = tail_chunks[-1].start
+            self._tail = self._tail[cut:]
+            self._tail_start += cut
+        return released
+
+    def append_page(self, page: str) -> list[TextChunk]:
+        """Add a page; non-empty pages are stripped and separated by a blank line."""
+        page = page.strip()
+        if not page:
+            return []
+        return self.feed("\n\n" + page if self.length else page)
+
+    def finish(self) -> list[TextChunk]:
+        """Chunk the remaining tail; returns the last chunks."""
+        released = []
+        for chunk in chunk_text(self._tail, self.max_tokens, self.overlap_tokens):
+            released.append(self._offset(chunk))
+            self.chunks.append(released[-1])
+        self._tail = ""
+        return released
+
+
+@dataclass
+class EsgDocument:
+    company: str
+    sector: str
+    doc_type: str
+    text: str
+    metadata: dict = field(default_factory=dict)
+
+
+def ingest_esg_docs(docs: list[EsgDocument]) -> list[bool]:
+    """Ingest several ESG documents in one transaction.
+
+    Costs one dedupe query, one batched embedding pass, one multi-row insert of the
+    parent rows and one COPY of all chunks.
+
+    Returns, per input document, whether it was inserted (False for duplicates/empty text).
+    """
+    return [inserted for _, inserted in _ingest_esg_docs(docs)]
+
+
+def _ingest_esg_docs(
+    docs: list[EsgDocument],
+    prepared: dict[int, tuple[list[TextChunk], list[np.ndarray], int]] | None = None,
+) -> list[tuple[int | None, bool]]:
+    """Like ``ingest_esg_docs`` but also returns each document's esg_sources id.
+
+    Duplicates report the id of the existing source; empty documents report None.
+    ``prepared`` maps a document's position to chunks, embeddings and text length
+    computed ahead of time, which are used instead of chunking and embedding it
+    here (streamed documents never hold their text, so ``doc.text`` is empty).
+    """
+    prepared = prepared or {}
+    if not docs:
+        return []
+    hashes = [doc.metadata.get("content_hash") or _hash_content(doc.text) for doc in docs]
+
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT MIN(id), content_hash
+            FROM esg_sources
+            WHERE content_hash = ANY(%s)
+            GROUP BY content_hash
+            """,
+            (list(set(hashes)),),
+        )
+        existing = {content_hash: source_id for source_id, content_hash in cur.fetchall()}
+
+    results: list[tuple[int | None, bool]] = [(existing.get(h), False) for h in hashes]
+    seen = set(existing)
+    pending: list[tuple[int, list[TextChunk]]] = []
+    for idx, (doc, content_hash) in enumerate(zip(docs, hashes)):
+        if content_hash in seen:
+            continue
+        seen.add(content_hash)
+        chunks = prepared[idx][0] if idx in prepared else chunk_text(doc.text)
+        if chunks:
+            pending.append((idx, chunks))
+
+    if not pending:
+        return results
+
+    # Embed outside the transaction so a slow API call never pins a pooled connection.
+    fresh = iter(embed_texts([chunk.text for idx, chunks in pending if idx not in prepared for chunk in chunks]))
+    embeddings = {
+        idx: prepared[idx][1] if idx in prepared else [next(fresh) for _ in chunks]
+        for idx, chunks in pending
+    }
+    with connection() as conn, conn.cursor() as cur:
+        parent_rows = execute_values(
+            cur,
+            """
+            INSERT INTO esg_sources (
+                company, sector, doc_type,
+                source_url, source_title, source_publisher,
+                published_at, retrieved_at, source_type, retrieval_method,
+                content_hash, chars, chunk_count
+            )
+            VALUES %s
+            RETURNING id, content_hash
+            """,
+            [
+                (
+                    docs[idx].company,
+                    docs[idx].sector,
+                    docs[idx].doc_type,
+                    docs[idx].metadata.get("source_url"),
+                    docs[idx].metadata.get("source_title"),
+                    docs[idx].metadata.get("source_publisher"),
+                    docs[idx].metadata.get("published_at"),
+                    docs[idx].metadata.get("retrieved_at"),
+                    docs[idx].metadata.get("source_type", "uploaded"),
+                    docs[idx].metadata.get("retrieval_method", "manual_upload"),
+                    hashes[idx],
+                    prepared[idx][2] if idx in prepared else len(docs[idx].text),
+                    len(chunks),
+                )
+                for idx, chunks in pending
+            ],
+            page_size=len(pending),
+            fetch=True,
+        )
+        parent_ids = {content_hash: parent_id for parent_id, content_hash in parent_rows}
+
+        chunk_rows = []
+        for idx, chunks in pending:
+            doc = docs[idx]
+            parent_id = parent_ids[hashes[idx]]
+            for chunk, embedding in zip(chunks, embeddings[idx]):
+                chunk_rows.append(
+                    (
+                        parent_id,
+                        chunk.index,
+                        chunk.start,
+                        doc.company,
+                        doc.sector,
+                        doc.doc_type,
+                        chunk.text,
+                        embedding,
+                    )
+                )
+        copy_rows(cur, "esg_documents", ESG_CHUNK_COLUMNS, chunk_rows)
+        bump_corpus_versions(
+            cur,
+            [company_scope(docs[idx].company) for idx, _ in pending]
+            + [sector_scope(docs[idx].sector) for idx, _ in pending],
+        )
+    inserted_ids = {idx: parent_ids[hashes[idx]] for idx, _ in pending}
+    # In-batch duplicates point at the copy inserted above.
+    by_hash = {hashes[idx]: source_id for idx, source_id in inserted_ids.items()}
+    return [
+        (inserted_ids[idx], True) if idx in inserted_ids else (existing.get(h, by_hash.get(h)), False)
+        for idx, h in enumerate(hashes)
+    ]
+
+
+def delete_esg_sources(source_ids: list[int]) -> int:
+    """Delete sources (and, by cascade, their chunks); returns the number removed."""
+    if not source_ids:
+        return 0
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "DELETE FROM esg_sources WHERE id = ANY(%s) RETURNING company, sector",
+            (list(source_ids),),
+        )
+        removed = cur.fetchall()
+        bump_corpus_versions(
+            cur,
+            [company_scope(company) for company, _ in removed if company]
+            + [sector_scope(sector) for _, sector in removed if sector],
+        )
+    return len(removed)
+
+
+def _ingest_esg_stream(
+    company: str,
+    sector: str,
+    doc_type: str,
+    pieces: Iterable[str],
+    add: Callable[[_StreamingChunker, str], list[TextChunk]],
+    metadata: dict | None,
+    out: TextIO | None,
+) -> tuple[bool, int]:
+    chunker = _StreamingChunker(sink=out.write if out is not None else None)
+    embedder = ThreadPoolExecutor(max_workers=1)
+    batches = []
+    ready: list[TextChunk] = []
+    try:
+        for piece in pieces:
+            ready.extend(add(chunker, piece))
+            if len(ready) >= INGEST_STREAM_EMBED_BATCH:
+                batches.append(embedder.submit(embed_texts, [chunk.text for chunk in ready]))
+                ready = []
+        ready.extend(chunker.finish())
+        if ready:
+            batches.append(embedder.submit(embed_texts, [chunk.text for chunk in ready]))
+        embeddings = [embedding for batch in batches for embedding in batch.result()]
+    finally:
+        embedder.shutdown(wait=False, cancel_futures=True)
+
+    if not chunker.length:
+        return False, 0
+    # The full text is never assembled: the hash stands in for it during dedupe.
+    doc = EsgDocument(company, sector, doc_type, "", {**(metadata or {}), "content_hash": chunker.content_hash})
+    (_, inserted), = _ingest_esg_docs([doc], prepared={0: (chunker.chunks, embeddings, chunker.length)})
+    return inserted, chunker.length
+
+
+def ingest_esg_pages(
+    company: str,
+    sector: str,
+    doc_type: str,
+    pages: Iterable[str],
+    metadata: dict | None = None,
+    out: TextIO | None = None,
+) -> tuple[bool, int]:
+    """Ingest a document delivered page by page, e.g. from PDF extraction.
+
+    Chunks are embedded on a background thread as soon as they are final, so
+    embedding overlaps with extracting the remaining pages. The document text is
+    the non-empty pages joined by blank lines; it is written to ``out`` as it
+    arrives instead of being held in memory. Returns whether the document was
+    inserted and its length in characters (0 when it has no text).
+    """
+    return _ingest_esg_stream(company, sector, doc_type, pages, _StreamingChunker.append_page, metadata, out)
+
+
+def ingest_esg_text(
+    company: str,
+    sector: str,
+    doc_type: str,
+    blocks: Iterable[str],
+    metadata: dict | None = None,
+    out: TextIO | None = None,
+) -> tuple[bool, int]:
+    """Like ``ingest_esg_pages`` for plain text read in arbitrary blocks.
+
+    The document text is the concatenated blocks with outer whitespace stripped,
+    matching ``ingest_esg_doc`` on the whole text.
+    """
+    return _ingest_esg_stream(company, sector, doc_type, blocks, _StreamingChunker.feed, metadata, out)
+
+
 def ingest_esg_doc(
     company: str,
     sector: str,
@@ -25,104 +425,338 @@ def ingest_esg_doc(
     text: str,
     metadata: dict | None = None,
 ) -> bool:
-    metadata = metadata or {}
-    content_hash = metadata.get("content_hash") or _hash_content(text)
+    return ingest_esg_docs([EsgDocument(company, sector, doc_type, text, metadata or {})])[0]
 
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT 1
-        FROM esg_documents
-        WHERE content_hash = %s
-        LIMIT 1
-        """,
-        (content_hash,),
-    )
-    if cur.fetchone():
-        cur.close()
-        conn.close()
-        return False
 
-    emb = embed_text(text)
-    cur.execute(
-        """
-        INSERT INTO esg_documents (
-            company, sector, doc_type, content, embedding,
-            source_url, source_title, source_publisher,
-            published_at, retrieved_at, source_type, retrieval_method, content_hash
+def ingest_greenwash_examples(texts: list[str]) -> list[bool]:
+    """Ingest greenwash cases, skipping any whose content is already stored.
+
+    Returns, per input text, whether it was inserted.
+    """
+    return [inserted for _, inserted in _ingest_greenwash_examples(texts)]
+
+
+def _ingest_greenwash_examples(texts: list[str]) -> list[tuple[int | None, bool]]:
+    if not texts:
+        return []
+    hashes = [_hash_content(text) for text in texts]
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT id, content_hash FROM greenwash_examples WHERE content_hash = ANY(%s)",
+            (list(set(hashes)),),
         )
-        VALUES (
-            %s, %s, %s, %s, %s::vector,
-            %s, %s, %s,
-            %s, %s, %s, %s, %s
+        existing = {content_hash: example_id for example_id, content_hash in cur.fetchall()}
+
+    pending = {h: text for text, h in zip(texts, hashes) if h not in existing}
+    if not pending:
+        return [(existing[h], False) for h in hashes]
+
+    embeddings = embed_texts(list(pending.values()))
+    with connection() as conn, conn.cursor() as cur:
+        copy_rows(
+            cur,
+            "greenwash_examples",
+            GREENWASH_COLUMNS,
+            ((text, embedding, h) for (h, text), embedding in zip(pending.items(), embeddings)),
         )
-        """,
-        (
-            company,
-            sector,
-            doc_type,
-            text,
-            str(emb),
-            metadata.get("source_url"),
-            metadata.get("source_title"),
-            metadata.get("source_publisher"),
-            metadata.get("published_at"),
-            metadata.get("retrieved_at"),
-            metadata.get("source_type", "uploaded"),
-            metadata.get("retrieval_method", "manual_upload"),
-            content_hash,
-        ),
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
-    return True
+        cur.execute(
+            "SELECT id, content_hash FROM greenwash_examples WHERE content_hash = ANY(%s)",
+            (list(pending),),
+        )
+        inserted_ids = {content_hash: example_id for example_id, content_hash in cur.fetchall()}
+        bump_corpus_versions(cur, [GREENWASH_SCOPE])
+    if greenwash_index.ready:
+        greenwash_index.load()
 
+    results = []
+    reported: set[str] = set()
+    for h in hashes:
+        if h in existing:
+            results.append((existing[h], False))
+        else:
+            # Only the first of several identical texts counts as the insert.
+            results.append((inserted_ids[h], h not in reported))
+            reported.add(h)
+    return results
 
-def ingest_greenwash_example(text: str):
-    emb = embed_text(text)
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO greenwash_examples (content, embedding)
-        VALUES (%s, %s::vector)
-        """,
-        (text, str(emb)),
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
 
+def ingest_greenwash_example(text: str) -> bool:
+    return ingest_greenwash_examples([text])[0]
 
-def ingest_all():
-    init_db()
 
-    esg_dir = DATA_DIR / "esg_docs"
-    greenwash_dir = DATA_DIR / "greenwash_cases"
+def delete_greenwash_examples(example_ids: list[int]) -> int:
+    if not example_ids:
+        return 0
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM greenwash_examples WHERE id = ANY(%s)", (list(example_ids),))
+        removed = cur.rowcount
+        if removed:
+            bump_corpus_versions(cur, [GREENWASH_SCOPE])
+    if removed and greenwash_index.ready:
+        greenwash_index.load()
+    return removed
 
-    for filepath in sorted(esg_dir.glob("*.txt")):
-        parts = filepath.stem.split("_", maxsplit=2)
-        if len(parts) < 3:
-            print(f"Skipping {filepath.name} — expected CompanyName_Sector_DocType.txt")
-            continue
-        company, sector, doc_type = parts
-        text = filepath.read_text(encoding="utf-8").strip()
-        if not text:
-            continue
-        print(f"Ingesting ESG doc: {company} / {sector} / {doc_type}")
-        ingest_esg_doc(company, sector, doc_type, text)
 
-    for filepath in sorted(greenwash_dir.glob("*.txt")):
-        text = filepath.read_text(encoding="utf-8").strip()
-        if not text:
+def _esg_document_from_file(filepath: pathlib.Path) -> EsgDocument | None:
+    parts = filepath.stem.split("_", maxsplit=2)
+    if len(parts) < 3:
+        print(f"Skipping {filepath.name} — expected CompanyName_Sector_DocType.txt")
+        return None
+    company, sector, doc_type = parts
+    text = filepath.read_text(encoding="utf-8").strip()
+    if not text:
+        return None
+    return EsgDocument(company, sector, doc_type, text)
+
+
+def _batched(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _scan_changed(
+    files: list[pathlib.Path], known: dict[str, ManifestEntry]
+) -> tuple[list[tuple[pathlib.Path, os.stat_result]], int]:
+    """Split files into (changed or new, with their stat) and a count of unchanged ones."""
+    changed = []
+    unchanged = 0
+    for path in files:
+        stat = path.stat()
+        entry = known.get(IngestManifest.key(path))
+        if entry is not None and entry.matches(stat):
+            unchanged += 1
+        else:
+            changed.append((path, stat))
+    return changed, unchanged
+
+
+def _manifest_entry(
+    path: pathlib.Path, kind: str, stat: os.stat_result, content_hash: str, row_ids: list[int]
+) -> ManifestEntry:
+    return ManifestEntry(IngestManifest.key(path), kind, stat.st_size, stat.st_mtime_ns, content_hash, row_ids)
+
+
+def _unreferenced(row_ids: list[int], known: dict[str, ManifestEntry]) -> list[int]:
+    # Identical files share one row, so a row is only removable once no entry points at it.
+    referenced = {row_id for entry in known.values() for row_id in entry.row_ids}
+    return [row_id for row_id in dict.fromkeys(row_ids) if row_id not in referenced]
+
+
+def _row_ids(results: list[tuple[int | None, bool]]) -> list[list[int]]:
+    return [[row_id] if row_id is not None else [] for row_id, _ in results]
+
+
+def _prune_vanished(
+    root: pathlib.Path,
+    recursive: bool,
+    files: list[pathlib.Path],
+    known: dict[str, ManifestEntry],
+    manifest: IngestManifest,
+    delete: Callable[[list[int]], int],
+) -> int:
+    """Forget files under ``root`` that are no longer on disk and delete their unshared rows."""
+    root_key = IngestManifest.key(root)
+    present = {IngestManifest.key(path) for path in files}
+    vanished = [
+        key
+        for key in known
+        if key not in present
+        and (os.path.dirname(key) == root_key or (recursive and key.startswith(root_key + os.sep)))
+    ]
+    if not vanished:
+        return 0
+    stale_ids = [row_id for key in vanished for row_id in known.pop(key).row_ids]
+    delete(_unreferenced(stale_ids, known))
+    manifest.delete_many(vanished)
+    return len(vanished)
+
+
+def _ingest_esg_files(
+    changed: list[tuple[pathlib.Path, os.stat_result]],
+    known: dict[str, ManifestEntry],
+    manifest: IngestManifest,
+    batch_size: int,
+) -> tuple[int, int]:
+    total_docs = 0
+    total_inserted = 0
+    for batch in _batched(changed, batch_size):
+        entries: list[ManifestEntry] = []
+        docs: list[EsgDocument] = []
+        sources: list[tuple[pathlib.Path, os.stat_result, str]] = []
+        stale_ids: list[int] = []
+        for path, stat in batch:
+            previous = known.pop(IngestManifest.key(path), None)
+            doc = _esg_document_from_file(path)
+            if doc is None:
+                # Emptied or unreadable now: drop what an earlier version ingested.
+                if previous is not None:
+                    stale_ids.extend(previous.row_ids)
+                entry = _manifest_entry(path, "esg", stat, "", [])
+                entries.append(entry)
+                known[entry.path] = entry
+                continue
+            content_hash = _hash_content(doc.text)
+            if previous is not None and previous.content_hash == content_hash:
+                # Touched but not edited: refresh size/mtime only.
+                entry = _manifest_entry(path, "esg", stat, content_hash, previous.row_ids)
+                entries.append(entry)
+                known[entry.path] = entry
+                continue
+            if previous is not None:
+                stale_ids.extend(previous.row_ids)
+            doc.metadata["content_hash"] = content_hash
+            docs.append(doc)
+            sources.append((path, stat, content_hash))
+
+        replaced = delete_esg_sources(_unreferenced(stale_ids, known))
+        results = _ingest_esg_docs(docs)
+        for (path, stat, content_hash), row_ids in zip(sources, _row_ids(results)):
+            entry = _manifest_entry(path, "esg", stat, content_hash, row_ids)
+            entries.append(entry)
+            known[entry.path] = entry
+        manifest.put_many(entries)
+
+        inserted = sum(flag for _, flag in results)
+        total_docs += len(docs)
+        total_inserted += inserted
+        if not docs:
             continue
-        print(f"Ingesting greenwash case: {filepath.name}")
-        ingest_greenwash_example(text)
+        print(
+            f"Ingested ESG batch: {inserted} new of {len(docs)} changed docs"
+            f"{f', {replaced} replaced' if replaced else ''} ({total_docs} so far)"
+        )
+    return total_docs, total_inserted
+
+
+def _ingest_greenwash_files(
+    changed: list[tuple[pathlib.Path, os.stat_result]],
+    known: dict[str, ManifestEntry],
+    manifest: IngestManifest,
+    batch_size: int,
+) -> int:
+    total_inserted = 0
+    for batch in _batched(changed, batch_size):
+        entries: list[ManifestEntry] = []
+        texts: list[str] = []
+        sources: list[tuple[pathlib.Path, os.stat_result, str]] = []
+        stale_ids: list[int] = []
+        for path, stat in batch:
+            previous = known.pop(IngestManifest.key(path), None)
+            text = path.read_text(encoding="utf-8").strip()
+            content_hash = _hash_content(text) if text else ""
+            if not text:
+                if previous is not None:
+                    stale_ids.extend(previous.row_ids)
+                entry = _manifest_entry(path, "greenwash", stat, "", [])
+                entries.append(entry)
+                known[entry.path] = entry
+                continue
+            if previous is not None and previous.content_hash == content_hash:
+                entry = _manifest_entry(path, "greenwash", stat, content_hash, previous.row_ids)
+                entries.append(entry)
+                known[entry.path] = entry
+                continue
+            if previous is not None:
+                stale_ids.extend(previous.row_ids)
+            print(f"Ingesting greenwash case: {path.name}")
+            texts.append(text)
+            sources.append((path, stat, content_hash))
+
+        delete_greenwash_examples(_unreferenced(stale_ids, known))
+        results = _ingest_greenwash_examples(texts)
+        for (path, stat, content_hash), row_ids in zip(sources, _row_ids(results)):
+            entry = _manifest_entry(path, "greenwash", stat, content_hash, row_ids)
+            entries.append(entry)
+            known[entry.path] = entry
+        manifest.put_many(entries)
+        total_inserted += sum(flag for _, flag in results)
+    return total_inserted
+
+
+def ingest_all(
+    esg_dir: pathlib.Path | None = None,
+    greenwash_dir: pathlib.Path | None = None,
+    batch_size: int = INGEST_BATCH_SIZE,
+    recursive: bool = False,
+    manifest_path: str = INGEST_MANIFEST_PATH,
+    full: bool = False,
+):
+    """Ingest new or changed ESG docs and greenwash cases under the given directories.
 
-    print("Ingestion complete.")
+    The ingest manifest lets reruns skip unchanged files without reading them,
+    replace the rows of edited ones and delete the rows of files that were removed;
+    ``full`` ignores it and re-checks every file.
+    Files are processed in batches of ``batch_size`` documents; each batch costs one
+    dedupe query, batched embedding requests and a single COPY transaction, and is
+    recorded in the manifest once committed, so an interrupted run can be resumed.
+    """
+    init_db()
+
+    esg_dir = esg_dir or DATA_DIR / "esg_docs"
+    greenwash_dir = greenwash_dir or DATA_DIR / "greenwash_cases"
+    pattern = "**/*.txt" if recursive else "*.txt"
+    batch_size = max(1, batch_size)
+
+    manifest = IngestManifest(manifest_path)
+    try:
+        if full:
+            manifest.clear()
+        known_esg = manifest.entries("esg")
+        files = sorted(esg_dir.glob(pattern))
+        changed, unchanged_esg = _scan_changed(files, known_esg)
+        total_docs, total_inserted = _ingest_esg_files(changed, known_esg, manifest, batch_size)
+        removed_esg = _prune_vanished(esg_dir, recursive, files, known_esg, manifest, delete_esg_sources)
+
+        known_cases = manifest.entries("greenwash")
+        files = sorted(greenwash_dir.glob(pattern))
+        changed, unchanged_cases = _scan_changed(files, known_cases)
+        cases_inserted = _ingest_greenwash_files(changed, known_cases, manifest, batch_size)
+        removed_cases = _prune_vanished(
+            greenwash_dir, recursive, files, known_cases, manifest, delete_greenwash_examples
+        )
+    finally:
+        manifest.close()
+
+    print(
+        f"Ingestion complete: {total_inserted} new ESG docs ({total_docs} changed, {unchanged_esg} unchanged, "
+        f"{removed_esg} removed), {cases_inserted} new greenwash cases ({unchanged_cases} unchanged, "
+        f"{removed_cases} removed)."
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m backend.ingest",
+        description="Ingest ESG docs and greenwash cases.",
+    )
+    parser.add_argument(
+        "--esg-dir", type=pathlib.Path, default=None, help="directory of CompanyName_Sector_DocType.txt files"
+    )
+    parser.add_argument(
+        "--greenwash-dir", type=pathlib.Path, default=None, help="directory of greenwash case .txt files"
+    )
+    parser.add_argument("--recursive", action="store_true", help="walk the directories recursively")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help="documents per transaction")
+    parser.add_argument("--manifest", default=INGEST_MANIFEST_PATH, help="ingest manifest (SQLite) path")
+    parser.add_argument(
+        "--full", action="store_true", help="ignore the manifest and re-check every file (e.g. after resetting the DB)"
+    )
+    args = parser.parse_args(argv)
+    ingest_all(
+        esg_dir=args.esg_dir,
+        greenwash_dir=args.greenwash_dir,
+        batch_size=args.batch_size,
+        recursive=args.recursive,
+        manifest_path=args.manifest,
+        full=args.full,
+    )
 
 
 if __name__ == "__main__":
-    ingest_all()
+    main()
@@ -0,0 +1,265 @@
+"""
+Background jobs for slow endpoints (live discovery, document uploads).
+
+Handlers run on a pool of JOB_WORKERS threads, so API workers return as soon as
+the work is queued. Job state (status, progress, result, error) is kept in a
+SQLite file and served by GET /jobs/{id}. Handlers are in-process callables, so
+jobs are not resumed after a restart. Each process records itself as the owner of
+the jobs it accepts and heartbeats while running; queued or running jobs whose
+owner has stopped heartbeating are marked failed by any process sharing the file,
+so uvicorn workers never fail each other's live jobs.
+"""
+
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "100"))
+JOB_RETENTION_SEC = float(os.getenv("JOB_RETENTION_SEC", "86400"))
+JOB_HEARTBEAT_SEC = float(os.getenv("JOB_HEARTBEAT_SEC", "10"))
+# An owner silent for this long is gone; its unfinished jobs are failed.
+JOB_ORPHAN_TIMEOUT_SEC = float(os.getenv("JOB_ORPHAN_TIMEOUT_SEC", "60"))
+JOB_DB_PATH = os.getenv(
+    "JOB_DB_PATH",
+    str(pathlib.Path(__file__).resolve().parent.parent / "data" / "jobs.sqlite3"),
+)
+
+ProgressCallback = Callable[[dict], None]
+
+
+class JobQueueFull(Exception):
+    """Raised by ``submit`` when JOB_MAX_PENDING jobs are already waiting or running."""
+
+
+def _iso(timestamp: float | None) -> str | None:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def _error_message(exc: Exception) -> str:
+    # HTTPException-style errors carry a user-facing ``detail``.
+    detail = getattr(exc, "detail", None)
+    if detail:
+        return str(detail)
+    return f"{type(exc).__name__}: {exc}" if str(exc) else type(exc).__name__
+
+
+class JobQueue:
+    def __init__(
+        self,
+        path: str = JOB_DB_PATH,
+        workers: int = JOB_WORKERS,
+        max_pending: int = JOB_MAX_PENDING,
+        retention_sec: float = JOB_RETENTION_SEC,
+        heartbeat_sec: float = JOB_HEARTBEAT_SEC,
+        orphan_timeout_sec: float = JOB_ORPHAN_TIMEOUT_SEC,
+    ):
+        self.path = path
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.retention_sec = retention_sec
+        self.heartbeat_sec = heartbeat_sec
+        self.orphan_timeout_sec = max(orphan_timeout_sec, 2 * heartbeat_sec)
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._db: sqlite3.Connection | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending = 0
+        self._submitted = 0
+        self._rejected = 0
+
+    def start(self) -> None:
+        """Open the job store, register this process as an owner and fail orphaned jobs."""
+        with self._lock:
+            if self._db is not None:
+                return
+            pathlib.Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+                """
+            )
+            if "owner" not in {row[1] for row in db.execute("PRAGMA table_info(jobs)")}:
+                db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS job_owners (owner TEXT PRIMARY KEY, heartbeat_at REAL NOT NULL)"
+            )
+            db.execute("INSERT OR REPLACE INTO job_owners (owner, heartbeat_at) VALUES (?, ?)", (self.owner, time.time()))
+            self._db = db
+            self._fail_orphans()
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+            self._stopped.clear()
+            threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True).start()
+
+    def _fail_orphans(self) -> None:
+        # Caller holds _lock. Rows without an owner predate ownership tracking.
+        now = time.time()
+        cutoff = now - self.orphan_timeout_sec
+        self._db.execute(
+            """
+            UPDATE jobs SET status = 'failed', error = ?, finished_at = ?
+            WHERE status IN ('queued', 'running')
+              AND (owner IS NULL OR owner NOT IN (SELECT owner FROM job_owners WHERE heartbeat_at >= ?))
+            """,
+            ("Interrupted: the server process running it stopped.", now, cutoff),
+        )
+        self._db.execute("DELETE FROM job_owners WHERE heartbeat_at < ?", (cutoff,))
+
+    def _heartbeat(self) -> None:
+        while not self._stopped.wait(self.heartbeat_sec):
+            with self._lock:
+                if self._db is None:
+                    return
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO job_owners (owner, heartbeat_at) VALUES (?, ?)",
+                        (self.owner, time.time()),
+                    )
+                    self._fail_orphans()
+                except sqlite3.Error as exc:
+                    print(f"Job heartbeat failed ({type(exc).__name__}): {exc}")
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        with self._lock:
+            executor, db = self._executor, self._db
+            self._executor = None
+            self._db = None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if db is not None:
+            # Only this process's jobs: sibling workers keep theirs.
+            db.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? "
+                "WHERE owner = ? AND status IN ('queued', 'running')",
+                ("Interrupted by a server shutdown.", time.time(), self.owner),
+            )
+            db.execute("DELETE FROM job_owners WHERE owner = ?", (self.owner,))
+            db.close()
+
+    def _execute(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self._lock:
+            if self._db is None:
+                return []
+            return self._db.execute(sql, params).fetchall()
+
+    def submit(self, kind: str, func: Callable[..., Any], *args, **kwargs) -> dict:
+        """Queue ``func(progress, *args, **kwargs)`` and return the new job's record.
+
+        ``progress`` is a callback taking a dict that becomes the job's ``progress``.
+        The handler's return value (JSON-serialisable) becomes its ``result``.
+        """
+        self.start()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise JobQueueFull(f"{self._pending} jobs are already pending.")
+            self._pending += 1
+            self._submitted += 1
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._execute(
+            "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+            (now - self.retention_sec,),
+        )
+        self._execute(
+            "INSERT INTO jobs (id, kind, status, created_at, owner) VALUES (?, ?, 'queued', ?, ?)",
+            (job_id, kind, now, self.owner),
+        )
+        try:
+            self._executor.submit(self._run, job_id, func, args, kwargs)
+        except RuntimeError:
+            # Executor shut down between start() and submit().
+            self._finish(job_id, "failed", error="Job queue is shutting down.")
+            raise
+        return self.get(job_id)
+
+    def _run(self, job_id: str, func: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        self._execute(
+            "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ? AND status = 'queued'",
+            (time.time(), job_id),
+        )
+
+        def progress(update: dict) -> None:
+            self._execute("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(update), job_id))
+
+        try:
+            result = func(progress, *args, **kwargs)
+        except Exception as exc:
+            self._finish(job_id, "failed", error=_error_message(exc))
+        else:
+            self._finish(job_id, "succeeded", result=result)
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: str | None = None) -> None:
+        try:
+            try:
+                encoded = json.dumps(result) if result is not None else None
+            except (TypeError, ValueError) as exc:
+                status, encoded, error = "failed", None, f"Job result is not JSON-serialisable: {exc}"
+            # A job already failed as orphaned stays failed.
+            self._execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? "
+                "WHERE id = ? AND status IN ('queued', 'running')",
+                (status, encoded, error, time.time(), job_id),
+            )
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def get(self, job_id: str) -> dict | None:
+        rows = self._execute(
+            """
+            SELECT id, kind, status, progress, result, error, created_at, started_at, finished_at
+            FROM jobs WHERE id = ?
+            """,
+            (job_id,),
+        )
+        if not rows:
+            return None
+        job_id, kind, status, progress, result, error, created_at, started_at, finished_at = rows[0]
+        return {
+            "job_id": job_id,
+            "kind": kind,
+            "status": status,
+            "progress": json.loads(progress) if progress else None,
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "created_at": _iso(created_at),
+            "started_at": _iso(started_at),
+            "finished_at": _iso(finished_at),
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "submitted": self._submitted,
+                "rejected": self._rejected,
+            }
+
+
+job_queue = JobQueue()
@@ -1,26 +1,50 @@
+import asyncio
 from contextlib import asynccontextmanager
-from io import BytesIO
+import json
+import os
 import pathlib
 import random
 import re
+import tempfile
 import time
-from fastapi import FastAPI, File, Form, HTTPException, Query, UploadFile
-from fastapi.responses import FileResponse
+from typing import BinaryIO, Iterator, Literal, TextIO
+from fastapi import FastAPI, File, Form, HTTPException, Query, Response, UploadFile
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pypdf import PdfReader
-from backend.db import get_conn
-from backend.db import init_db
-from backend.detect import search_company_esg, search_similar_greenwash, search_peer_esg, risk_score
-from backend.discovery import discover_and_ingest
+from pydantic import BaseModel, Field
+from backend.analysis_cache import analysis_cache, analysis_scopes
+from backend.claims import aggregate_matches, chunk_passages, claims_centroid, extract_claims
+from backend.db import close_pool, connection, fetch_corpus_versions, init_db, pool_stats, sector_scope
+from backend.detect import (
+    risk_score,
+    search_company_chunks,
+    search_company_chunks_many,
+    search_company_esg,
+    search_company_esg_many,
+    search_peer_esg,
+    search_peer_esg_many,
+    search_similar_greenwash_many,
+)
+from backend.discovery import discover_and_ingest, discovery_enabled
+from backend.embed import embed_texts, embedding_cache_stats
+from backend.greenwash_index import greenwash_index
 from backend.hardcoded import fake_discovery_payload, hardcoded_analyze_payload
-from backend.ingest import ingest_esg_doc
-from backend.rag import generate_report
+from backend.ingest import ingest_esg_pages, ingest_esg_text
+from backend.jobs import JobQueueFull, ProgressCallback, job_queue
+from backend.metrics import histogram, register_collector, render as render_metrics
+from backend.pdf_extract import PdfExtractionError, iter_pdf_pages, shutdown_pdf_pool
+from backend.rag import agenerate_report, generate_report, is_fallback_report, stream_report
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
+    greenwash_index.load()
+    job_queue.start()
     yield
+    job_queue.shutdown()
+    shutdown_pdf_pool()
+    close_pool()
 
 
 app = FastAPI(
@@ -32,8 +56,23 @@ app = FastAPI(
 DATA_ESG_DIR = pathlib.Path(__file__).resolve().parent.parent / "data" / "esg_docs"
 FRONTEND_DIR = pathlib.Path(__file__).resolve().parent.parent / "frontend"
 MAX_UPLOAD_BYTES = 15 * 1024 * 1024
+UPLOAD_COPY_CHUNK_BYTES = 1024 * 1024
 DEFAULT_SECTOR = "Unknown"
 DEFAULT_DOC_TYPE = "ESGReport"
+ANALYSIS_CACHE_HEADER = "X-Analysis-Cache"
+ANALYZE_BATCH_MAX_COMPANIES = 500
+ANALYZE_BATCH_REPORT_CONCURRENCY = 4
+
+HTTP_REQUEST_SECONDS = histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency until the response body completes, by route template.",
+    ("method", "route", "status"),
+)
+ANALYZE_STAGE_SECONDS = histogram(
+    "analyze_stage_duration_seconds",
+    "Stage latency of uncached analyses, from the per-request timings.",
+    ("endpoint", "stage"),
+)
 
 
 def _safe_token(value: str) -> str:
@@ -46,50 +85,165 @@ def _clean_or_default(value: str | None, default: str) -> str:
     return cleaned or default
 
 
-def _extract_text_from_pdf(content_bytes: bytes) -> str:
-    try:
-        reader = PdfReader(BytesIO(content_bytes))
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid PDF file.")
+_NO_PDF_TEXT_DETAIL = (
+    "No extractable text found in PDF. "
+    "Please upload a text-based PDF (not image-only/scanned)."
+)
+_UPLOAD_TOO_LARGE_DETAIL = "File too large. Max size is 15 MB."
+
+
+class _UploadSizeLimit:
+    """Reject upload request bodies over ``limit`` bytes as they stream in.
+
+    Declared sizes are refused before any of the body is read; otherwise the
+    request fails as soon as the running total passes the limit, rather than
+    after the whole file has been spooled.
+    """
+
+    def __init__(self, app, paths: tuple[str, ...], limit: int):
+        self.app = app
+        self.paths = paths
+        self.limit = limit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        declared = dict(scope["headers"]).get(b"content-length", b"")
+        if declared.isdigit() and int(declared) > self.limit:
+            response = JSONResponse({"detail": _UPLOAD_TOO_LARGE_DETAIL}, status_code=400)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.limit:
+                    raise HTTPException(status_code=400, detail=_UPLOAD_TOO_LARGE_DETAIL)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+# The body limit allows for multipart framing and the form fields around the file.
+app.add_middleware(_UploadSizeLimit, paths=("/upload", "/upload/esg"), limit=MAX_UPLOAD_BYTES + 64 * 1024)
+
+
+class _RequestMetrics:
+    """Observe every HTTP request's latency, labelled by route template rather than raw path."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def record_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
 
-    if reader.is_encrypted:
         try:
-            reader.decrypt("")
-        except Exception:
-            raise HTTPException(status_code=400, detail="Encrypted PDF files are not supported.")
-
-    pages: list[str] = []
-    for page in reader.pages:
-        page_text = (page.extract_text() or "").strip()
-        if page_text:
-            pages.append(page_text)
-
-    text = "\n\n".join(pages).strip()
-    if not text:
+            await self.app(scope, receive, record_status)
+        finally:
+            # The router stores the matched route in the scope; unmatched paths share one label.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started, method=scope["method"], route=route, status=str(status)
+            )
+
+
+# Added last so it is outermost and also times requests the upload guard rejects.
+app.add_middleware(_RequestMetrics)
+
+
+def _spool_upload(source: BinaryIO, suffix: str) -> pathlib.Path:
+    """Copy an upload to a temporary file in UPLOAD_COPY_CHUNK_BYTES pieces, enforcing MAX_UPLOAD_BYTES."""
+    fd, name = tempfile.mkstemp(prefix="upload-", suffix=suffix)
+    path = pathlib.Path(name)
+    try:
+        with os.fdopen(fd, "wb") as target:
+            size = 0
+            while chunk := source.read(UPLOAD_COPY_CHUNK_BYTES):
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=400, detail=_UPLOAD_TOO_LARGE_DETAIL)
+                target.write(chunk)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return path
+
+
+def _iter_text_blocks(path: pathlib.Path) -> Iterator[str]:
+    # newline="" keeps line endings as uploaded; invalid UTF-8 is dropped.
+    with open(path, encoding="utf-8", errors="ignore", newline="") as handle:
+        while block := handle.read(UPLOAD_COPY_CHUNK_BYTES):
+            yield block
+
+
+def _ingest_upload(
+    progress: ProgressCallback,
+    company: str,
+    sector: str,
+    doc_type: str,
+    upload_path: pathlib.Path,
+    out: TextIO,
+) -> tuple[int, str]:
+    """Extract and ingest an uploaded file incrementally, writing its text to ``out``.
+
+    PDFs go page by page, so chunks are embedded while later pages extract. Returns
+    the text length in characters and the source type.
+    """
+    if upload_path.suffix != ".pdf":
+        progress({"stage": "ingesting"})
+        _, chars = ingest_esg_text(company, sector, doc_type, _iter_text_blocks(upload_path), out=out)
+        if not chars:
+            raise HTTPException(status_code=400, detail="Uploaded file is empty.")
+        return chars, "txt"
+
+    def pages():
+        for count, page in enumerate(iter_pdf_pages(upload_path), start=1):
+            progress({"stage": "extracting", "pages": count})
+            yield page
+
+    progress({"stage": "extracting", "pages": 0})
+    try:
+        _, chars = ingest_esg_pages(company, sector, doc_type, pages(), out=out)
+    except PdfExtractionError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if not chars:
+        raise HTTPException(status_code=400, detail=_NO_PDF_TEXT_DETAIL)
+    return chars, "pdf"
+
+
+def _submit_job(kind: str, func, *args, **kwargs) -> dict:
+    """Queue a background job; returns its record plus where to poll for it."""
+    try:
+        job = job_queue.submit(kind, func, *args, **kwargs)
+    except JobQueueFull:
         raise HTTPException(
-            status_code=400,
-            detail=(
-                "No extractable text found in PDF. "
-                "Please upload a text-based PDF (not image-only/scanned)."
-            ),
+            status_code=503,
+            detail="Too many background jobs are pending; try again shortly.",
+            headers={"Retry-After": "5"},
         )
-    return text
-
-
-def _extract_uploaded_text(filename: str, content_bytes: bytes) -> tuple[str, str]:
-    lower_name = filename.lower()
-    if lower_name.endswith(".txt"):
-        text = content_bytes.decode("utf-8", errors="ignore").strip()
-        source_type = "txt"
-    elif lower_name.endswith(".pdf"):
-        text = _extract_text_from_pdf(content_bytes)
-        source_type = "pdf"
-    else:
-        raise HTTPException(status_code=400, detail="Only .txt and .pdf files are supported.")
+    return {**job, "status_url": f"/jobs/{job['job_id']}"}
 
-    if not text:
-        raise HTTPException(status_code=400, detail="Uploaded file is empty.")
-    return text, source_type
+
+def _enqueue(response: Response, kind: str, func, *args, **kwargs) -> dict:
+    """Queue a background job and answer 202 with it."""
+    job = _submit_job(kind, func, *args, **kwargs)
+    response.status_code = 202
+    return job
 
 
 app.mount("/static", StaticFiles(directory=FRONTEND_DIR), name="static")
@@ -104,22 +258,41 @@ def frontend():
 @app.post("/upload")
 @app.post("/upload/esg")
 async def upload_esg(
+    response: Response,
     company: str = Form(...),
     sector: str | None = Form(None),
     doc_type: str | None = Form(None),
     file: UploadFile = File(...),
 ):
+    """Accept an ESG report and queue its extraction and ingestion as a background job."""
     if not file.filename:
         raise HTTPException(status_code=400, detail="File name is required.")
     company_clean = company.strip()
     if not company_clean:
         raise HTTPException(status_code=400, detail="Company is required.")
+    if not file.filename.lower().endswith((".txt", ".pdf")):
+        raise HTTPException(status_code=400, detail="Only .txt and .pdf files are supported.")
 
-    content_bytes = await file.read()
-    if len(content_bytes) > MAX_UPLOAD_BYTES:
-        raise HTTPException(status_code=400, detail="File too large. Max size is 15 MB.")
-
-    text, source_type = _extract_uploaded_text(file.filename, content_bytes)
+    suffix = ".pdf" if file.filename.lower().endswith(".pdf") else ".txt"
+    # Starlette has already spooled the file; copy it out because the job outlives the request.
+    upload_path = await asyncio.to_thread(_spool_upload, file.file, suffix)
+    try:
+        return _enqueue(
+            response, "upload", _process_upload,
+            company_clean, sector, doc_type, upload_path,
+        )
+    except BaseException:
+        upload_path.unlink(missing_ok=True)
+        raise
+
+
+def _process_upload(
+    progress: ProgressCallback,
+    company_clean: str,
+    sector: str | None,
+    doc_type: str | None,
+    upload_path: pathlib.Path,
+) -> dict:
     sector_clean = _clean_or_default(sector, DEFAULT_SECTOR)
     doc_type_clean = _clean_or_default(doc_type, DEFAULT_DOC_TYPE)
 
@@ -127,11 +300,20 @@ async def upload_esg(
     clean_sector = _safe_token(sector_clean)
     clean_doc_type = _safe_token(doc_type_clean)
 
-    DATA_ESG_DIR.mkdir(parents=True, exist_ok=True)
     out_path = DATA_ESG_DIR / f"{clean_company}_{clean_sector}_{clean_doc_type}.txt"
-    out_path.write_text(text, encoding="utf-8")
-
-    ingest_esg_doc(company=company_clean, sector=sector_clean, doc_type=doc_type_clean, text=text)
+    # Written alongside and renamed on success, so directory ingestion never sees a partial file.
+    partial_path = out_path.with_name(out_path.name + ".part")
+    try:
+        DATA_ESG_DIR.mkdir(parents=True, exist_ok=True)
+        with open(partial_path, "w", encoding="utf-8", newline="") as out:
+            chars, source_type = _ingest_upload(
+                progress, company_clean, sector_clean, doc_type_clean, upload_path, out,
+            )
+        os.replace(partial_path, out_path)
+    finally:
+        partial_path.unlink(missing_ok=True)
+        upload_path.unlink(missing_ok=True)
+    analysis_cache.invalidate(company_clean)
 
     return {
         "status": "ok",
@@ -141,53 +323,72 @@ async def upload_esg(
         "sector": sector_clean,
         "doc_type": doc_type_clean,
         "source_type": source_type,
-        "chars": len(text),
+        "chars": chars,
     }
 
 
-@app.get("/analyze/{company}")
-def analyze(company: str):
-    hardcoded = hardcoded_analyze_payload(company)
-    if hardcoded is not None:
-        time.sleep(random.uniform(8.0, 12.0))
-        return hardcoded
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
 
-    company_docs = search_company_esg(company)
 
-    if not company_docs:
-        return {
-            "company": company,
-            "status": "no_data",
-            "risk_score": 0.0,
-            "explanation": (
-                f"No ESG documents are available for '{company}' yet. "
-                "Try enabling live discovery again or upload a report manually."
-            ),
-            "citations": [],
-            "source_citations": [],
-        }
-
-    combined_claims = " ".join(content for content, *_ in company_docs)
-
-    greenwash_matches = search_similar_greenwash(combined_claims, k=5)
-    score = risk_score(greenwash_matches)
+async def _timed(timings: dict[str, float], stage: str, func, *args, **kwargs):
+    """Run a blocking call in a worker thread and record its wall time in milliseconds."""
+    started = time.perf_counter()
+    try:
+        return await asyncio.to_thread(func, *args, **kwargs)
+    finally:
+        timings[f"{stage}_ms"] = _elapsed_ms(started)
+
+
+def _observe_timings(endpoint: str, timings: dict[str, float]) -> None:
+    for key, value in timings.items():
+        ANALYZE_STAGE_SECONDS.observe(value / 1000, endpoint=endpoint, stage=key.removesuffix("_ms"))
+
+
+def _server_timing(timings: dict[str, float]) -> str:
+    """Format stage timings as a Server-Timing header, shown by browser dev tools."""
+    return ", ".join(f"{key.removesuffix('_ms')};dur={value}" for key, value in timings.items())
+
+
+def _no_data_payload(company: str) -> dict:
+    return {
+        "company": company,
+        "status": "no_data",
+        "risk_score": 0.0,
+        "explanation": (
+            f"No ESG documents are available for '{company}' yet. "
+            "Try enabling live discovery again or upload a report manually."
+        ),
+        "citations": [],
+        "source_citations": [],
+    }
+
+
+def _company_claims(company_chunks: list[tuple[int, str]]) -> list[str]:
+    return extract_claims(chunk_passages(company_chunks))
+
 
+def _evidence_payload(
+    company: str,
+    company_docs: list[tuple],
+    pattern_matches: list[tuple[str, float, str]],
+    peer_docs: list[tuple[str, str, float]],
+) -> tuple[dict, dict]:
+    """Score a company from its retrieved evidence.
+
+    ``pattern_matches`` are (greenwash pattern, similarity, company claim) triples from
+    ``aggregate_matches``. Returns the response payload (without the LLM explanation)
+    and the keyword arguments for report generation.
+    """
     sector = company_docs[0][1]
-    peer_docs = search_peer_esg(company, sector, combined_claims, k=5)
+    greenwash_matches = [(content, sim) for content, sim, _claim in pattern_matches]
+    score = risk_score(greenwash_matches)
 
     company_claims_for_report = [(content, sector, doc_type) for content, sector, doc_type, *_ in company_docs]
 
-    explanation = generate_report(
-        company=company,
-        company_claims=company_claims_for_report,
-        greenwash_matches=greenwash_matches,
-        peer_comparisons=peer_docs,
-        score=score,
-    )
-
     citations = [
-        {"content": content[:300], "similarity": round(sim, 3)}
-        for content, sim in greenwash_matches
+        {"content": content[:300], "similarity": round(sim, 3), "claim": claim[:300]}
+        for content, sim, claim in pattern_matches
     ]
 
     discovered_sources = []
@@ -205,53 +406,366 @@ def analyze(company: str):
             }
         )
 
-    return {
+    payload = {
         "company": company,
+        "sector": sector,
         "risk_score": score,
-        "explanation": explanation,
         "citations": citations,
         "source_citations": discovered_sources,
     }
+    report_kwargs = {
+        "company": company,
+        "company_claims": company_claims_for_report,
+        "greenwash_matches": greenwash_matches,
+        "peer_comparisons": peer_docs,
+        "score": score,
+    }
+    return payload, report_kwargs
+
+
+async def _gather_evidence(
+    company: str, timings: dict[str, float], versions: dict[str, int] | None = None
+) -> tuple[dict, dict | None]:
+    """Run retrieval and scoring for a company.
+
+    Returns the response payload (without the LLM explanation) and the keyword
+    arguments for report generation, or None when the company has no documents.
+    ``versions`` (for the analysis cache) gains the sector's corpus version, read
+    before peer search so a concurrent sector ingest invalidates the result.
+    """
+    # Leading chunks describe the sources; claims are drawn from all of their chunks.
+    company_docs, company_chunks = await asyncio.gather(
+        _timed(timings, "company_docs", search_company_esg, company),
+        _timed(timings, "company_chunks", search_company_chunks, company),
+    )
+
+    if not company_docs:
+        return _no_data_payload(company), None
+
+    sector = company_docs[0][1]
+    if versions is not None and sector:
+        versions.update(await asyncio.to_thread(fetch_corpus_versions, [sector_scope(sector)]))
+    started = time.perf_counter()
+    claims = _company_claims(company_chunks)
+    timings["claims_ms"] = _elapsed_ms(started)
+
+    # Embed the claims in one batch, then match every claim against the greenwash
+    # patterns in one multi-query search while peers are searched by their centroid.
+    # Documents too short to yield a claim leave nothing to compare peers against.
+    claim_embeddings = await _timed(timings, "embed", embed_texts, claims)
+    peer_search = (
+        _timed(
+            timings, "peer_search",
+            search_peer_esg, company, sector, " ".join(claims), k=5, embedding=claims_centroid(claim_embeddings),
+        )
+        if claim_embeddings
+        else asyncio.sleep(0, result=[])
+    )
+    claim_matches, peer_docs = await asyncio.gather(
+        _timed(timings, "greenwash_search", search_similar_greenwash_many, claim_embeddings, k=5),
+        peer_search,
+    )
+    pattern_matches = aggregate_matches(claims, claim_matches, k=5)
+    return _evidence_payload(company, company_docs, pattern_matches, peer_docs)
+
+
+async def _corpus_versions(company: str, sector: str | None = None) -> dict[str, int] | None:
+    if not analysis_cache.enabled:
+        return None
+    return await asyncio.to_thread(fetch_corpus_versions, analysis_scopes(company, sector))
+
+
+async def _store_analysis(company: str, payload: dict, versions: dict[str, int] | None) -> None:
+    """Cache a finished analysis unless the report is a fallback or was cut off."""
+    if versions is None or is_fallback_report(payload.get("explanation", "")):
+        return
+    cached = {key: value for key, value in payload.items() if key != "timings"}
+    analysis_cache.put(company, cached, versions)
+
+
+@app.get("/analyze/{company}")
+async def analyze(company: str, response: Response):
+    hardcoded = hardcoded_analyze_payload(company)
+    if hardcoded is not None:
+        await asyncio.sleep(random.uniform(8.0, 12.0))
+        return hardcoded
+
+    started = time.perf_counter()
+    cached = await asyncio.to_thread(analysis_cache.get, company)
+    if cached is not None:
+        response.headers[ANALYSIS_CACHE_HEADER] = "hit"
+        timings = {"total_ms": _elapsed_ms(started)}
+        response.headers["Server-Timing"] = _server_timing(timings)
+        return {**cached, "timings": timings}
+    response.headers[ANALYSIS_CACHE_HEADER] = "miss"
+
+    timings: dict[str, float] = {}
+    versions = await _corpus_versions(company)
+    payload, report_kwargs = await _gather_evidence(company, timings, versions)
+    if report_kwargs is not None:
+        report_started = time.perf_counter()
+        payload["explanation"] = await agenerate_report(**report_kwargs)
+        timings["report_ms"] = _elapsed_ms(report_started)
+    await _store_analysis(company, payload, versions)
+
+    timings["total_ms"] = _elapsed_ms(started)
+    _observe_timings("analyze", timings)
+    response.headers["Server-Timing"] = _server_timing(timings)
+    payload["timings"] = timings
+    return payload
+
+
+class BatchAnalyzeRequest(BaseModel):
+    companies: list[str] = Field(..., min_length=1, max_length=ANALYZE_BATCH_MAX_COMPANIES)
+    # none: scores and citations only; inline: wait for every report; deferred: queue a report job.
+    reports: Literal["none", "inline", "deferred"] = "none"
+
+
+def _gather_evidence_many(companies: list[str], timings: dict[str, float]) -> list[tuple[dict, dict | None]]:
+    """``_gather_evidence`` for many companies with one query per stage.
+
+    Company documents and their chunks come from one query each, every company's
+    claims are embedded together, greenwash matches for all claims are one matrix
+    product against the in-memory index and peer search is a single LATERAL query.
+    """
+    started = time.perf_counter()
+    docs_by_company = search_company_esg_many(companies)
+    timings["company_docs_ms"] = _elapsed_ms(started)
+
+    started = time.perf_counter()
+    chunks_by_company = search_company_chunks_many(companies)
+    timings["company_chunks_ms"] = _elapsed_ms(started)
+
+    started = time.perf_counter()
+    found = [company for company in companies if docs_by_company[company.lower()]]
+    claims = [_company_claims(chunks_by_company[company.lower()]) for company in found]
+    offsets = [0]
+    for company_claims in claims:
+        offsets.append(offsets[-1] + len(company_claims))
+    timings["claims_ms"] = _elapsed_ms(started)
+
+    started = time.perf_counter()
+    embeddings = embed_texts([claim for company_claims in claims for claim in company_claims])
+    timings["embed_ms"] = _elapsed_ms(started)
+
+    started = time.perf_counter()
+    claim_matches = search_similar_greenwash_many(embeddings, k=5)
+    timings["greenwash_search_ms"] = _elapsed_ms(started)
+
+    started = time.perf_counter()
+    # Companies without claims have no centroid and so no peers.
+    peer_docs: list[list[tuple[str, str, float]]] = [[] for _ in found]
+    searched = [index for index, (start, end) in enumerate(zip(offsets, offsets[1:])) if end > start]
+    peers_found = search_peer_esg_many(
+        [(found[index], docs_by_company[found[index].lower()][0][1]) for index in searched],
+        [claims_centroid(embeddings[offsets[index] : offsets[index + 1]]) for index in searched],
+        k=5,
+    )
+    for index, peers in zip(searched, peers_found):
+        peer_docs[index] = peers
+    timings["peer_search_ms"] = _elapsed_ms(started)
+
+    evidence = {
+        company: _evidence_payload(
+            company,
+            docs_by_company[company.lower()],
+            aggregate_matches(company_claims, claim_matches[start:end], k=5),
+            peers,
+        )
+        for company, company_claims, start, end, peers in zip(found, claims, offsets, offsets[1:], peer_docs)
+    }
+    return [evidence.get(company, (_no_data_payload(company), None)) for company in companies]
+
+
+def _generate_reports(progress: ProgressCallback, report_kwargs: list[dict]) -> dict:
+    reports = {}
+    for done, kwargs in enumerate(report_kwargs, start=1):
+        reports[kwargs["company"]] = generate_report(**kwargs)
+        progress({"completed": done, "total": len(report_kwargs)})
+    return {"reports": reports}
+
+
+@app.post("/analyze/batch")
+async def analyze_batch(request: BatchAnalyzeRequest):
+    """Score many companies at once, for portfolio screening.
+
+    Retrieval is batched across companies, so the cost grows far slower than repeated
+    /analyze calls. Report generation is skipped unless ``reports`` asks for it inline
+    or as a background job (see /jobs/{id}).
+    """
+    started = time.perf_counter()
+    unique: dict[str, str] = {}
+    for company in request.companies:
+        if company.strip():
+            unique.setdefault(company.strip().lower(), company.strip())
+    companies = list(unique.values())
+    if not companies:
+        raise HTTPException(status_code=400, detail="At least one company is required.")
+
+    hardcoded = {company: hardcoded_analyze_payload(company) for company in companies}
+    live = [company for company in companies if hardcoded[company] is None]
+
+    timings: dict[str, float] = {}
+    evidence = dict(zip(live, await asyncio.to_thread(_gather_evidence_many, live, timings)))
+    report_kwargs = [kwargs for _, kwargs in evidence.values() if kwargs is not None]
+
+    response: dict = {}
+    if request.reports == "inline" and report_kwargs:
+        report_started = time.perf_counter()
+        limit = asyncio.Semaphore(ANALYZE_BATCH_REPORT_CONCURRENCY)
+
+        async def report(kwargs: dict) -> None:
+            async with limit:
+                evidence[kwargs["company"]][0]["explanation"] = await agenerate_report(**kwargs)
+
+        await asyncio.gather(*(report(kwargs) for kwargs in report_kwargs))
+        timings["report_ms"] = _elapsed_ms(report_started)
+    elif request.reports == "deferred" and report_kwargs:
+        response["report_job"] = _submit_job("analyze_batch_reports", _generate_reports, report_kwargs)
+
+    results = [hardcoded[company] if hardcoded[company] is not None else evidence[company][0] for company in companies]
+    timings["total_ms"] = _elapsed_ms(started)
+    _observe_timings("analyze_batch", timings)
+    return {"results": results, **response, "timings": timings}
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.get("/analyze/{company}/stream")
+async def analyze_stream(company: str):
+    """Server-sent events variant of /analyze.
+
+    Emits one ``evidence`` event (score, citations, sources) as soon as retrieval
+    finishes, then ``report`` events carrying explanation text deltas as the LLM
+    produces them, and finally a ``done`` event with stage timings. A failure after
+    the response has started ends the stream with an ``error`` event instead.
+    """
+
+    started = time.perf_counter()
+    cached = None
+    if hardcoded_analyze_payload(company) is None:
+        cached = await asyncio.to_thread(analysis_cache.get, company)
+
+    async def analysis_events():
+        hardcoded = hardcoded_analyze_payload(company)
+        if hardcoded is not None:
+            await asyncio.sleep(random.uniform(8.0, 12.0))
+        if hardcoded is not None or cached is not None:
+            complete = hardcoded if hardcoded is not None else cached
+            evidence = {key: value for key, value in complete.items() if key != "explanation"}
+            yield _sse("evidence", evidence)
+            yield _sse("report", {"delta": complete.get("explanation", "")})
+            yield _sse("done", {"timings": {"total_ms": _elapsed_ms(started)}})
+            return
+
+        timings: dict[str, float] = {}
+        versions = await _corpus_versions(company)
+        payload, report_kwargs = await _gather_evidence(company, timings, versions)
+        explanation = payload.pop("explanation", "")
+        timings["evidence_ms"] = _elapsed_ms(started)
+        yield _sse("evidence", payload)
+
+        if report_kwargs is None:
+            yield _sse("report", {"delta": explanation})
+        else:
+            report_started = time.perf_counter()
+            parts: list[str] = []
+            async for delta in stream_report(**report_kwargs):
+                if "report_first_token_ms" not in timings:
+                    timings["report_first_token_ms"] = _elapsed_ms(report_started)
+                parts.append(delta)
+                yield _sse("report", {"delta": delta})
+            timings["report_ms"] = _elapsed_ms(report_started)
+            explanation = "".join(parts)
+        await _store_analysis(company, {**payload, "explanation": explanation}, versions)
+
+        timings["total_ms"] = _elapsed_ms(started)
+        _observe_timings("analyze_stream", timings)
+        yield _sse("done", {"timings": timings})
+
+    async def events():
+        # The 200 status is already sent, so failures are reported in-band.
+        try:
+            async for event in analysis_events():
+                yield event
+        except Exception as exc:
+            print(f"Analysis stream for {company!r} failed ({type(exc).__name__}): {exc}")
+            yield _sse("error", {"detail": "Analysis failed before completing. Please try again."})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            ANALYSIS_CACHE_HEADER: "hit" if cached is not None else "miss",
+        },
+    )
 
 
 @app.post("/discover/{company}")
 def discover_company(
+    response: Response,
     company: str,
     sector: str = Query(DEFAULT_SECTOR),
     max_results: int = Query(8, ge=1, le=20),
 ):
+    """Queue live discovery for a company; poll the returned job for the result."""
     company_clean = company.strip()
     if not company_clean:
         raise HTTPException(status_code=400, detail="Company is required.")
 
     fake_result = fake_discovery_payload(company=company_clean, max_results=max_results)
+    if fake_result is None and not discovery_enabled():
+        raise HTTPException(status_code=503, detail="Live discovery is disabled. Set LIVE_DISCOVERY_ENABLED=true.")
+
+    return _enqueue(
+        response, "discover", _run_discovery,
+        company_clean, sector.strip() or DEFAULT_SECTOR, max_results, fake_result,
+    )
+
+
+def _run_discovery(
+    progress: ProgressCallback,
+    company_clean: str,
+    sector: str,
+    max_results: int,
+    fake_result: dict | None,
+) -> dict:
     if fake_result is not None:
         return fake_result
-
-    result = discover_and_ingest(company=company_clean, sector=sector.strip() or DEFAULT_SECTOR, max_results=max_results)
-    if result.get("status") == "disabled":
-        raise HTTPException(status_code=503, detail="Live discovery is disabled. Set LIVE_DISCOVERY_ENABLED=true.")
+    result = discover_and_ingest(company=company_clean, sector=sector, max_results=max_results, progress=progress)
+    if result.get("ingested"):
+        analysis_cache.invalidate(company_clean)
     return result
 
 
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
 @app.get("/sources/{company}")
 def company_sources(company: str, limit: int = Query(20, ge=1, le=100)):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT source_title, source_url, source_publisher, published_at, doc_type, source_type, retrieval_method
-        FROM esg_documents
-        WHERE LOWER(company) = LOWER(%s)
-          AND source_url IS NOT NULL
-        ORDER BY id DESC
-        LIMIT %s
-        """,
-        (company.strip(), limit),
-    )
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT source_title, source_url, source_publisher, published_at, doc_type, source_type, retrieval_method,
+                   chunk_count
+            FROM esg_sources
+            WHERE LOWER(company) = LOWER(%s)
+              AND source_url IS NOT NULL
+            ORDER BY id DESC
+            LIMIT %s
+            """,
+            (company.strip(), limit),
+        )
+        rows = cur.fetchall()
     return {
         "company": company,
         "sources": [
@@ -263,12 +777,68 @@ def company_sources(company: str, limit: int = Query(20, ge=1, le=100)):
                 "doc_type": doc_type,
                 "source_type": source_type,
                 "retrieval_method": retrieval_method,
+                "chunks": chunk_count,
             }
-            for title, url, publisher, published_at, doc_type, source_type, retrieval_method in rows
+            for title, url, publisher, published_at, doc_type, source_type, retrieval_method, chunk_count in rows
         ],
     }
 
 
+def _collect_service_stats():
+    """Export the counters behind /health as Prometheus metrics at scrape time."""
+    pool = pool_stats()
+    yield "db_pool_connections", "gauge", "Pooled database connections by state.", [
+        ({"state": "idle"}, pool["idle"]),
+        ({"state": "checked_out"}, pool["checked_out"]),
+    ]
+    yield "db_pool_waiting", "gauge", "Threads waiting for a pooled connection.", [({}, pool["waiting"])]
+    yield "db_pool_timeouts", "counter", "Connection checkouts that timed out.", [({}, pool.get("timeouts", 0))]
+
+    cache = embedding_cache_stats()
+    if cache["enabled"]:
+        yield "embedding_cache_lookups", "counter", "Embedding cache lookups by result.", [
+            ({"result": "memory_hit"}, cache["memory_hits"]),
+            ({"result": "disk_hit"}, cache["disk_hits"]),
+            ({"result": "miss"}, cache["misses"]),
+        ]
+
+    analyses = analysis_cache.stats()
+    yield "analysis_cache_lookups", "counter", "Analysis cache lookups by result.", [
+        ({"result": "hit"}, analyses["hits"]),
+        ({"result": "miss"}, analyses["misses"]),
+        ({"result": "stale"}, analyses["stale"]),
+    ]
+
+    index = greenwash_index.stats()
+    yield "greenwash_index_examples", "gauge", "Examples held by the in-memory greenwash index.", [
+        ({}, index["examples"])
+    ]
+    yield "greenwash_index_searches", "counter", "Query vectors searched in the greenwash index.", [
+        ({}, index["searches"])
+    ]
+
+    jobs = job_queue.stats()
+    yield "jobs_pending", "gauge", "Background jobs queued or running.", [({}, jobs["pending"])]
+    yield "jobs_submitted", "counter", "Background jobs accepted.", [({}, jobs["submitted"])]
+    yield "jobs_rejected", "counter", "Background jobs rejected because the queue was full.", [({}, jobs["rejected"])]
+
+
+register_collector(_collect_service_stats)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "db_pool": pool_stats(),
+        "embedding_cache": embedding_cache_stats(),
+        "analysis_cache": analysis_cache.stats(),
+        "greenwash_index": greenwash_index.stats(),
+        "jobs": job_queue.stats(),
+    }
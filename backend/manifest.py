@@ -0,0 +1,100 @@
+"""
+Ingestion manifest for directory ingestion.
+
+Records, per ingested file, the size, mtime, content hash and the database rows
+(esg_sources or greenwash_examples ids) it produced. Reruns skip files whose size
+and mtime are unchanged without reading them or querying Postgres, replace the
+rows of files whose content changed and drop the entries of files that were
+removed. Files with identical content share a row, so a row is only deleted once
+no entry references it. Entries are written after each committed batch, so an
+interrupted run resumes where it stopped.
+"""
+
+import json
+import os
+import pathlib
+import sqlite3
+import time
+from dataclasses import dataclass, field
+
+INGEST_MANIFEST_PATH = os.getenv(
+    "INGEST_MANIFEST_PATH",
+    str(pathlib.Path(__file__).resolve().parent.parent / "data" / "ingest_manifest.sqlite3"),
+)
+
+
+@dataclass
+class ManifestEntry:
+    path: str
+    kind: str
+    size: int
+    mtime_ns: int
+    content_hash: str
+    row_ids: list[int] = field(default_factory=list)
+
+    def matches(self, stat: os.stat_result) -> bool:
+        return self.size == stat.st_size and self.mtime_ns == stat.st_mtime_ns
+
+
+class IngestManifest:
+    def __init__(self, path: str = INGEST_MANIFEST_PATH):
+        pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                row_ids TEXT NOT NULL,
+                ingested_at REAL NOT NULL
+            )
+            """
+        )
+
+    @staticmethod
+    def key(path: pathlib.Path) -> str:
+        return str(path.resolve())
+
+    def entries(self, kind: str) -> dict[str, ManifestEntry]:
+        rows = self._db.execute(
+            "SELECT path, kind, size, mtime_ns, content_hash, row_ids FROM files WHERE kind = ?",
+            (kind,),
+        ).fetchall()
+        return {
+            path: ManifestEntry(path, kind, size, mtime_ns, content_hash, json.loads(row_ids))
+            for path, kind, size, mtime_ns, content_hash, row_ids in rows
+        }
+
+    def put_many(self, entries: list[ManifestEntry]) -> None:
+        if not entries:
+            return
+        now = time.time()
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                """
+                INSERT OR REPLACE INTO files (path, kind, size, mtime_ns, content_hash, row_ids, ingested_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (e.path, e.kind, e.size, e.mtime_ns, e.content_hash, json.dumps(e.row_ids), now)
+                    for e in entries
+                ],
+            )
+
+    def delete_many(self, paths: list[str]) -> None:
+        if not paths:
+            return
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in paths])
+
+    def clear(self) -> None:
+        self._db.execute("DELETE FROM files")
+
+    def close(self) -> None:
+        self._db.close()
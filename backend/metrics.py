@@ -0,0 +1,205 @@
+"""
+Process-local latency histograms and counters, rendered in the Prometheus text
+exposition format by GET /metrics.
+
+Metrics are plain in-memory objects, so values reset on restart and are per
+worker process when uvicorn runs several. Statistics that other modules already
+keep (connection pool, caches, jobs) are exported by collectors that read them
+at scrape time instead of being counted twice.
+"""
+
+import math
+import os
+import threading
+import time
+from contextlib import ContextDecorator
+from typing import Callable, Iterable
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Seconds; spans pooled DB checkouts (sub-millisecond) to LLM calls and discovery fetches.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# A collector returns (name, type, help, [(labels, value), ...]) families.
+Sample = tuple[dict[str, str], float]
+Family = tuple[str, str, str, list[Sample]]
+
+_registry_lock = threading.Lock()
+_metrics: dict[str, "_Metric"] = {}
+_collectors: list[Callable[[], Iterable[Family]]] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> list[tuple[str, dict[str, str], float]]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> list[tuple[str, dict[str, str], float]]:
+        with self._lock:
+            values = dict(self._values)
+        return [
+            (f"{self.name}_total", dict(zip(self.labelnames, key)), value)
+            for key, value in sorted(values.items())
+        ]
+
+
+class _Timer(ContextDecorator):
+    """Observes elapsed wall time on exit; ``labels`` may be updated inside the block."""
+
+    def __init__(self, histogram: "Histogram", labels: dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+        self.started = 0.0
+
+    def _recreate_cm(self) -> "_Timer":
+        # Used as a decorator: a fresh timer per call keeps concurrent calls apart.
+        return _Timer(self.histogram, dict(self.labels))
+
+    def __enter__(self) -> "_Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (last one is +Inf), sum.
+        self._values: dict[tuple[str, ...], tuple[list[int], float]] = {}
+
+    def observe(self, seconds: float, **labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        slot = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[slot] += 1
+            self._values[key] = (counts, total + seconds)
+
+    def time(self, **labels: str) -> _Timer:
+        """Context manager (or decorator) observing the wrapped block's duration."""
+        return _Timer(self, dict(labels))
+
+    def samples(self) -> list[tuple[str, dict[str, str], float]]:
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        out = []
+        for key, (counts, total) in sorted(values.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                out.append((f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            out.append((f"{self.name}_sum", labels, total))
+            out.append((f"{self.name}_count", labels, cumulative))
+        return out
+
+
+def _register(metric: _Metric) -> _Metric:
+    with _registry_lock:
+        existing = _metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                raise ValueError(f"Metric {metric.name} is already registered with a different shape")
+            return existing
+        _metrics[metric.name] = metric
+        return metric
+
+
+def counter(name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+    """Return the counter ``name`` (exported as ``name_total``), creating it on first use."""
+    return _register(Counter(name, help, labelnames))
+
+
+def histogram(
+    name: str,
+    help: str,
+    labelnames: tuple[str, ...] = (),
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+) -> Histogram:
+    """Return the histogram ``name``, creating it on first use."""
+    return _register(Histogram(name, help, labelnames, buckets))
+
+
+def register_collector(collect: Callable[[], Iterable[Family]]) -> None:
+    """Add a callback that reports metric families at scrape time."""
+    with _registry_lock:
+        _collectors.append(collect)
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text format (version 0.0.4)."""
+    with _registry_lock:
+        metrics = sorted(_metrics.values(), key=lambda metric: metric.name)
+        collectors = list(_collectors)
+    lines: list[str] = []
+
+    def family(name: str, kind: str, help: str, samples: Iterable[tuple[str, dict[str, str], float]]) -> None:
+        lines.append(f"# HELP {name} {_escape(help)}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(f"{sample}{_format_labels(labels)} {_format_value(value)}" for sample, labels, value in samples)
+
+    for metric in metrics:
+        family(metric.name, metric.type, metric.help, metric.samples())
+    for collect in collectors:
+        for name, kind, help, samples in collect():
+            sample_name = f"{name}_total" if kind == "counter" else name
+            family(name, kind, help, [(sample_name, labels, value) for labels, value in samples])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,191 @@
+"""
+Database maintenance commands for existing deployments.
+
+    python -m backend.migrate build-indexes   # build missing ANN and sector indexes without blocking writes
+    python -m backend.migrate reindex         # rebuild ANN indexes (e.g. IVFFlat after a bulk load)
+    python -m backend.migrate reproject       # convert stored embeddings to EMBEDDING_DIM / EMBEDDING_STORAGE
+
+The index commands run outside a transaction so they can use CONCURRENTLY.
+reproject rewrites each vector table in one transaction, then builds indexes.
+"""
+
+import argparse
+
+import numpy as np
+
+from backend.db import (
+    VECTOR_INDEX_TYPE,
+    VECTOR_INDEX_TYPES,
+    VECTOR_TABLES,
+    check_index_support,
+    connection,
+    copy_rows,
+    embedding_column_type,
+    get_conn,
+    init_db,
+    sector_indexes,
+    stored_embedding_types,
+    vector_from_bytes,
+    vector_index_ddl,
+    vector_index_name,
+)
+from backend.embed import EMBEDDING_DIM, USE_LOCAL_EMBEDDINGS, embed_texts, reduce_embeddings
+
+REPROJECT_BATCH_SIZE = 500
+
+
+def _autocommit_conn(maintenance_work_mem: str | None):
+    conn = get_conn()
+    conn.autocommit = True
+    if maintenance_work_mem:
+        with conn.cursor() as cur:
+            cur.execute("SELECT set_config('maintenance_work_mem', %s, false)", (maintenance_work_mem,))
+    return conn
+
+
+def _drop_if_invalid(cur, name: str) -> None:
+    # An interrupted concurrent build leaves an INVALID index behind; start over.
+    cur.execute("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (name,))
+    row = cur.fetchone()
+    if row and row[0]:
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def build_indexes(maintenance_work_mem: str | None = None) -> None:
+    init_db()
+    conn = _autocommit_conn(maintenance_work_mem)
+    try:
+        with conn.cursor() as cur:
+            unsupported = check_index_support(cur) if VECTOR_INDEX_TYPE in VECTOR_INDEX_TYPES else None
+            if unsupported:
+                raise SystemExit(f"Cannot build {VECTOR_INDEX_TYPE} indexes: {unsupported}.")
+            for table in VECTOR_TABLES:
+                for index_type in VECTOR_INDEX_TYPES:
+                    if index_type != VECTOR_INDEX_TYPE:
+                        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {vector_index_name(table, index_type)}")
+                ddl = vector_index_ddl(table, concurrently=True)
+                if ddl is None:
+                    continue
+                _drop_if_invalid(cur, vector_index_name(table, VECTOR_INDEX_TYPE))
+                print(f"Building {VECTOR_INDEX_TYPE} index on {table}...")
+                cur.execute(ddl)
+                cur.execute(f"ANALYZE {table}")
+
+            wanted, stale = sector_indexes(cur)
+            for name in stale:
+                cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            for name, sector in wanted.items():
+                _drop_if_invalid(cur, name)
+                print(f"Building {VECTOR_INDEX_TYPE} index on esg_documents for sector {sector!r}...")
+                cur.execute(vector_index_ddl("esg_documents", concurrently=True, sector=sector))
+    finally:
+        conn.close()
+
+
+def reindex(maintenance_work_mem: str | None = None) -> None:
+    conn = _autocommit_conn(maintenance_work_mem)
+    try:
+        with conn.cursor() as cur:
+            names = [vector_index_name(table, VECTOR_INDEX_TYPE) for table in VECTOR_TABLES]
+            for name in names + list(sector_indexes(cur)[0]):
+                cur.execute("SELECT to_regclass(%s)", (name,))
+                if cur.fetchone()[0] is None:
+                    print(f"{name} does not exist; run build-indexes first.")
+                    continue
+                print(f"Rebuilding {name}...")
+                cur.execute(f"REINDEX INDEX CONCURRENTLY {name}")
+    finally:
+        conn.close()
+
+
+def _reprojected_embeddings(
+    contents: list[str], stored: list[bytes | None], reembed: bool
+) -> list[np.ndarray | None]:
+    vectors = [vector_from_bytes(data) if data is not None else None for data in stored]
+    if reembed or USE_LOCAL_EMBEDDINGS or any(v is not None and v.size < EMBEDDING_DIM for v in vectors):
+        # Hashed local embeddings don't truncate consistently, and growing needs the provider.
+        return embed_texts(contents)
+    return [reduce_embeddings(v) if v is not None else None for v in vectors]
+
+
+def _reproject_table(table: str, target_type: str, batch_size: int, reembed: bool) -> None:
+    with connection() as conn:
+        with conn.cursor() as cur:
+            for index_type in VECTOR_INDEX_TYPES:
+                cur.execute(f"DROP INDEX IF EXISTS {vector_index_name(table, index_type)}")
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN embedding_reprojected {target_type}")
+            cur.execute("CREATE TEMP TABLE reprojected (id INTEGER PRIMARY KEY, embedding VECTOR) ON COMMIT DROP")
+
+        reader = conn.cursor(name=f"reproject_{table}")
+        reader.execute(f"SELECT id, content, vector_send(embedding::vector) FROM {table} ORDER BY id")
+        done = 0
+        while rows := reader.fetchmany(batch_size):
+            ids = [row[0] for row in rows]
+            embeddings = _reprojected_embeddings([row[1] or "" for row in rows], [row[2] for row in rows], reembed)
+            with conn.cursor() as cur:
+                copy_rows(cur, "reprojected", [("id", "int4"), ("embedding", "vector")], zip(ids, embeddings))
+            done += len(rows)
+            print(f"  {table}: {done} rows re-projected")
+        reader.close()
+
+        with conn.cursor() as cur:
+            cur.execute(
+                f"""
+                UPDATE {table} t
+                SET embedding_reprojected = r.embedding::{target_type}
+                FROM reprojected r
+                WHERE t.id = r.id
+                """
+            )
+            cur.execute(f"ALTER TABLE {table} DROP COLUMN embedding")
+            cur.execute(f"ALTER TABLE {table} RENAME COLUMN embedding_reprojected TO embedding")
+
+
+def reproject(
+    batch_size: int = REPROJECT_BATCH_SIZE,
+    maintenance_work_mem: str | None = None,
+    reembed: bool = False,
+) -> None:
+    """Convert stored embeddings to the configured EMBEDDING_DIM and EMBEDDING_STORAGE.
+
+    Provider embeddings are shortened locally (text-embedding-3 vectors truncate
+    cleanly). Local embeddings, a larger target dimension or ``reembed`` re-embed the
+    stored content instead.
+    """
+    target_type = embedding_column_type()
+    with connection() as conn, conn.cursor() as cur:
+        current = stored_embedding_types(cur)
+    for table in VECTOR_TABLES:
+        if table not in current:
+            continue
+        if current[table] == target_type:
+            print(f"{table}.embedding is already {target_type}.")
+            continue
+        print(f"Re-projecting {table}.embedding from {current[table]} to {target_type}...")
+        _reproject_table(table, target_type, batch_size, reembed)
+    build_indexes(maintenance_work_mem)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m backend.migrate",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("command", choices=["build-indexes", "reindex", "reproject"])
+    parser.add_argument("--maintenance-work-mem", default=None, help="e.g. 2GB; speeds up index builds")
+    parser.add_argument("--batch-size", type=int, default=REPROJECT_BATCH_SIZE, help="rows per reproject batch")
+    parser.add_argument("--reembed", action="store_true", help="reproject by re-embedding stored content")
+    args = parser.parse_args(argv)
+
+    if args.command == "build-indexes":
+        build_indexes(args.maintenance_work_mem)
+    elif args.command == "reproject":
+        reproject(args.batch_size, args.maintenance_work_mem, args.reembed)
+    else:
+        reindex(args.maintenance_work_mem)
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
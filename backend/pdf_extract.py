@@ -0,0 +1,254 @@
+"""
+PDF text extraction in a process pool, shared by uploads and discovery.
+
+pypdf is pure Python and holds the GIL for seconds on a large report, so it runs
+in separate processes. A document is split into page ranges that are extracted
+by pool workers, at most PDF_MAX_TASKS_PER_DOCUMENT at a time so one large PDF
+cannot occupy the whole pool, and pages are yielded in order as their range
+completes. Each document is limited to PDF_MAX_PAGES pages and PDF_MAX_CPU_SEC
+seconds of CPU time across its ranges: every range is given a share of what is
+left of that budget, not the whole of it. A worker keeps the last document it
+parsed, so its later ranges of the same file skip reopening it.
+
+This module is imported by the pool's worker processes, so it must stay free of
+database and API-client imports.
+"""
+
+import multiprocessing
+import os
+import signal
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Iterator
+
+from pypdf import PdfReader
+
+try:
+    import resource
+except ImportError:  # Windows: no RLIMIT_CPU; the per-document total is still enforced.
+    resource = None
+
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "2"))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "1000"))
+PDF_MAX_CPU_SEC = float(os.getenv("PDF_MAX_CPU_SEC", "60"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+PDF_MAX_TASKS_PER_DOCUMENT = int(os.getenv("PDF_MAX_TASKS_PER_DOCUMENT", "2"))
+
+
+class PdfExtractionError(Exception):
+    """The PDF could not be read, is encrypted, or exceeded its extraction limits."""
+
+
+class _CpuLimitExceeded(BaseException):
+    # BaseException so pypdf's broad `except Exception` handlers cannot swallow it.
+    pass
+
+
+def _on_cpu_limit(signum, frame):
+    raise _CpuLimitExceeded()
+
+
+def _init_worker() -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if resource is not None:
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+
+
+def _cpu_seconds() -> float:
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+@contextmanager
+def _cpu_limit(seconds: float):
+    """Deliver SIGXCPU once this worker has used ``seconds`` more CPU time."""
+    if resource is None or seconds <= 0:
+        yield
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    limit = int(_cpu_seconds() + seconds) + 1
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+    try:
+        yield
+    finally:
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _open_reader(path: str) -> PdfReader:
+    try:
+        reader = PdfReader(path)
+    except Exception:
+        raise PdfExtractionError("Invalid PDF file.")
+    if reader.is_encrypted:
+        try:
+            decrypted = reader.decrypt("")
+        except Exception:
+            decrypted = False
+        if not decrypted:
+            raise PdfExtractionError("Encrypted PDF files are not supported.")
+    return reader
+
+
+# The document this worker process parsed last, keyed by (path, size, mtime).
+_worker_reader: tuple[tuple[str, int, int], PdfReader] | None = None
+
+
+def _reader_for(path: str) -> PdfReader:
+    global _worker_reader
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    if _worker_reader is None or _worker_reader[0] != key:
+        _worker_reader = None
+        _worker_reader = (key, _open_reader(path))
+    return _worker_reader[1]
+
+
+def _count_pages(path: str, cpu_limit_sec: float) -> tuple[int, float]:
+    """Returns the page count and the CPU seconds used."""
+    global _worker_reader
+    started = _cpu_seconds()
+    try:
+        with _cpu_limit(cpu_limit_sec):
+            page_count = len(_reader_for(path).pages)
+    except _CpuLimitExceeded:
+        _worker_reader = None
+        raise PdfExtractionError("PDF extraction exceeded its CPU time limit.")
+    return page_count, _cpu_seconds() - started
+
+
+def _extract_range(path: str, start: int, stop: int, cpu_limit_sec: float) -> tuple[list[str], float]:
+    """Extract pages [start, stop); returns their text and the CPU seconds used."""
+    global _worker_reader
+    started = _cpu_seconds()
+    try:
+        with _cpu_limit(cpu_limit_sec):
+            reader = _reader_for(path)
+            pages = []
+            for page in reader.pages[start:stop]:
+                try:
+                    pages.append((page.extract_text() or "").strip())
+                except Exception:
+                    pages.append("")
+    except _CpuLimitExceeded:
+        # The reader may be half way through parsing an object; do not reuse it.
+        _worker_reader = None
+        raise PdfExtractionError("PDF extraction exceeded its CPU time limit.")
+    return pages, _cpu_seconds() - started
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the API process has threads and open connections.
+            _pool = ProcessPoolExecutor(
+                max_workers=max(1, PDF_EXTRACT_WORKERS),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def _discard_pool(broken: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pdf_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+@contextmanager
+def _pdf_path(source: str | os.PathLike | bytes):
+    if not isinstance(source, bytes):
+        yield os.fspath(source)
+        return
+    handle = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+    try:
+        with handle:
+            handle.write(source)
+        yield handle.name
+    finally:
+        os.unlink(handle.name)
+
+
+def iter_pdf_pages(
+    source: str | os.PathLike | bytes,
+    max_pages: int = PDF_MAX_PAGES,
+    cpu_limit_sec: float = PDF_MAX_CPU_SEC,
+) -> Iterator[str]:
+    """Yield the stripped text of each page, in order, as extraction progresses.
+
+    ``source`` is a file path or the PDF bytes. Pages past ``max_pages`` are ignored.
+    Raises PdfExtractionError for unreadable or encrypted files and when the document
+    uses more than ``cpu_limit_sec`` of CPU time. Closing the iterator early cancels
+    the remaining work.
+    """
+    with _pdf_path(source) as path:
+        pool = _get_pool()
+        in_flight: deque[tuple[Future, float]] = deque()
+        max_tasks = max(1, PDF_MAX_TASKS_PER_DOCUMENT)
+        try:
+            page_count, cpu_used = pool.submit(_count_pages, path, cpu_limit_sec).result()
+            page_count = min(page_count, max(0, max_pages))
+            step = max(1, PDF_PAGES_PER_TASK)
+            ranges = deque((start, min(start + step, page_count)) for start in range(0, page_count, step))
+            while ranges or in_flight:
+                while ranges and len(in_flight) < max_tasks:
+                    task_limit = 0.0
+                    if cpu_limit_sec > 0:
+                        # Split what the ranges already running have not claimed between the free slots.
+                        unclaimed = cpu_limit_sec - cpu_used - sum(limit for _, limit in in_flight)
+                        task_limit = unclaimed / (max_tasks - len(in_flight))
+                        if task_limit <= 0:
+                            raise PdfExtractionError("PDF extraction exceeded its CPU time limit.")
+                    start, stop = ranges.popleft()
+                    in_flight.append((pool.submit(_extract_range, path, start, stop, task_limit), task_limit))
+                future, _limit = in_flight.popleft()
+                pages, cpu_sec = future.result()
+                cpu_used += cpu_sec
+                if cpu_limit_sec > 0 and cpu_used > cpu_limit_sec:
+                    raise PdfExtractionError("PDF extraction exceeded its CPU time limit.")
+                yield from pages
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            raise PdfExtractionError("PDF extraction worker crashed.")
+        finally:
+            for future, _limit in in_flight:
+                future.cancel()
+
+
+def extract_pdf_text(source: str | os.PathLike | bytes, max_chars: int | None = None, **limits) -> str:
+    """Extract a PDF's text, joining non-empty pages with blank lines.
+
+    With ``max_chars``, extraction stops as soon as that much text has been collected.
+    """
+    pages: list[str] = []
+    total = 0
+    for page in iter_pdf_pages(source, **limits):
+        if not page:
+            continue
+        pages.append(page)
+        total += len(page) + 2
+        if max_chars is not None and total >= max_chars:
+            break
+    return "\n\n".join(pages).strip()
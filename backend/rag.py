@@ -1,13 +1,31 @@
 import os
-from openai import OpenAI
+import time
+from typing import AsyncIterator
+from openai import AsyncOpenAI, OpenAI
 from dotenv import load_dotenv
+from backend.metrics import counter, histogram
 
 load_dotenv()
 
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+FALLBACK_MARKER = "(LLM fallback mode"
+INTERRUPTED_MARKER = "(Report interrupted"
+LLM_SECONDS = histogram(
+    "llm_request_duration_seconds",
+    "Report generation LLM call latency (until the last token when streaming).",
+    ("call", "outcome"),
+)
+LLM_ERRORS = counter("llm_errors", "Report LLM calls that failed, by error type.", ("call", "error"))
 
 
-def generate_report(
+def _observe_llm(call: str, started: float, exc: Exception | None = None, outcome: str = "ok") -> None:
+    if exc is not None:
+        LLM_ERRORS.inc(call=call, error=type(exc).__name__)
+    LLM_SECONDS.observe(time.perf_counter() - started, call=call, outcome=outcome)
+
+
+def _build_prompt(
     company: str,
     company_claims: list[tuple[str, str, str]],
     greenwash_matches: list[tuple[str, float]],
@@ -52,21 +70,109 @@ Based on the above evidence, produce a concise greenwashing risk assessment for
 
 Be specific, cite the evidence provided, and avoid speculation beyond what the data supports."""
 
+    return prompt
+
+
+def _fallback_report(
+    company: str,
+    greenwash_matches: list[tuple[str, float]],
+    peer_comparisons: list[tuple[str, str, float]],
+    score: float,
+    exc: Exception,
+) -> str:
+    top_case = greenwash_matches[0][0][:200] if greenwash_matches else "No direct match."
+    peer = peer_comparisons[0][1] if peer_comparisons else "N/A"
+    return (
+        f"Risk Summary: {company} has a computed greenwashing risk score of {score}/100.\n\n"
+        f"Key Concerns: Top matched case snippet: \"{top_case}\".\n\n"
+        f"Peer Comparison: Closest same-sector peer in retrieval: {peer}.\n\n"
+        f"Recommendation: Validate high-impact claims with third-party assurance and require clearer KPIs."
+        f"\n\n{FALLBACK_MARKER} due to {type(exc).__name__}.)"
+    )
+
+
+def is_fallback_report(text: str) -> bool:
+    """True when the text is a canned fallback or a cut-off stream rather than a full LLM report."""
+    return FALLBACK_MARKER in (text or "") or INTERRUPTED_MARKER in (text or "")
+
+
+def generate_report(
+    company: str,
+    company_claims: list[tuple[str, str, str]],
+    greenwash_matches: list[tuple[str, float]],
+    peer_comparisons: list[tuple[str, str, float]],
+    score: float,
+) -> str:
+    prompt = _build_prompt(company, company_claims, greenwash_matches, peer_comparisons, score)
     model = os.getenv("LLM_MODEL", "gpt-4o-mini")
+    started = time.perf_counter()
     try:
         resp = client.chat.completions.create(
             model=model,
             messages=[{"role": "user", "content": prompt}],
             temperature=0.3,
         )
+        _observe_llm("report", started)
+        return resp.choices[0].message.content
+    except Exception as exc:
+        _observe_llm("report", started, exc, "fallback")
+        return _fallback_report(company, greenwash_matches, peer_comparisons, score, exc)
+
+
+async def agenerate_report(
+    company: str,
+    company_claims: list[tuple[str, str, str]],
+    greenwash_matches: list[tuple[str, float]],
+    peer_comparisons: list[tuple[str, str, float]],
+    score: float,
+) -> str:
+    """Async variant of generate_report for use inside the event loop."""
+    prompt = _build_prompt(company, company_claims, greenwash_matches, peer_comparisons, score)
+    model = os.getenv("LLM_MODEL", "gpt-4o-mini")
+    started = time.perf_counter()
+    try:
+        resp = await async_client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3,
+        )
+        _observe_llm("report", started)
         return resp.choices[0].message.content
     except Exception as exc:
-        top_case = greenwash_matches[0][0][:200] if greenwash_matches else "No direct match."
-        peer = peer_comparisons[0][1] if peer_comparisons else "N/A"
-        return (
-            f"Risk Summary: {company} has a computed greenwashing risk score of {score}/100.\n\n"
-            f"Key Concerns: Top matched case snippet: \"{top_case}\".\n\n"
-            f"Peer Comparison: Closest same-sector peer in retrieval: {peer}.\n\n"
-            f"Recommendation: Validate high-impact claims with third-party assurance and require clearer KPIs."
-            f"\n\n(LLM fallback mode due to {type(exc).__name__}.)"
+        _observe_llm("report", started, exc, "fallback")
+        return _fallback_report(company, greenwash_matches, peer_comparisons, score, exc)
+
+
+async def stream_report(
+    company: str,
+    company_claims: list[tuple[str, str, str]],
+    greenwash_matches: list[tuple[str, float]],
+    peer_comparisons: list[tuple[str, str, float]],
+    score: float,
+) -> AsyncIterator[str]:
+    """Yield the report as text deltas from a streaming chat completion."""
+    prompt = _build_prompt(company, company_claims, greenwash_matches, peer_comparisons, score)
+    model = os.getenv("LLM_MODEL", "gpt-4o-mini")
+    emitted = False
+    started = time.perf_counter()
+    try:
+        stream = await async_client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3,
+            stream=True,
         )
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                emitted = True
+                yield delta
+        _observe_llm("report_stream", started)
+    except Exception as exc:
+        _observe_llm("report_stream", started, exc, "interrupted" if emitted else "fallback")
+        if emitted:
+            yield f"\n\n{INTERRUPTED_MARKER} due to {type(exc).__name__}.)"
+        else:
+            yield _fallback_report(company, greenwash_matches, peer_comparisons, score, exc)
@@ -0,0 +1,370 @@
+"""
+Synthetic ESG corpora for load testing.
+
+    python -m backend.synthetic --out /tmp/corpus --companies 2000                 # files for ingest_all
+    python -m backend.synthetic --db --companies 20000 --doc-skew 1.2 --doc-tokens 4000
+
+Generates ESG reports for many companies across sectors, plus greenwash cases,
+in the shape production data has: a few sectors hold most companies and a few
+companies publish most documents. --sector-skew and --doc-skew are Zipf
+exponents for those distributions (0 is uniform) and --length-sigma spreads
+document lengths around --doc-tokens (estimated tokens, as counted by the
+chunker). Reports mix concrete, quantified disclosures with vague claims at
+--greenwash-rate, so retrieval has something to find.
+
+Files follow the CompanyName_Sector_DocType.txt convention (DocType carries the
+report year) under esg_docs/ and greenwash_cases/, ready for
+`python -m backend.ingest --esg-dir ... --greenwash-dir ...`. --db skips the
+files and bulk-loads the configured database with ingest_esg_docs instead.
+Output is deterministic for a given --seed.
+"""
+
+import argparse
+import itertools
+import pathlib
+import random
+import re
+from dataclasses import dataclass
+from typing import Iterator
+
+import numpy as np
+
+from backend.db import init_db
+from backend.hardcoded import hardcoded_analyze_payload
+from backend.ingest import (
+    _TOKEN_RE,
+    INGEST_BATCH_SIZE,
+    EsgDocument,
+    _token_cost,
+    ingest_esg_docs,
+    ingest_greenwash_examples,
+)
+
+SECTORS = [
+    "Energy",
+    "Utilities",
+    "Materials",
+    "Industrials",
+    "Transport",
+    "ConsumerGoods",
+    "Retail",
+    "Technology",
+    "Financials",
+    "Healthcare",
+    "RealEstate",
+    "Agriculture",
+]
+DOC_TYPES = ["SustainabilityReport", "AnnualReport", "ClimateReport", "ESGReport"]
+FIRST_YEAR = 2025
+
+_NAME_HEADS = [
+    "Aster", "Boreal", "Calder", "Dunmore", "Elmridge", "Fenwick", "Granite", "Halcyon", "Ironvale", "Juniper",
+    "Kestrel", "Lumen", "Meridian", "Northcote", "Oakhurst", "Pinecrest", "Quarry", "Redfern", "Silverline",
+    "Tamsin", "Umber", "Vireo", "Westbrook", "Yarrow", "Zenith",
+]
+_NAME_TAILS = [
+    "Holdings", "Group", "Industries", "Partners", "Systems", "Resources", "Works", "Labs", "Corp", "International",
+    "Global", "Enterprises",
+]
+_SECTOR_ACTIVITIES = {
+    "Energy": ["upstream oil and gas production", "refining throughput", "LNG liquefaction", "offshore wind projects"],
+    "Utilities": ["coal-fired generation", "grid transmission", "gas distribution", "utility-scale solar"],
+    "Materials": ["clinker production", "steelmaking", "chemical feedstocks", "aluminium smelting"],
+    "Industrials": ["heavy equipment manufacturing", "aftermarket services", "foundry operations"],
+    "Transport": ["aviation fuel use", "freight fleet", "shipping operations", "rail electrification"],
+    "ConsumerGoods": ["packaging", "palm oil sourcing", "contract manufacturing", "product use phase"],
+    "Retail": ["store energy use", "last-mile delivery", "private-label products", "refrigerant leakage"],
+    "Technology": ["data centre electricity", "semiconductor fabrication", "device manufacturing"],
+    "Financials": ["financed emissions", "fossil fuel lending", "green bond issuance", "insurance underwriting"],
+    "Healthcare": ["anaesthetic gases", "pharmaceutical manufacturing", "cold-chain logistics"],
+    "RealEstate": ["building operations", "embodied carbon in construction", "tenant energy use"],
+    "Agriculture": ["fertiliser use", "livestock methane", "deforestation-free sourcing", "irrigation"],
+}
+_SECTIONS = [
+    "Climate and Energy",
+    "Emissions Performance",
+    "Renewable Electricity",
+    "Supply Chain",
+    "Water Stewardship",
+    "Waste and Circularity",
+    "Biodiversity",
+    "Governance and Risk",
+    "Targets and Progress",
+]
+_CONCRETE = [
+    "Scope 1 and 2 emissions were {mt} million tonnes CO2e in {year}, {pct}% below the {base} baseline.",
+    "Scope 3 emissions from {activity} were {mt} million tonnes CO2e and are {verified}.",
+    "Renewable electricity covered {pct}% of consumption, of which {pct2}% came from power purchase agreements.",
+    "Capital expenditure on {activity} was {amount} million, against {amount2} million on low-carbon projects.",
+    "Methane intensity in {activity} fell to {ratio}% with quarterly leak detection and repair surveys.",
+    "Water withdrawal in high-stress basins was {amount} megalitres, down {pct}% year on year.",
+    "{pct}% of operational waste was diverted from landfill across {sites} sites.",
+    "The interim target is a {pct}% reduction in absolute emissions by {target}, validated by the SBTi.",
+    "The board climate committee met {meetings} times and linked {pct}% of executive bonuses to emissions targets.",
+    "{pct}% of tier-one suppliers by spend have set science-based targets.",
+]
+_VAGUE = [
+    "{company} is committed to becoming carbon neutral and leading the transition to a greener future.",
+    "Our approach to {activity} is eco-friendly and sustainable by design.",
+    "We aim to reach net zero by {target} through innovation and partnerships.",
+    "Carbon offsets from forestry and nature-based projects neutralise our remaining footprint.",
+    "We are powered by {pct}% renewable energy thanks to renewable energy certificates.",
+    "Our products help customers live more sustainably every day.",
+    "{company} considers climate change in its strategy and will continue to explore opportunities.",
+    "We are proud to be recognised as a sustainability leader in {sector}.",
+]
+_CASE_CLAIMS = [
+    ("net_zero_without_plan", "pledged to reach net zero by {target}",
+     "it has no interim targets, excludes Scope 3 emissions from {activity}, and plans capital expenditure that "
+     "expands fossil capacity through {target2}"),
+    ("offset_reliance", "described its {activity} as carbon neutral",
+     "the claim rests on forestry offsets with weak additionality and permanence, covering {pct}% of emissions "
+     "while absolute emissions rose {pct2}% since {base}"),
+    ("renewable_certificates", "advertised that operations are powered by {pct}% renewable energy",
+     "the figure relies on unbundled renewable energy certificates without geographic or temporal matching, "
+     "while {activity} still relies on fossil power"),
+    ("selective_reporting", "reported a {pct}% reduction in emissions intensity",
+     "absolute emissions from {activity} increased and the divested high-emitting assets were dropped from the "
+     "baseline after {base}"),
+    ("vague_claims", "marketed its products as eco-friendly and sustainable",
+     "no product-level data, certification or life-cycle assessment supports the claim, and {activity} "
+     "is excluded from disclosure"),
+    ("misleading_targets", "announced a target to halve emissions by {target}",
+     "the target covers only {pct}% of reported emissions and uses an intensity metric that can be met while "
+     "{activity} grows"),
+]
+
+
+@dataclass(frozen=True)
+class CorpusShape:
+    companies: int = 100
+    docs_per_company: float = 3.0
+    doc_skew: float = 1.0
+    sector_skew: float = 1.0
+    doc_tokens: int = 2000
+    length_sigma: float = 0.5
+    greenwash_rate: float = 0.15
+    greenwash_cases: int = 50
+    seed: int = 0
+
+
+@dataclass(frozen=True)
+class SyntheticCompany:
+    name: str
+    sector: str
+    documents: int
+
+
+def estimate_tokens(text: str) -> int:
+    """Token estimate used by backend.ingest.chunk_text."""
+    return sum(_token_cost(token) for token in _TOKEN_RE.findall(text))
+
+
+def _zipf_weights(count: int, exponent: float) -> np.ndarray:
+    weights = 1.0 / np.arange(1, count + 1) ** max(0.0, exponent)
+    return weights / weights.sum()
+
+
+def _company_names(count: int, rng: random.Random) -> Iterator[str]:
+    combos = [head + tail for head in _NAME_HEADS for tail in _NAME_TAILS]
+    rng.shuffle(combos)
+    seen = 0
+    for round_ in itertools.count(1):
+        for name in combos:
+            candidate = name if round_ == 1 else f"{name}{round_}"
+            if hardcoded_analyze_payload(candidate) is not None:
+                continue
+            yield candidate
+            seen += 1
+            if seen >= count:
+                return
+
+
+def generate_companies(shape: CorpusShape) -> list[SyntheticCompany]:
+    """Companies with Zipf-skewed sector sizes and documents per company.
+
+    Every company publishes at least one document; the rest of the
+    ``companies * docs_per_company`` total is shared out by ``doc_skew``.
+    """
+    rng = random.Random(shape.seed)
+    np_rng = np.random.default_rng(shape.seed)
+    count = max(1, shape.companies)
+
+    sector_order = list(SECTORS)
+    rng.shuffle(sector_order)
+    sectors = np_rng.choice(len(sector_order), size=count, p=_zipf_weights(len(sector_order), shape.sector_skew))
+
+    total = max(count, round(count * shape.docs_per_company))
+    extra = total - count
+    weights = _zipf_weights(count, shape.doc_skew)[np_rng.permutation(count)]
+    docs = np.floor(weights * extra).astype(int)
+    remainder = extra - int(docs.sum())
+    if remainder:
+        docs[np.argsort(-(weights * extra - docs))[:remainder]] += 1
+    docs += 1
+
+    return [
+        SyntheticCompany(name, sector_order[int(sector)], int(documents))
+        for name, sector, documents in zip(_company_names(count, rng), sectors, docs)
+    ]
+
+
+def _fill(template: str, rng: random.Random, company: str, sector: str) -> str:
+    year = rng.randint(FIRST_YEAR - 5, FIRST_YEAR)
+    return template.format(
+        company=company,
+        sector=sector,
+        activity=rng.choice(_SECTOR_ACTIVITIES.get(sector, _SECTOR_ACTIVITIES["Industrials"])),
+        year=year,
+        base=rng.randint(2015, 2020),
+        target=rng.choice([2030, 2035, 2040, 2045, 2050]),
+        target2=rng.choice([2030, 2035, 2040]),
+        pct=rng.randint(3, 98),
+        pct2=rng.randint(3, 98),
+        mt=round(rng.uniform(0.1, 90.0), 1),
+        ratio=round(rng.uniform(0.05, 1.5), 2),
+        amount=rng.randint(5, 5000),
+        amount2=rng.randint(5, 900),
+        sites=rng.randint(3, 400),
+        meetings=rng.randint(2, 12),
+        verified=rng.choice(["third-party assured", "estimated from spend data", "not yet assured"]),
+    )
+
+
+def report_text(
+    company: str,
+    sector: str,
+    doc_type: str,
+    tokens: int,
+    rng: random.Random,
+    greenwash_rate: float = 0.15,
+) -> str:
+    """One report of roughly ``tokens`` estimated tokens, in titled sections."""
+    title = f"{company} {re.sub(r'(?<=[a-z])(?=[A-Z0-9])', ' ', doc_type)}"
+    parts = [title]
+    used = estimate_tokens(title)
+    headings = rng.sample(_SECTIONS, len(_SECTIONS))
+    while used < tokens:
+        heading = headings[(len(parts) - 1) % len(headings)]
+        sentences = []
+        for _ in range(rng.randint(4, 10)):
+            pool = _VAGUE if rng.random() < greenwash_rate else _CONCRETE
+            sentences.append(_fill(rng.choice(pool), rng, company, sector))
+        section = f"{heading}\n{' '.join(sentences)}"
+        parts.append(section)
+        used += estimate_tokens(section)
+    return "\n\n".join(parts)
+
+
+def _document_tokens(shape: CorpusShape, rng: random.Random) -> int:
+    if shape.length_sigma <= 0:
+        return max(1, shape.doc_tokens)
+    # Lognormal with mean doc_tokens: long reports are rare but much longer.
+    mu = np.log(max(1, shape.doc_tokens)) - shape.length_sigma**2 / 2
+    return max(50, int(rng.lognormvariate(mu, shape.length_sigma)))
+
+
+def iter_documents(shape: CorpusShape, companies: list[SyntheticCompany] | None = None) -> Iterator[EsgDocument]:
+    """Yield every report, company by company; ``doc_type`` is e.g. ``ClimateReport2024``."""
+    for company in companies if companies is not None else generate_companies(shape):
+        for index in range(company.documents):
+            rng = random.Random(f"{shape.seed}:{company.name}:{index}")
+            kind = DOC_TYPES[index % len(DOC_TYPES)]
+            doc_type = f"{kind}{FIRST_YEAR - index // len(DOC_TYPES)}"
+            text = report_text(
+                company.name, company.sector, doc_type, _document_tokens(shape, rng), rng, shape.greenwash_rate
+            )
+            yield EsgDocument(company.name, company.sector, doc_type, text)
+
+
+def iter_greenwash_cases(shape: CorpusShape, companies: list[SyntheticCompany] | None = None) -> Iterator[tuple[str, str]]:
+    """Yield (file stem, text) greenwash cases about the corpus' companies."""
+    companies = companies if companies is not None else generate_companies(shape)
+    rng = random.Random(f"{shape.seed}:cases")
+    for index in range(max(0, shape.greenwash_cases)):
+        company = rng.choice(companies)
+        pattern, claim, finding = rng.choice(_CASE_CLAIMS)
+        text = (
+            f"{company.name}, a {company.sector} company, {_fill(claim, rng, company.name, company.sector)}, but "
+            f"{_fill(finding, rng, company.name, company.sector)}. "
+            f'Its report states: "{_fill(rng.choice(_VAGUE), rng, company.name, company.sector)}"'
+            " Investors and consumers reading the claim would overstate the company's actual decarbonization."
+        )
+        yield f"{pattern}_{index:05d}", text
+
+
+def write_corpus(shape: CorpusShape, out_dir: pathlib.Path) -> tuple[int, int]:
+    """Write esg_docs/ and greenwash_cases/ under ``out_dir``; returns (documents, cases)."""
+    esg_dir = out_dir / "esg_docs"
+    cases_dir = out_dir / "greenwash_cases"
+    esg_dir.mkdir(parents=True, exist_ok=True)
+    cases_dir.mkdir(parents=True, exist_ok=True)
+    companies = generate_companies(shape)
+    documents = 0
+    for doc in iter_documents(shape, companies):
+        (esg_dir / f"{doc.company}_{doc.sector}_{doc.doc_type}.txt").write_text(doc.text, encoding="utf-8")
+        documents += 1
+    cases = 0
+    for stem, text in iter_greenwash_cases(shape, companies):
+        (cases_dir / f"{stem}.txt").write_text(text, encoding="utf-8")
+        cases += 1
+    return documents, cases
+
+
+def load_corpus(shape: CorpusShape, batch_size: int = INGEST_BATCH_SIZE) -> tuple[int, int]:
+    """Bulk-load the corpus into the database; returns (new documents, new cases)."""
+    init_db()
+    companies = generate_companies(shape)
+    batch_size = max(1, batch_size)
+    documents = 0
+    docs = iter_documents(shape, companies)
+    while batch := list(itertools.islice(docs, batch_size)):
+        documents += sum(ingest_esg_docs(batch))
+        print(f"Loaded {documents} synthetic ESG docs", end="\r", flush=True)
+    print()
+    cases = sum(ingest_greenwash_examples([text for _, text in iter_greenwash_cases(shape, companies)]))
+    return documents, cases
+
+
+def main(argv: list[str] | None = None) -> None:
+    defaults = CorpusShape()
+    parser = argparse.ArgumentParser(
+        prog="python -m backend.synthetic",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--out", type=pathlib.Path, help="write esg_docs/ and greenwash_cases/ under this directory")
+    target.add_argument("--db", action="store_true", help="bulk-load the configured database instead")
+    parser.add_argument("--companies", type=int, default=defaults.companies)
+    parser.add_argument("--docs-per-company", type=float, default=defaults.docs_per_company, help="mean, at least 1")
+    parser.add_argument("--doc-skew", type=float, default=defaults.doc_skew, help="Zipf exponent of docs per company")
+    parser.add_argument("--sector-skew", type=float, default=defaults.sector_skew, help="Zipf exponent of sector sizes")
+    parser.add_argument("--doc-tokens", type=int, default=defaults.doc_tokens, help="mean document length")
+    parser.add_argument("--length-sigma", type=float, default=defaults.length_sigma, help="lognormal length spread")
+    parser.add_argument("--greenwash-rate", type=float, default=defaults.greenwash_rate, help="share of vague claims")
+    parser.add_argument("--greenwash-cases", type=int, default=defaults.greenwash_cases)
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help="documents per transaction (--db)")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    args = parser.parse_args(argv)
+    shape = CorpusShape(
+        companies=args.companies,
+        docs_per_company=args.docs_per_company,
+        doc_skew=args.doc_skew,
+        sector_skew=args.sector_skew,
+        doc_tokens=args.doc_tokens,
+        length_sigma=args.length_sigma,
+        greenwash_rate=args.greenwash_rate,
+        greenwash_cases=args.greenwash_cases,
+        seed=args.seed,
+    )
+    if args.db:
+        documents, cases = load_corpus(shape, args.batch_size)
+        print(f"Loaded {documents} new ESG docs and {cases} new greenwash cases.")
+    else:
+        documents, cases = write_corpus(shape, args.out)
+        print(f"Wrote {documents} ESG docs and {cases} greenwash cases to {args.out}.")
+
+
+if __name__ == "__main__":
+    main()
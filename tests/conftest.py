@@ -0,0 +1,6 @@
+import os
+
+# backend modules read their settings at import time; keep the tests offline.
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("USE_LOCAL_EMBEDDINGS", "true")
+os.environ.setdefault("EMBED_CACHE_ENABLED", "false")
@@ -0,0 +1,66 @@
+import pytest
+
+from backend.ingest import _TOKEN_RE, _token_cost, chunk_text
+
+
+def _tokens(text: str) -> int:
+    return sum(_token_cost(token) for token in _TOKEN_RE.findall(text))
+
+
+def _report(sentences: int) -> str:
+    return " ".join(
+        f"In {2020 + i % 10} the company cut scope {i % 3 + 1} emissions by {i % 40} percent across site {i}."
+        for i in range(sentences)
+    )
+
+
+def test_empty_text_has_no_chunks():
+    assert chunk_text("") == []
+    assert chunk_text("   \n\t") == []
+
+
+def test_short_text_is_one_chunk():
+    text = "We will reach net zero by 2040."
+    (chunk,) = chunk_text(text, max_tokens=50)
+    assert (chunk.index, chunk.start, chunk.end, chunk.text) == (0, 0, len(text), text)
+
+
+@pytest.mark.parametrize("max_tokens,overlap_tokens", [(40, 0), (40, 10), (120, 30), (7, 3)])
+def test_chunks_fit_the_token_budget_and_map_back_to_the_text(max_tokens, overlap_tokens):
+    text = _report(60)
+    chunks = chunk_text(text, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+    assert len(chunks) > 1
+    assert [chunk.index for chunk in chunks] == list(range(len(chunks)))
+    for chunk in chunks:
+        assert text[chunk.start : chunk.end] == chunk.text
+        assert _tokens(chunk.text) <= max_tokens
+    assert chunks[0].start == 0
+    assert chunks[-1].end == len(text)
+
+
+def test_chunks_cover_the_whole_text_with_overlap():
+    text = _report(60)
+    chunks = chunk_text(text, max_tokens=60, overlap_tokens=15)
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current.start < previous.end
+        assert current.start > previous.start
+
+
+def test_chunks_without_overlap_do_not_repeat_text():
+    text = _report(60)
+    chunks = chunk_text(text, max_tokens=60, overlap_tokens=0)
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current.start >= previous.end
+
+
+def test_chunks_prefer_sentence_boundaries():
+    text = _report(60)
+    chunks = chunk_text(text, max_tokens=60, overlap_tokens=0)
+    assert all(chunk.text.endswith(".") for chunk in chunks)
+
+
+def test_single_oversized_token_still_makes_progress():
+    text = "x" * 600 + " tail."
+    chunks = chunk_text(text, max_tokens=10, overlap_tokens=5)
+    assert chunks[0].text == "x" * 600
+    assert chunks[-1].end == len(text)
@@ -0,0 +1,149 @@
+import threading
+import time
+
+import psycopg2
+import psycopg2.extensions
+import pytest
+
+from backend.db import ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        if not self.conn.healthy:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.healthy = True
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def get_transaction_status(self):
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def opened():
+    return []
+
+
+@pytest.fixture
+def make_pool(opened):
+    def connect():
+        conn = FakeConnection()
+        opened.append(conn)
+        return conn
+
+    def make(**kwargs):
+        kwargs.setdefault("min_size", 0)
+        kwargs.setdefault("max_size", 2)
+        kwargs.setdefault("timeout_sec", 1.0)
+        kwargs.setdefault("healthcheck_sec", 60.0)
+        return ConnectionPool(connect=connect, **kwargs)
+
+    return make
+
+
+def test_fill_opens_min_size_connections(make_pool, opened):
+    pool = make_pool(min_size=2, max_size=4)
+    pool.fill()
+    assert len(opened) == 2
+    assert pool.stats()["idle"] == 2
+
+
+def test_idle_connection_is_reused_and_committed(make_pool, opened):
+    pool = make_pool()
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    assert first is second
+    assert len(opened) == 1
+    assert first.commits == 2
+    assert pool.stats()["checked_out"] == 0
+
+
+def test_checkout_times_out_at_max_size(make_pool):
+    pool = make_pool(max_size=1, timeout_sec=0.05)
+    pool.getconn()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_waiter_receives_returned_connection(make_pool, opened):
+    pool = make_pool(max_size=1)
+    held = pool.getconn()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.getconn()))
+    waiter.start()
+    time.sleep(0.05)
+    pool.putconn(held)
+    waiter.join(timeout=1)
+    assert got == [held]
+    assert len(opened) == 1
+
+
+def test_unhealthy_idle_connection_is_replaced(make_pool, opened):
+    pool = make_pool(healthcheck_sec=0.0)
+    stale = pool.getconn()
+    pool.putconn(stale)
+    stale.healthy = False
+    fresh = pool.getconn()
+    assert fresh is not stale
+    assert stale.closed
+    assert pool.stats()["healthcheck_failures"] == 1
+    assert pool.stats()["size"] == 1
+
+
+def test_error_rolls_back_and_keeps_connection(make_pool):
+    pool = make_pool()
+    with pytest.raises(ValueError):
+        with pool.connection() as conn:
+            raise ValueError("boom")
+    assert conn.rollbacks == 1
+    assert not conn.closed
+    assert pool.stats()["idle"] == 1
+
+
+def test_operational_error_discards_connection(make_pool):
+    pool = make_pool()
+    with pytest.raises(psycopg2.OperationalError):
+        with pool.connection() as conn:
+            raise psycopg2.OperationalError("connection lost")
+    assert conn.closed
+    assert pool.stats()["size"] == 0
+    assert pool.stats()["connections_discarded"] == 1
+
+
+def test_closed_pool_refuses_checkouts(make_pool):
+    pool = make_pool()
+    with pool.connection():
+        pass
+    pool.close()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
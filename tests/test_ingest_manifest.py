@@ -0,0 +1,194 @@
+import os
+import pathlib
+
+import pytest
+
+from backend import ingest
+from backend.manifest import IngestManifest
+
+
+class FakeStore:
+    """esg_sources / greenwash_examples rows keyed by id, deduplicated by content hash."""
+
+    def __init__(self):
+        self.rows: dict[int, str] = {}
+        self.next_id = 1
+        self.ingested: list[str] = []
+
+    def _insert(self, hashes: list[str]) -> list[tuple[int, bool]]:
+        results = []
+        for content_hash in hashes:
+            existing = next((row_id for row_id, h in self.rows.items() if h == content_hash), None)
+            if existing is not None:
+                results.append((existing, False))
+                continue
+            self.rows[self.next_id] = content_hash
+            results.append((self.next_id, True))
+            self.next_id += 1
+        return results
+
+    def ingest_esg_docs(self, docs, prepared=None):
+        self.ingested.extend(doc.text for doc in docs)
+        return self._insert([doc.metadata["content_hash"] for doc in docs])
+
+    def ingest_greenwash(self, texts):
+        self.ingested.extend(texts)
+        return self._insert([ingest._hash_content(text) for text in texts])
+
+    def delete(self, row_ids):
+        removed = [row_id for row_id in row_ids if self.rows.pop(row_id, None) is not None]
+        return len(removed)
+
+    def ids_for(self, *texts: str) -> set[int]:
+        hashes = {ingest._hash_content(text) for text in texts}
+        return {row_id for row_id, h in self.rows.items() if h in hashes}
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = FakeStore()
+    monkeypatch.setattr(ingest, "init_db", lambda: None)
+    monkeypatch.setattr(ingest, "_ingest_esg_docs", store.ingest_esg_docs)
+    monkeypatch.setattr(ingest, "delete_esg_sources", store.delete)
+    monkeypatch.setattr(ingest, "_ingest_greenwash_examples", store.ingest_greenwash)
+    monkeypatch.setattr(ingest, "delete_greenwash_examples", store.delete)
+    return store
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    esg_dir = tmp_path / "esg_docs"
+    greenwash_dir = tmp_path / "greenwash_cases"
+    esg_dir.mkdir()
+    greenwash_dir.mkdir()
+    return esg_dir, greenwash_dir, str(tmp_path / "manifest.sqlite3")
+
+
+def _run(dirs, **kwargs):
+    esg_dir, greenwash_dir, manifest_path = dirs
+    ingest.ingest_all(esg_dir=esg_dir, greenwash_dir=greenwash_dir, manifest_path=manifest_path, **kwargs)
+
+
+def _entries(dirs, kind="esg"):
+    manifest = IngestManifest(dirs[2])
+    try:
+        return {pathlib.Path(key).name: entry for key, entry in manifest.entries(kind).items()}
+    finally:
+        manifest.close()
+
+
+def test_rerun_skips_unchanged_files(store, dirs):
+    esg_dir = dirs[0]
+    (esg_dir / "Acme_Energy_Report.txt").write_text("Acme will reach net zero by 2040.")
+    (esg_dir / "Bolt_Energy_Report.txt").write_text("Bolt buys renewable certificates.")
+    _run(dirs)
+    assert len(store.rows) == 2
+
+    store.ingested.clear()
+    _run(dirs)
+    assert store.ingested == []
+    assert len(store.rows) == 2
+
+
+def test_edited_file_replaces_its_row(store, dirs):
+    path = dirs[0] / "Acme_Energy_Report.txt"
+    path.write_text("Acme will reach net zero by 2040.")
+    _run(dirs)
+    (old_id,) = store.ids_for("Acme will reach net zero by 2040.")
+
+    path.write_text("Acme now targets net zero by 2035 with interim goals.")
+    _run(dirs)
+    (new_id,) = store.ids_for("Acme now targets net zero by 2035 with interim goals.")
+    assert set(store.rows) == {new_id}
+    assert new_id != old_id
+    assert _entries(dirs)["Acme_Energy_Report.txt"].row_ids == [new_id]
+
+
+def test_touched_file_keeps_its_row(store, dirs):
+    path = dirs[0] / "Acme_Energy_Report.txt"
+    path.write_text("Acme will reach net zero by 2040.")
+    _run(dirs)
+    rows = dict(store.rows)
+
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    store.ingested.clear()
+    _run(dirs)
+    assert store.ingested == []
+    assert store.rows == rows
+
+
+def test_shared_row_survives_editing_one_of_its_files(store, dirs):
+    text = "Acme and its subsidiary publish the same climate report."
+    (dirs[0] / "Acme_Energy_Report.txt").write_text(text)
+    (dirs[0] / "AcmeSub_Energy_Report.txt").write_text(text)
+    _run(dirs)
+    (shared_id,) = store.ids_for(text)
+    entries = _entries(dirs)
+    assert entries["Acme_Energy_Report.txt"].row_ids == [shared_id]
+    assert entries["AcmeSub_Energy_Report.txt"].row_ids == [shared_id]
+
+    (dirs[0] / "Acme_Energy_Report.txt").write_text("Acme rewrote its report entirely.")
+    _run(dirs)
+    assert shared_id in store.rows
+    assert len(store.rows) == 2
+
+
+def test_removed_files_are_pruned(store, dirs):
+    text = "Acme and its subsidiary publish the same climate report."
+    (dirs[0] / "Acme_Energy_Report.txt").write_text(text)
+    (dirs[0] / "AcmeSub_Energy_Report.txt").write_text(text)
+    (dirs[0] / "Bolt_Energy_Report.txt").write_text("Bolt buys renewable certificates.")
+    _run(dirs)
+    (shared_id,) = store.ids_for(text)
+
+    (dirs[0] / "Bolt_Energy_Report.txt").unlink()
+    (dirs[0] / "Acme_Energy_Report.txt").unlink()
+    _run(dirs)
+    # The shared row is still referenced by the subsidiary's file.
+    assert set(store.rows) == {shared_id}
+    assert set(_entries(dirs)) == {"AcmeSub_Energy_Report.txt"}
+
+    (dirs[0] / "AcmeSub_Energy_Report.txt").unlink()
+    _run(dirs)
+    assert store.rows == {}
+    assert _entries(dirs) == {}
+
+
+def test_emptied_file_drops_its_row(store, dirs):
+    path = dirs[0] / "Acme_Energy_Report.txt"
+    path.write_text("Acme will reach net zero by 2040.")
+    _run(dirs)
+    path.write_text("   ")
+    _run(dirs)
+    assert store.rows == {}
+    assert _entries(dirs)["Acme_Energy_Report.txt"].row_ids == []
+
+
+def test_non_recursive_run_keeps_subdirectory_entries(store, dirs):
+    nested = dirs[0] / "2024"
+    nested.mkdir()
+    (nested / "Acme_Energy_Report.txt").write_text("Acme will reach net zero by 2040.")
+    _run(dirs, recursive=True)
+    assert len(store.rows) == 1
+
+    _run(dirs)
+    assert len(store.rows) == 1
+    assert set(_entries(dirs)) == {"Acme_Energy_Report.txt"}
+
+    (nested / "Acme_Energy_Report.txt").unlink()
+    _run(dirs, recursive=True)
+    assert store.rows == {}
+
+
+def test_removed_greenwash_cases_are_pruned(store, dirs):
+    greenwash_dir = dirs[1]
+    (greenwash_dir / "offsets.txt").write_text("Carbon neutral claims that rest on cheap offsets.")
+    (greenwash_dir / "scope3.txt").write_text("Emission cuts that leave out scope 3.")
+    _run(dirs)
+    assert len(store.rows) == 2
+
+    (greenwash_dir / "offsets.txt").unlink()
+    _run(dirs)
+    assert set(store.rows) == store.ids_for("Emission cuts that leave out scope 3.")
+    assert set(_entries(dirs, "greenwash")) == {"scope3.txt"}
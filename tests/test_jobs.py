@@ -0,0 +1,124 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from backend.jobs import JobQueue
+
+HEARTBEAT_SEC = 0.05
+ORPHAN_TIMEOUT_SEC = 0.2
+
+
+@pytest.fixture
+def job_path(tmp_path):
+    return str(tmp_path / "jobs.sqlite3")
+
+
+@pytest.fixture
+def queues(job_path):
+    started = []
+
+    def make() -> JobQueue:
+        queue = JobQueue(job_path, workers=2, heartbeat_sec=HEARTBEAT_SEC, orphan_timeout_sec=ORPHAN_TIMEOUT_SEC)
+        queue.start()
+        started.append(queue)
+        return queue
+
+    yield make
+    for queue in started:
+        queue.shutdown()
+
+
+def _wait_for(queue: JobQueue, job_id: str, statuses: set[str], timeout: float = 2.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        job = queue.get(job_id)
+        if job["status"] in statuses or time.monotonic() > deadline:
+            return job
+        time.sleep(0.01)
+
+
+def _blocking_job(release: threading.Event):
+    def handler(progress):
+        progress({"stage": "working"})
+        release.wait(5)
+        return {"done": True}
+
+    return handler
+
+
+def test_job_runs_to_completion(queues):
+    queue = queues()
+    job = queue.submit("test", lambda progress, value: {"value": value}, 3)
+    job = _wait_for(queue, job["job_id"], {"succeeded", "failed"})
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"value": 3}
+
+
+def test_live_sibling_does_not_fail_running_jobs(queues):
+    release = threading.Event()
+    owner = queues()
+    job = owner.submit("test", _blocking_job(release))
+    _wait_for(owner, job["job_id"], {"running"})
+
+    sibling = queues()
+    time.sleep(ORPHAN_TIMEOUT_SEC * 2)
+    assert sibling.get(job["job_id"])["status"] == "running"
+
+    release.set()
+    assert _wait_for(owner, job["job_id"], {"succeeded", "failed"})["status"] == "succeeded"
+
+
+def test_jobs_of_a_silent_owner_are_failed(queues):
+    release = threading.Event()
+    owner = queues()
+    job = owner.submit("test", _blocking_job(release))
+    _wait_for(owner, job["job_id"], {"running"})
+
+    # Simulate a crashed process: its heartbeat stops but nothing cleans up.
+    owner._stopped.set()
+    sibling = queues()
+    job = _wait_for(sibling, job["job_id"], {"failed"})
+    assert job["status"] == "failed"
+    assert "Interrupted" in job["error"]
+
+    # A handler that finishes late does not overwrite the failure.
+    release.set()
+    time.sleep(0.1)
+    assert sibling.get(job["job_id"])["status"] == "failed"
+
+
+def test_restart_fails_jobs_without_a_live_owner(job_path, queues):
+    queues()  # creates the schema
+    db = sqlite3.connect(job_path)
+    with db:
+        db.execute(
+            "INSERT INTO jobs (id, kind, status, created_at, owner) VALUES ('old', 'test', 'running', ?, 'gone-1')",
+            (time.time() - 60,),
+        )
+        db.execute(
+            "INSERT INTO jobs (id, kind, status, created_at, owner) VALUES ('legacy', 'test', 'queued', ?, NULL)",
+            (time.time() - 60,),
+        )
+    db.close()
+
+    restarted = queues()
+    assert restarted.get("old")["status"] == "failed"
+    assert restarted.get("legacy")["status"] == "failed"
+
+
+def test_shutdown_fails_only_its_own_jobs(queues):
+    release = threading.Event()
+    first = queues()
+    second = queues()
+    mine = first.submit("test", _blocking_job(release))
+    theirs = second.submit("test", _blocking_job(release))
+    _wait_for(first, mine["job_id"], {"running"})
+    _wait_for(second, theirs["job_id"], {"running"})
+
+    first.shutdown()
+    assert second.get(mine["job_id"])["status"] == "failed"
+    assert second.get(theirs["job_id"])["status"] == "running"
+    release.set()
+    assert _wait_for(second, theirs["job_id"], {"succeeded", "failed"})["status"] == "succeeded"
@@ -0,0 +1,126 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+import pytest
+
+from backend import detect
+
+
+class FakeCursor:
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.executed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.executed.append(params)
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self):
+        return self._cursor
+
+
+@pytest.fixture
+def cursor(monkeypatch):
+    cursor = FakeCursor()
+
+    @contextmanager
+    def connection():
+        yield FakeConnection(cursor)
+
+    monkeypatch.setattr(detect, "connection", connection)
+    monkeypatch.setattr(detect, "VECTOR_INDEX_TYPE", "hnsw")
+    monkeypatch.setattr(detect, "_sector_modes", OrderedDict())
+    return cursor
+
+
+@pytest.fixture
+def peer_queries(monkeypatch):
+    """Record _peer_query calls; ANN modes find one peer, exact search finds k."""
+    calls = []
+
+    def fake_peer_query(cur, queries, embeddings, k, mode, ef_search, probes, sector=None):
+        calls.append((mode, sector, [company for company, _ in queries]))
+        found = 1 if mode != detect._EXACT else k
+        return [[("chunk", f"{company}-peer{i}", 0.9 - i / 10) for i in range(found)] for company, _ in queries]
+
+    monkeypatch.setattr(detect, "_peer_query", fake_peer_query)
+    return calls
+
+
+def _use_modes(monkeypatch, modes: dict[str, str]):
+    monkeypatch.setattr(detect, "_peer_search_modes", lambda cur, sectors: {s.lower(): modes[s.lower()] for s in sectors})
+
+
+def _embeddings(count: int) -> list[np.ndarray]:
+    return [np.ones(4, dtype=np.float32)] * count
+
+
+def test_short_ann_results_are_rerun_exactly(monkeypatch, cursor, peer_queries):
+    _use_modes(monkeypatch, {"energy": detect._ANN, "retail": detect._EXACT})
+    results = detect.search_peer_esg_many([("Acme", "Energy"), ("Shop", "Retail")], _embeddings(2), k=3)
+
+    assert peer_queries == [
+        (detect._ANN, None, ["Acme"]),
+        (detect._EXACT, None, ["Shop"]),
+        (detect._EXACT, None, ["Acme"]),
+    ]
+    assert [len(peers) for peers in results] == [3, 3]
+    # The sector is searched exactly until its cached mode expires.
+    assert detect._sector_modes["energy"][0] == detect._EXACT
+
+
+def test_full_ann_results_are_kept(monkeypatch, cursor, peer_queries):
+    _use_modes(monkeypatch, {"energy": detect._ANN})
+    results = detect.search_peer_esg_many([("Acme", "Energy")], _embeddings(1), k=1)
+    assert peer_queries == [(detect._ANN, None, ["Acme"])]
+    assert results == [[("chunk", "Acme-peer0", 0.9)]]
+    assert "energy" not in detect._sector_modes
+
+
+def test_sector_indexes_are_searched_one_sector_per_query(monkeypatch, cursor, peer_queries):
+    _use_modes(monkeypatch, {"energy": detect._SECTOR_INDEX, "retail": detect._SECTOR_INDEX})
+    queries = [("Acme", "Energy"), ("Shop", "Retail"), ("Bolt", "ENERGY")]
+    detect.search_peer_esg_many(queries, _embeddings(3), k=1)
+    assert peer_queries == [
+        (detect._SECTOR_INDEX, "energy", ["Acme", "Bolt"]),
+        (detect._SECTOR_INDEX, "retail", ["Shop"]),
+    ]
+
+
+def test_companies_without_a_sector_have_no_peers(monkeypatch, cursor, peer_queries):
+    _use_modes(monkeypatch, {})
+    assert detect.search_peer_esg_many([("Acme", None), ("Bolt", "")], _embeddings(2), k=3) == [[], []]
+    assert detect.search_peer_esg("Acme", None, "text", embedding=_embeddings(1)[0]) == []
+    assert peer_queries == []
+
+
+def test_modes_follow_sector_size_and_index(monkeypatch, cursor):
+    limit = detect.PEER_EXACT_MAX_ROWS
+    cursor.rows = [("Energy", limit, False), ("Retail", limit + 1, True), ("Mining", limit + 1, False)]
+    modes = detect._peer_search_modes(cursor, ["Energy", "Retail", "Mining"])
+    assert modes == {"energy": detect._EXACT, "retail": detect._SECTOR_INDEX, "mining": detect._ANN}
+
+    # Cached modes are served without counting again.
+    cursor.executed.clear()
+    assert detect._peer_search_modes(cursor, ["RETAIL"]) == {"retail": detect._SECTOR_INDEX}
+    assert cursor.executed == []
+
+
+def test_without_an_ann_index_every_sector_is_exact(monkeypatch, cursor):
+    monkeypatch.setattr(detect, "VECTOR_INDEX_TYPE", "none")
+    assert detect._peer_search_modes(cursor, ["Energy"]) == {"energy": detect._EXACT}
+    assert cursor.executed == []
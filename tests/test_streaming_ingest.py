@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from backend import ingest
+from backend.ingest import _StreamingChunker, chunk_text
+
+
+def _document(paragraphs: int) -> str:
+    rng = random.Random(paragraphs)
+    sentences = [
+        "We cut scope 1 emissions by {n} percent.",
+        "Renewable electricity covered {n}% of our sites!",
+        "Is net zero by 20{n} realistic?",
+        "Offsets  account for\tmost of the reduction.",
+    ]
+    return "\n\n".join(
+        " ".join(rng.choice(sentences).format(n=rng.randint(10, 99)) for _ in range(rng.randint(3, 12)))
+        for _ in range(paragraphs)
+    )
+
+
+def _pieces(text: str, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    pieces, start = [], 0
+    while start < len(text):
+        end = start + rng.randint(1, 200)
+        pieces.append(text[start:end])
+        start = end
+    return pieces
+
+
+def _stream(chunker: _StreamingChunker, pieces, add) -> list:
+    released = []
+    for piece in pieces:
+        released.extend(add(chunker, piece))
+    released.extend(chunker.finish())
+    return released
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("max_tokens,overlap_tokens", [(40, 10), (120, 0), (300, 60)])
+def test_fed_blocks_chunk_like_the_whole_text(seed, max_tokens, overlap_tokens):
+    text = "\n  " + _document(30) + "  \n\n"
+    written = []
+    chunker = _StreamingChunker(max_tokens, overlap_tokens, sink=written.append)
+    released = _stream(chunker, _pieces(text, seed), _StreamingChunker.feed)
+
+    expected = chunk_text(text.strip(), max_tokens, overlap_tokens)
+    assert released == expected
+    assert chunker.chunks == expected
+    assert "".join(written) == text.strip()
+    assert chunker.length == len(text.strip())
+    assert chunker.content_hash == ingest._hash_content(text.strip())
+
+
+def test_pages_chunk_like_the_joined_pages():
+    pages = ["  " + _document(3) + "\n", "", "   ", _document(5), "\n" + _document(2)]
+    chunker = _StreamingChunker(60, 15)
+    released = _stream(chunker, pages, _StreamingChunker.append_page)
+
+    joined = "\n\n".join(page.strip() for page in pages if page.strip())
+    assert released == chunk_text(joined, 60, 15)
+    assert chunker.length == len(joined)
+
+
+def test_whitespace_only_stream_has_no_text():
+    chunker = _StreamingChunker(60, 15)
+    assert _stream(chunker, [" ", "\n\n", "\t"], _StreamingChunker.feed) == []
+    assert chunker.length == 0
+
+
+def test_streamed_document_records_its_length_and_hash(monkeypatch):
+    captured = {}
+
+    def fake_ingest(docs, prepared=None):
+        captured["doc"], captured["prepared"] = docs[0], prepared[0]
+        return [(1, True)]
+
+    monkeypatch.setattr(ingest, "embed_texts", lambda texts: [None] * len(texts))
+    monkeypatch.setattr(ingest, "_ingest_esg_docs", fake_ingest)
+    text = _document(20)
+    inserted, chars = ingest.ingest_esg_text("Acme", "Energy", "Report", _pieces(text, 7))
+
+    chunks, embeddings, length = captured["prepared"]
+    assert (inserted, chars, length) == (True, len(text), len(text))
+    assert chunks == chunk_text(text)
+    assert len(embeddings) == len(chunks)
+    # Dedupes against the same text ingested whole.
+    assert captured["doc"].metadata["content_hash"] == ingest._hash_content(text)
@@ -0,0 +1,73 @@
+import io
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from backend import main
+
+LIMIT = 1024
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        return {"received": len(await request.body())}
+
+    @app.post("/other")
+    async def other(request: Request):
+        return {"received": len(await request.body())}
+
+    app.add_middleware(main._UploadSizeLimit, paths=("/upload",), limit=LIMIT)
+    return TestClient(app)
+
+
+def _chunked(size: int, piece: int = 256):
+    for start in range(0, size, piece):
+        yield b"x" * min(piece, size - start)
+
+
+def test_body_within_limit_passes(client):
+    response = client.post("/upload", content=b"x" * LIMIT)
+    assert response.status_code == 200
+    assert response.json() == {"received": LIMIT}
+
+
+def test_declared_oversized_body_is_refused(client):
+    response = client.post("/upload", content=b"x" * (LIMIT + 1))
+    assert response.status_code == 400
+    assert response.json()["detail"] == main._UPLOAD_TOO_LARGE_DETAIL
+
+
+def test_streamed_oversized_body_is_refused(client):
+    # No Content-Length: the guard has to count the body as it arrives.
+    response = client.post("/upload", content=_chunked(LIMIT * 4))
+    assert response.status_code == 400
+    assert response.json()["detail"] == main._UPLOAD_TOO_LARGE_DETAIL
+
+
+def test_other_routes_are_not_limited(client):
+    response = client.post("/other", content=b"x" * (LIMIT * 4))
+    assert response.status_code == 200
+
+
+def test_spooled_upload_is_copied_to_a_temporary_file(monkeypatch):
+    monkeypatch.setattr(main, "UPLOAD_COPY_CHUNK_BYTES", 100)
+    path = main._spool_upload(io.BytesIO(b"y" * 1000), ".txt")
+    try:
+        assert path.read_bytes() == b"y" * 1000
+    finally:
+        path.unlink()
+
+
+def test_oversized_spool_is_refused_and_removed(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "MAX_UPLOAD_BYTES", 500)
+    monkeypatch.setattr(main, "UPLOAD_COPY_CHUNK_BYTES", 100)
+    monkeypatch.setattr(main.tempfile, "tempdir", str(tmp_path))
+    with pytest.raises(HTTPException) as raised:
+        main._spool_upload(io.BytesIO(b"y" * 1000), ".pdf")
+    assert raised.value.status_code == 400
+    assert list(tmp_path.iterdir()) == []